@@ -1,3 +1,5 @@
+import json
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config, pool
@@ -9,6 +11,18 @@ from app.db import models
 # access to the values within the .ini file in use.
 config = context.config
 
+# Migrate the database the app is configured for; alembic.ini only supplies
+# the default for a local checkout.
+if os.environ.get("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+
+# Every shard has the same schema, so each one in DATABASE_SHARD_URLS is
+# migrated after DATABASE_URL (shard 0); ``-x shard=N`` picks a single one.
+shard_urls = [config.get_main_option("sqlalchemy.url")]
+shard_urls += json.loads(os.environ.get("DATABASE_SHARD_URLS") or "[]")
+if "shard" in context.get_x_argument(as_dictionary=True):
+    shard_urls = [shard_urls[int(context.get_x_argument(as_dictionary=True)["shard"])]]
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 fileConfig(config.config_file_name)
@@ -37,16 +51,16 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = config.get_main_option("sqlalchemy.url")
-    context.configure(
-        url=url,
-        target_metadata=target_metadata,
-        literal_binds=True,
-        dialect_opts={"paramstyle": "named"},
-    )
+    for url in shard_urls:
+        context.configure(
+            url=url,
+            target_metadata=target_metadata,
+            literal_binds=True,
+            dialect_opts={"paramstyle": "named"},
+        )
 
-    with context.begin_transaction():
-        context.run_migrations()
+        with context.begin_transaction():
+            context.run_migrations()
 
 
 def run_migrations_online() -> None:
@@ -56,17 +70,21 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-
-        with context.begin_transaction():
-            context.run_migrations()
+    for url in shard_urls:
+        connectable = engine_from_config(
+            {
+                **config.get_section(config.config_ini_section, {}),
+                "sqlalchemy.url": url,
+            },
+            prefix="sqlalchemy.",
+            poolclass=pool.NullPool,
+        )
+
+        with connectable.connect() as connection:
+            context.configure(connection=connection, target_metadata=target_metadata)
+
+            with context.begin_transaction():
+                context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,80 @@
+"""Add the archive tier for completed todos
+
+Revision ID: 02758db25a22
+Revises: e5a93c1b7f02
+Create Date: 2026-10-18 22:41:16.884277
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "02758db25a22"
+down_revision: Union[str, None] = "e5a93c1b7f02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INCREMENT = (
+    "INSERT INTO todo_stats(owner_id, priority, complete, count) "
+    "SELECT new.owner_id, ifnull(new.priority, 0), ifnull(new.complete, 0), 1 "
+    "WHERE new.owner_id IS NOT NULL "
+    "ON CONFLICT(owner_id, priority, complete) DO UPDATE SET count = count + 1; "
+)
+DECREMENT = (
+    "UPDATE todo_stats SET count = count - 1 WHERE owner_id = old.owner_id "
+    "AND priority = ifnull(old.priority, 0) "
+    "AND complete = ifnull(old.complete, 0); "
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "archived_todos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("description", sa.String()),
+        sa.Column("priority", sa.Integer()),
+        sa.Column("complete", sa.Boolean()),
+        sa.Column("owner_id", sa.Integer()),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("archived_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index(
+        "ix_archived_todos_owner_id_id", "archived_todos", ["owner_id", "id"]
+    )
+    op.create_index(
+        "ix_archived_todos_owner_id_version_id",
+        "archived_todos",
+        ["owner_id", "version", "id"],
+    )
+    op.create_index("ix_todos_complete_updated_at", "todos", ["complete", "updated_at"])
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            "CREATE TRIGGER archived_todo_stats_insert AFTER INSERT ON "
+            "archived_todos BEGIN " + INCREMENT + "END"
+        )
+        op.execute(
+            "CREATE TRIGGER archived_todo_stats_delete AFTER DELETE ON "
+            "archived_todos BEGIN " + DECREMENT + "END"
+        )
+
+
+def downgrade() -> None:
+    # Archived todos go back to the hot table first; the stats triggers net
+    # the move out.
+    op.execute(
+        "INSERT INTO todos (id, title, description, priority, complete, "
+        "owner_id, version, updated_at) SELECT id, title, description, "
+        "priority, complete, owner_id, version, updated_at FROM archived_todos"
+    )
+    op.execute("DELETE FROM archived_todos")
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER archived_todo_stats_delete")
+        op.execute("DROP TRIGGER archived_todo_stats_insert")
+    op.drop_index("ix_todos_complete_updated_at", table_name="todos")
+    op.drop_table("archived_todos")
@@ -0,0 +1,42 @@
+"""Add admin jobs
+
+Revision ID: 0b5f71ad7279
+Revises: 02758db25a22
+Create Date: 2026-10-18 23:12:08.402117
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0b5f71ad7279"
+down_revision: Union[str, None] = "02758db25a22"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "admin_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("params", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("checkpoint", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("processed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.String()),
+        sa.Column("created_by", sa.Integer()),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_admin_jobs_status_id", "admin_jobs", ["status", "id"])
+
+
+def downgrade() -> None:
+    op.drop_table("admin_jobs")
@@ -0,0 +1,58 @@
+"""Create users and todos tables
+
+Revision ID: 0b6e2f4c8d15
+Revises:
+Create Date: 2026-10-18 18:20:44.127390
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0b6e2f4c8d15"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Until the app stopped calling create_all on import these tables were
+    # created outside the migrations. Such databases are stamped with
+    # 39c0a7d0cae6, which matches their schema, and then upgraded. This
+    # revision was added below 39c0a7d0cae6 afterwards, so it leaves tables
+    # that already exist alone.
+    if sa.inspect(op.get_bind()).has_table("users"):
+        return
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), unique=True),
+        sa.Column("username", sa.String(), unique=True),
+        sa.Column("first_name", sa.String()),
+        sa.Column("last_name", sa.String()),
+        sa.Column("password", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("role", sa.String()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_table(
+        "todos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("description", sa.String()),
+        sa.Column("priority", sa.Integer()),
+        sa.Column("complete", sa.Boolean()),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+    )
+    op.create_index("ix_todos_id", "todos", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_todos_id", table_name="todos")
+    op.drop_table("todos")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
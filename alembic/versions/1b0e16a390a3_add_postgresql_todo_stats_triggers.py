@@ -0,0 +1,76 @@
+"""Maintain todo stats with triggers on PostgreSQL
+
+Revision ID: 1b0e16a390a3
+Revises: 0b5f71ad7279
+Create Date: 2026-10-18 04:30:01.377280
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "1b0e16a390a3"
+down_revision: Union[str, None] = "0b5f71ad7279"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("todos", "archived_todos")
+APPLY = (
+    "CREATE OR REPLACE FUNCTION todo_stats_apply() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP <> 'INSERT' AND OLD.owner_id IS NOT NULL THEN "
+    "UPDATE todo_stats SET count = count - 1 WHERE owner_id = OLD.owner_id "
+    "AND priority = coalesce(OLD.priority, 0) "
+    "AND complete = coalesce(OLD.complete, false); "
+    "END IF; "
+    "IF TG_OP <> 'DELETE' AND NEW.owner_id IS NOT NULL THEN "
+    "INSERT INTO todo_stats(owner_id, priority, complete, count) "
+    "VALUES (NEW.owner_id, coalesce(NEW.priority, 0), "
+    "coalesce(NEW.complete, false), 1) "
+    "ON CONFLICT (owner_id, priority, complete) "
+    "DO UPDATE SET count = todo_stats.count + 1; "
+    "END IF; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql"
+)
+
+
+def upgrade() -> None:
+    # SQLite has had its triggers since the stats table was added.
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(APPLY)
+    for table in TABLES:
+        op.execute(
+            f"CREATE TRIGGER {table}_stats_insert_delete AFTER INSERT OR DELETE "
+            f"ON {table} FOR EACH ROW EXECUTE FUNCTION todo_stats_apply()"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_stats_update AFTER UPDATE OF "
+            f"priority, complete, owner_id ON {table} FOR EACH ROW "
+            "WHEN (OLD.priority IS DISTINCT FROM NEW.priority "
+            "OR OLD.complete IS DISTINCT FROM NEW.complete "
+            "OR OLD.owner_id IS DISTINCT FROM NEW.owner_id) "
+            "EXECUTE FUNCTION todo_stats_apply()"
+        )
+    # The counters were only filled once so far; recount under the triggers.
+    op.execute("LOCK TABLE todos, archived_todos IN SHARE MODE")
+    op.execute("DELETE FROM todo_stats")
+    op.execute(
+        "INSERT INTO todo_stats (owner_id, priority, complete, count) "
+        "SELECT owner_id, coalesce(priority, 0), coalesce(complete, false), "
+        "count(*) FROM (SELECT owner_id, priority, complete FROM todos "
+        "UNION ALL SELECT owner_id, priority, complete FROM archived_todos) "
+        "AS tiers WHERE owner_id IS NOT NULL "
+        "GROUP BY owner_id, coalesce(priority, 0), coalesce(complete, false)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER {table}_stats_update ON {table}")
+        op.execute(f"DROP TRIGGER {table}_stats_insert_delete ON {table}")
+    op.execute("DROP FUNCTION todo_stats_apply()")
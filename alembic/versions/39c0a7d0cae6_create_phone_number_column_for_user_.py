@@ -1,7 +1,7 @@
 """Create phone number column for user table
 
 Revision ID: 39c0a7d0cae6
-Revises:
+Revises: 0b6e2f4c8d15
 Create Date: 2024-04-11 00:38:00.034544
 
 """
@@ -14,7 +14,7 @@ from alembic import op
 
 # revision identifiers, used by Alembic.
 revision: str = "39c0a7d0cae6"
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = "0b6e2f4c8d15"
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
@@ -0,0 +1,39 @@
+"""Add composite indexes backing the todo listing
+
+Revision ID: 5a1f3c9e2b7d
+Revises: 39c0a7d0cae6
+Create Date: 2026-10-18 09:12:41.218306
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5a1f3c9e2b7d"
+down_revision: Union[str, None] = "39c0a7d0cae6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_todos_owner_id_id", "todos", ["owner_id", "id"])
+    op.create_index(
+        "ix_todos_owner_id_complete_id", "todos", ["owner_id", "complete", "id"]
+    )
+    op.create_index(
+        "ix_todos_owner_id_priority_id", "todos", ["owner_id", "priority", "id"]
+    )
+    op.create_index(
+        "ix_todos_owner_id_complete_priority_id",
+        "todos",
+        ["owner_id", "complete", "priority", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_todos_owner_id_complete_priority_id", table_name="todos")
+    op.drop_index("ix_todos_owner_id_priority_id", table_name="todos")
+    op.drop_index("ix_todos_owner_id_complete_id", table_name="todos")
+    op.drop_index("ix_todos_owner_id_id", table_name="todos")
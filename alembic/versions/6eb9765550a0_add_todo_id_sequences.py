@@ -0,0 +1,33 @@
+"""Add per-shard todo id sequences
+
+Revision ID: 6eb9765550a0
+Revises: 8b91a5aa5bab
+Create Date: 2026-10-18 06:02:17.845130
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6eb9765550a0"
+down_revision: Union[str, None] = "8b91a5aa5bab"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A migration does not know which shard it runs on; each shard's row is
+    # created, past every id it already used, by its first insert.
+    op.create_table(
+        "todo_id_sequences",
+        sa.Column("shard", sa.Integer(), primary_key=True),
+        sa.Column("last_id", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("todo_id_sequences")
@@ -0,0 +1,62 @@
+"""Never hand out a todo id again once it has been used
+
+Revision ID: 8b91a5aa5bab
+Revises: 1b0e16a390a3
+Create Date: 2026-10-18 05:12:44.208913
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8b91a5aa5bab"
+down_revision: Union[str, None] = "1b0e16a390a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Ids a new todo must stay clear of: archived todos and deleted ones that
+# delta sync still reports.
+SEED_SEQUENCE = (
+    "INSERT INTO sqlite_sequence(name, seq) SELECT 'todos', max("
+    "ifnull((SELECT max(id) FROM todos), 0), "
+    "ifnull((SELECT max(id) FROM archived_todos), 0), "
+    "ifnull((SELECT max(todo_id) FROM todo_tombstones), 0))"
+)
+
+
+def rebuild_todos(autoincrement: bool):
+    # Only SQLite reuses ids; a PostgreSQL sequence never goes back. The
+    # rebuild drops the table's triggers, so they are put back as they were.
+    triggers = op.get_bind().scalars(
+        sa.text(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'todos'"
+        )
+    )
+    triggers = list(triggers)
+    with op.batch_alter_table(
+        "todos",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": autoincrement},
+    ):
+        pass
+    for trigger in triggers:
+        op.execute(trigger)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    rebuild_todos(autoincrement=True)
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'todos'")
+    op.execute(SEED_SEQUENCE)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    rebuild_todos(autoincrement=False)
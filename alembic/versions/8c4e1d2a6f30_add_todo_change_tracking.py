@@ -0,0 +1,59 @@
+"""Add change versions and tombstones for todo delta sync
+
+Revision ID: 8c4e1d2a6f30
+Revises: 5a1f3c9e2b7d
+Create Date: 2026-10-18 14:03:27.551920
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c4e1d2a6f30"
+down_revision: Union[str, None] = "5a1f3c9e2b7d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "todos",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("todos", sa.Column("updated_at", sa.DateTime(timezone=True)))
+    op.create_index(
+        "ix_todos_owner_id_version_id", "todos", ["owner_id", "version", "id"]
+    )
+    op.create_table(
+        "todo_sync_versions",
+        sa.Column("owner_id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "todo_tombstones",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("todo_id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index(
+        "ix_todo_tombstones_owner_id_version_todo_id",
+        "todo_tombstones",
+        ["owner_id", "version", "todo_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_todo_tombstones_owner_id_version_todo_id", table_name="todo_tombstones"
+    )
+    op.drop_table("todo_tombstones")
+    op.drop_table("todo_sync_versions")
+    op.drop_index("ix_todos_owner_id_version_id", table_name="todos")
+    op.drop_column("todos", "updated_at")
+    op.drop_column("todos", "version")
@@ -0,0 +1,55 @@
+"""Add FTS5 full-text index over todo titles and descriptions
+
+Revision ID: b7d93e5f0a14
+Revises: 8c4e1d2a6f30
+Create Date: 2026-10-18 16:47:09.310254
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d93e5f0a14"
+down_revision: Union[str, None] = "8c4e1d2a6f30"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Other backends serve /todos/search through the per-owner fallback.
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE todos_fts USING fts5("
+        "title, description, owner_id, content='todos', content_rowid='id')"
+    )
+    op.execute(
+        "CREATE TRIGGER todos_fts_insert AFTER INSERT ON todos BEGIN "
+        "INSERT INTO todos_fts(rowid, title, description, owner_id) "
+        "VALUES (new.id, new.title, new.description, new.owner_id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER todos_fts_delete AFTER DELETE ON todos BEGIN "
+        "INSERT INTO todos_fts(todos_fts, rowid, title, description, owner_id) "
+        "VALUES ('delete', old.id, old.title, old.description, old.owner_id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER todos_fts_update AFTER UPDATE OF "
+        "title, description, owner_id ON todos BEGIN "
+        "INSERT INTO todos_fts(todos_fts, rowid, title, description, owner_id) "
+        "VALUES ('delete', old.id, old.title, old.description, old.owner_id); "
+        "INSERT INTO todos_fts(rowid, title, description, owner_id) "
+        "VALUES (new.id, new.title, new.description, new.owner_id); END"
+    )
+    op.execute("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute("DROP TRIGGER todos_fts_update")
+    op.execute("DROP TRIGGER todos_fts_delete")
+    op.execute("DROP TRIGGER todos_fts_insert")
+    op.execute("DROP TABLE todos_fts")
@@ -0,0 +1,73 @@
+"""Add trigger-maintained per-owner todo statistics
+
+Revision ID: d41f8a27c6e3
+Revises: b7d93e5f0a14
+Create Date: 2026-10-18 17:32:51.804117
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d41f8a27c6e3"
+down_revision: Union[str, None] = "b7d93e5f0a14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INCREMENT = (
+    "INSERT INTO todo_stats(owner_id, priority, complete, count) "
+    "SELECT new.owner_id, ifnull(new.priority, 0), ifnull(new.complete, 0), 1 "
+    "WHERE new.owner_id IS NOT NULL "
+    "ON CONFLICT(owner_id, priority, complete) DO UPDATE SET count = count + 1; "
+)
+DECREMENT = (
+    "UPDATE todo_stats SET count = count - 1 WHERE owner_id = old.owner_id "
+    "AND priority = ifnull(old.priority, 0) "
+    "AND complete = ifnull(old.complete, 0); "
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "todo_stats",
+        sa.Column("owner_id", sa.Integer(), primary_key=True),
+        sa.Column("priority", sa.Integer(), primary_key=True),
+        sa.Column("complete", sa.Boolean(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            "CREATE TRIGGER todo_stats_insert AFTER INSERT ON todos BEGIN "
+            + INCREMENT
+            + "END"
+        )
+        op.execute(
+            "CREATE TRIGGER todo_stats_delete AFTER DELETE ON todos BEGIN "
+            + DECREMENT
+            + "END"
+        )
+        op.execute(
+            "CREATE TRIGGER todo_stats_update AFTER UPDATE OF "
+            "priority, complete, owner_id ON todos "
+            "WHEN old.priority IS NOT new.priority "
+            "OR old.complete IS NOT new.complete "
+            "OR old.owner_id IS NOT new.owner_id BEGIN " + DECREMENT + INCREMENT + "END"
+        )
+    op.execute(
+        "INSERT INTO todo_stats (owner_id, priority, complete, count) "
+        "SELECT owner_id, coalesce(priority, 0), coalesce(complete, false), "
+        "count(*) FROM todos WHERE owner_id IS NOT NULL "
+        "GROUP BY owner_id, coalesce(priority, 0), coalesce(complete, false)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER todo_stats_update")
+        op.execute("DROP TRIGGER todo_stats_delete")
+        op.execute("DROP TRIGGER todo_stats_insert")
+    op.drop_table("todo_stats")
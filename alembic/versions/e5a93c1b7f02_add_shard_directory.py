@@ -0,0 +1,33 @@
+"""Add the shard directory
+
+Revision ID: e5a93c1b7f02
+Revises: d41f8a27c6e3
+Create Date: 2026-10-18 21:04:37.512960
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a93c1b7f02"
+down_revision: Union[str, None] = "d41f8a27c6e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Every shard runs the same migrations; only shard 0's directory is used.
+    op.create_table(
+        "shard_directory",
+        sa.Column("owner_id", sa.Integer(), primary_key=True),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("moving", sa.Boolean(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("shard_directory")
@@ -0,0 +1,4 @@
+import time
+
+# Reference point for the import-to-ready startup metric.
+IMPORTED_AT = time.perf_counter()
@@ -1,12 +1,125 @@
+from functools import cache
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env")
     DATABASE_URL: str
+    # Optional explicit URL for the async engine, e.g.
+    # ``postgresql+asyncpg://...``; derived from DATABASE_URL when unset.
+    ASYNC_DATABASE_URL: Optional[str] = None
     SECRET_KEY: str
     ALGORITHM: str
     TEST_DATABASE_URL: str
+    # Extra databases that todos are sharded across by owner, as a JSON list
+    # of URLs; DATABASE_URL is shard 0 and keeps the users and the shard
+    # directory. Owners are placed by a stable hash of their id unless the
+    # directory says otherwise (see ``python -m app.db.rebalance``).
+    DATABASE_SHARD_URLS: list[str] = []
+    # How long a worker trusts its copy of an owner's directory entry.
+    SHARD_DIRECTORY_TTL_SECONDS: float = 2
+    # Connection pool of each engine (SQLite :memory: databases keep their
+    # single shared connection). Stale connections are replaced on checkout.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_PRE_PING: bool = True
+    # Read-only requests use a separate pool of query_only connections of this
+    # size; 0 sends them through the main pool. On SQLite, pairing it with a
+    # single writer (DB_POOL_SIZE=1, DB_MAX_OVERFLOW=0) queues a worker's
+    # writes on the pool rather than on the database lock.
+    DB_READ_POOL_SIZE: int = 0
+    # PRAGMAs applied to every new SQLite connection. WAL lets readers run
+    # alongside the single writer, and a busy timeout makes writers queue up
+    # instead of failing with "database is locked". A negative cache size is
+    # in KiB, a positive one in pages.
+    SQLITE_JOURNAL_MODE: Literal["delete", "truncate", "persist", "wal"] = "wal"
+    SQLITE_SYNCHRONOUS: Literal["off", "normal", "full", "extra"] = "normal"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -65536
+    SQLITE_MMAP_SIZE: int = 268_435_456
+    # Single-todo writes from concurrent requests are committed together when
+    # this is above 0: a write waits up to this long (or until the batch is
+    # full) for others to share its transaction. 0 commits each on its own.
+    GROUP_COMMIT_WINDOW_MS: float = 0
+    GROUP_COMMIT_MAX_BATCH: int = 64
+    # Completed todos untouched for this many days move to the archive table.
+    # A compaction pass runs every ARCHIVE_INTERVAL_SECONDS and moves them
+    # ARCHIVE_BATCH_SIZE per transaction; 0 days turns it off.
+    ARCHIVE_AFTER_DAYS: float = 30
+    ARCHIVE_BATCH_SIZE: int = 500
+    ARCHIVE_INTERVAL_SECONDS: float = 300
+    # Admin jobs (/admin/jobs) run one at a time per worker, in transactions
+    # of ADMIN_JOB_BATCH_SIZE todos with a pause between them so user writes
+    # get the lock in between. A running job whose worker has not
+    # checkpointed for ADMIN_JOB_STALE_SECONDS is taken over by another.
+    ADMIN_JOB_BATCH_SIZE: int = 500
+    ADMIN_JOB_PAUSE_MS: float = 50
+    ADMIN_JOB_POLL_SECONDS: float = 5
+    ADMIN_JOB_STALE_SECONDS: float = 60
+    # Admission control per route class (auth, reads, writes, admin): at most
+    # LIMIT requests run at once, QUEUE_SIZE more wait up to TIMEOUT seconds
+    # and the rest get a 503 straight away. A limit of 0 admits everything.
+    ADMISSION_AUTH_LIMIT: int = 8
+    ADMISSION_AUTH_QUEUE_SIZE: int = 32
+    ADMISSION_AUTH_TIMEOUT: float = 5
+    ADMISSION_READS_LIMIT: int = 64
+    ADMISSION_READS_QUEUE_SIZE: int = 256
+    ADMISSION_READS_TIMEOUT: float = 5
+    ADMISSION_WRITES_LIMIT: int = 32
+    ADMISSION_WRITES_QUEUE_SIZE: int = 128
+    ADMISSION_WRITES_TIMEOUT: float = 5
+    ADMISSION_ADMIN_LIMIT: int = 4
+    ADMISSION_ADMIN_QUEUE_SIZE: int = 16
+    ADMISSION_ADMIN_TIMEOUT: float = 30
+    # Sign-in and sign-up attempts per client address; 0 disables the limit.
+    AUTH_RATE_LIMIT_PER_MINUTE: float = 30
+    AUTH_RATE_LIMIT_BURST: int = 10
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 20
+    TOKEN_CACHE_SIZE: int = 10_000
+    # User profiles (never password hashes) kept per process; 0 disables.
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL_SECONDS: float = 60
+    # Serialized GET /todos/ pages kept per process; 0 disables the cache.
+    LIST_CACHE_SIZE: int = 1024
+    # Response bodies of at least this many bytes are compressed with the
+    # first of zstd, br and gzip the client accepts; 0 turns it off.
+    COMPRESSION_MIN_BYTES: int = 1024
+    # Change feed: per-subscriber queue bound, and an optional
+    # sqlite:///path/events.db bus shared by the workers of one host.
+    EVENT_QUEUE_SIZE: int = 100
+    EVENT_BUS_URL: Optional[str] = None
+    EVENT_BUS_POLL_MS: float = 100
+    # Statements slower than this are logged; disabled when unset.
+    SLOW_QUERY_MS: Optional[float] = None
+    # bcrypt runs on a bounded worker pool; requests beyond workers + queue
+    # size are rejected with a 503.
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    BCRYPT_ROUNDS: int = 12
+    # When set, BCRYPT_ROUNDS is recalibrated at startup to hit this latency.
+    BCRYPT_TARGET_MS: Optional[float] = None
+
+
+@cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class LazySettings:
+    """Module-level handle that loads the settings on first attribute access.
+
+    Importing the models, migrations, crud and CLI helpers under ``app.db``
+    therefore needs no environment. ``app.main`` and the service singletons
+    under ``app.services`` do read the environment when imported, though
+    they do no I/O.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
 
 
-settings = Settings()
+settings = LazySettings()
@@ -0,0 +1,413 @@
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import (
+    DateTime,
+    bindparam,
+    delete,
+    event,
+    func,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import (
+    ArchivedTodos,
+    TodoIdSequences,
+    Todos,
+    TodoSyncVersions,
+    TodoTombstones,
+)
+
+# Set-based writes go through the Core table so that a list of parameter
+# sets runs as a single executemany instead of per-object ORM flushes.
+todos_table = Todos.__table__
+versions_table = TodoSyncVersions.__table__
+tombstones_table = TodoTombstones.__table__
+archive_table = ArchivedTodos.__table__
+sequences_table = TodoIdSequences.__table__
+
+# Columns a todo keeps when it moves between the hot table and the archive.
+TIERED_FIELDS = tuple(column.key for column in todos_table.columns)
+
+UPDATABLE_FIELDS = ("title", "description", "priority", "complete")
+
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Every write below records (action, owner_id, todo_id) on the session; the
+# listeners only see them once the transaction has committed.
+change_listeners: list[Callable[[list[tuple]], None]] = []
+
+
+def add_change_listener(listener: Callable[[list[tuple]], None]):
+    change_listeners.append(listener)
+
+
+def record_changes(db: AsyncSession, changes: list[tuple]):
+    db.info.setdefault("todo_changes", []).extend(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def dispatch_changes(session: Session):
+    session.info.pop("todo_versions", None)
+    changes = session.info.pop("todo_changes", None)
+    if changes:
+        for listener in change_listeners:
+            listener(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_changes(session: Session):
+    session.info.pop("todo_versions", None)
+    session.info.pop("todo_changes", None)
+
+
+async def next_version(db: AsyncSession, owner_id: int) -> int:
+    """Return the owner's change version for the current transaction.
+
+    The counter row is bumped once per transaction and stays locked until
+    commit, so versions are handed out in commit order for each owner.
+    """
+    versions = db.info.setdefault("todo_versions", {})
+    if owner_id not in versions:
+        connection = await db.connection()
+        upsert = UPSERT_DIALECTS[connection.dialect.name](versions_table)
+        versions[owner_id] = await db.scalar(
+            upsert.values(owner_id=owner_id, version=1)
+            .on_conflict_do_update(
+                index_elements=[versions_table.c.owner_id],
+                set_={"version": versions_table.c.version + 1},
+            )
+            .returning(versions_table.c.version)
+        )
+    return versions[owner_id]
+
+
+async def read_version(db: AsyncSession, owner_id: int) -> int:
+    """The owner's latest committed change version; 0 before any write."""
+    version = await db.scalar(
+        select(versions_table.c.version).where(versions_table.c.owner_id == owner_id)
+    )
+    return version or 0
+
+
+async def allocate_todo_ids(db: AsyncSession, count: int) -> int:
+    """Reserve ``count`` ids from this shard's range and return the first.
+
+    The shard's sequence row is created on first use, past every id the
+    shard's todos, archive and tombstones hold. Shards are SQLite files, so
+    the write lock taken by next_version is already held.
+    """
+    shard = db.info["shard"]
+    low, high = db.info["todo_id_range"]
+    last = await db.scalar(
+        select(sequences_table.c.last_id).where(sequences_table.c.shard == shard)
+    )
+    if last is None:
+        last = low - 1
+        for column in (
+            todos_table.c.id,
+            archive_table.c.id,
+            tombstones_table.c.todo_id,
+        ):
+            highest = await db.scalar(
+                select(func.max(column)).where(column.between(low, high))
+            )
+            if highest is not None:
+                last = max(last, highest)
+    connection = await db.connection()
+    upsert = UPSERT_DIALECTS[connection.dialect.name](sequences_table)
+    await db.execute(
+        upsert.values(shard=shard, last_id=last + count).on_conflict_do_update(
+            index_elements=[sequences_table.c.shard],
+            set_={"last_id": last + count},
+        )
+    )
+    return last + 1
+
+
+async def insert_todos(db: AsyncSession, owner_id: int, todos: list[dict]) -> list[int]:
+    """Insert ``todos`` for ``owner_id`` and return their ids in input order."""
+    if not todos:
+        return []
+    stamp = {
+        "owner_id": owner_id,
+        "version": await next_version(db, owner_id),
+        "updated_at": datetime.now(timezone.utc),
+    }
+    rows = [{**todo, **stamp} for todo in todos]
+    if db.info.get("todo_id_range") is not None:
+        # Sharded: ids come from this shard's own range.
+        first = await allocate_todo_ids(db, len(rows))
+        rows = [{**row, "id": first + index} for index, row in enumerate(rows)]
+    result = await db.execute(
+        insert(todos_table).returning(todos_table.c.id, sort_by_parameter_order=True),
+        rows,
+    )
+    todo_ids = list(result.scalars())
+    record_changes(db, [("created", owner_id, todo_id) for todo_id in todo_ids])
+    return todo_ids
+
+
+async def update_todos(db: AsyncSession, owner_id: int, todos: list[dict]) -> set[int]:
+    """Apply partial updates; ``None`` fields keep their stored value.
+
+    Each dict carries the todo ``id``. Returns the ids that exist and belong
+    to ``owner_id``; the others are left untouched.
+    """
+    requested_ids = {todo["id"] for todo in todos}
+    found_ids = set(
+        await db.scalars(
+            select(todos_table.c.id)
+            .where(todos_table.c.owner_id == owner_id)
+            .where(todos_table.c.id.in_(requested_ids))
+        )
+    )
+    if len(found_ids) < len(requested_ids):
+        found_ids |= await restore_todos(db, owner_id, requested_ids - found_ids)
+    if found_ids:
+        statement = (
+            update(todos_table)
+            .where(todos_table.c.id == bindparam("todo_id"))
+            .values(
+                {
+                    field: func.coalesce(bindparam(field), todos_table.c[field])
+                    for field in UPDATABLE_FIELDS
+                }
+            )
+            .values(
+                version=await next_version(db, owner_id),
+                updated_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.execute(
+            statement,
+            [
+                {"todo_id": todo["id"], **{f: todo.get(f) for f in UPDATABLE_FIELDS}}
+                for todo in todos
+                if todo["id"] in found_ids
+            ],
+        )
+        record_changes(db, [("updated", owner_id, todo_id) for todo_id in found_ids])
+    return found_ids
+
+
+async def update_todo(
+    db: AsyncSession, owner_id: int, todo_id: int, changes: dict
+) -> bool:
+    """Update one todo in a single round trip; ``False`` if it was not found."""
+    if not changes:
+        for table in (todos_table, archive_table):
+            found = await db.scalar(
+                select(table.c.id)
+                .where(table.c.id == todo_id)
+                .where(table.c.owner_id == owner_id)
+            )
+            if found is not None:
+                return True
+        return False
+    statement = (
+        update(todos_table)
+        .where(todos_table.c.id == todo_id)
+        .where(todos_table.c.owner_id == owner_id)
+        .values(
+            **changes,
+            version=await next_version(db, owner_id),
+            updated_at=datetime.now(timezone.utc),
+        )
+        .returning(todos_table.c.id)
+    )
+    updated = await db.scalar(statement)
+    if updated is None:
+        # Archived todos are only looked up once the hot table misses.
+        if not await restore_todos(db, owner_id, {todo_id}):
+            return False
+        await db.execute(statement)
+    record_changes(db, [("updated", owner_id, todo_id)])
+    return True
+
+
+async def delete_todos(
+    db: AsyncSession,
+    owner_id: Optional[int],
+    ids: list[int],
+    complete_only: bool = False,
+) -> dict[int, int]:
+    """Delete the given todos and map each removed id to its owner.
+
+    ``owner_id=None`` deletes regardless of owner (admin access), and
+    ``complete_only`` skips todos that are not complete. Archived todos are
+    deleted too. A tombstone is left for every deleted todo so delta sync can
+    report it.
+    """
+    if not ids:
+        return {}
+    statement = delete(todos_table).where(todos_table.c.id.in_(set(ids)))
+    if owner_id is not None:
+        statement = statement.where(todos_table.c.owner_id == owner_id)
+    if complete_only:
+        statement = statement.where(todos_table.c.complete.is_(True))
+    result = await db.execute(
+        statement.returning(todos_table.c.id, todos_table.c.owner_id)
+    )
+    deleted = {todo_id: owner_id for todo_id, owner_id in result}
+    if len(deleted) < len(set(ids)):
+        statement = delete(archive_table).where(
+            archive_table.c.id.in_(set(ids) - deleted.keys())
+        )
+        if owner_id is not None:
+            statement = statement.where(archive_table.c.owner_id == owner_id)
+        if complete_only:
+            statement = statement.where(archive_table.c.complete.is_(True))
+        result = await db.execute(
+            statement.returning(archive_table.c.id, archive_table.c.owner_id)
+        )
+        deleted.update({todo_id: owner_id for todo_id, owner_id in result})
+    if deleted:
+        deleted_at = datetime.now(timezone.utc)
+        await db.execute(
+            insert(tombstones_table),
+            [
+                {
+                    "todo_id": todo_id,
+                    "owner_id": owner_id,
+                    "version": await next_version(db, owner_id),
+                    "deleted_at": deleted_at,
+                }
+                for todo_id, owner_id in deleted.items()
+            ],
+        )
+    record_changes(
+        db, [("deleted", owner_id, todo_id) for todo_id, owner_id in deleted.items()]
+    )
+    return deleted
+
+
+async def archive_todos(
+    db: AsyncSession,
+    completed_before: datetime,
+    limit: int,
+    owner_filter: Optional[Callable[[set[int]], Awaitable[set[int]]]] = None,
+) -> int:
+    """Move up to ``limit`` todos completed before ``completed_before`` to the
+    archive; returns how many moved.
+
+    ``owner_filter`` picks, from the owners of the todos that are due, those
+    whose todos may be moved now. Nothing about the todo changes, so it
+    keeps its version and gets no tombstone: delta sync keeps reporting it
+    as it was. The owner's counter is still bumped, since the default list
+    no longer shows the todo.
+    """
+    rows = (
+        await db.execute(
+            select(todos_table.c.id, todos_table.c.owner_id)
+            .where(todos_table.c.complete.is_(True))
+            .where(todos_table.c.updated_at < completed_before)
+            .order_by(todos_table.c.updated_at)
+            .limit(limit)
+        )
+    ).all()
+    if owner_filter is not None:
+        owners = await owner_filter({owner_id for _, owner_id in rows})
+        rows = [row for row in rows if row.owner_id in owners]
+    if not rows:
+        return 0
+    ids = [todo_id for todo_id, _ in rows]
+    archived_at = literal(datetime.now(timezone.utc), DateTime(timezone=True))
+    await db.execute(
+        insert(archive_table).from_select(
+            [*TIERED_FIELDS, "archived_at"],
+            select(
+                *(todos_table.c[field] for field in TIERED_FIELDS), archived_at
+            ).where(todos_table.c.id.in_(ids)),
+        )
+    )
+    await db.execute(delete(todos_table).where(todos_table.c.id.in_(ids)))
+    for owner_id in {owner_id for _, owner_id in rows}:
+        await next_version(db, owner_id)
+    record_changes(db, [("archived", owner_id, todo_id) for todo_id, owner_id in rows])
+    return len(rows)
+
+
+async def restore_todos(db: AsyncSession, owner_id: int, ids: set[int]) -> set[int]:
+    """Move the owner's archived todos among ``ids`` back to the hot table."""
+    found_ids = set(
+        await db.scalars(
+            select(archive_table.c.id)
+            .where(archive_table.c.owner_id == owner_id)
+            .where(archive_table.c.id.in_(ids))
+        )
+    )
+    if found_ids:
+        await db.execute(
+            insert(todos_table).from_select(
+                TIERED_FIELDS,
+                select(*(archive_table.c[field] for field in TIERED_FIELDS)).where(
+                    archive_table.c.id.in_(found_ids)
+                ),
+            )
+        )
+        await db.execute(delete(archive_table).where(archive_table.c.id.in_(found_ids)))
+    return found_ids
+
+
+async def reassign_todos(
+    db: AsyncSession, owner_id: int, new_owner_id: int, ids: set[int]
+) -> set[int]:
+    """Give the owner's todos among ``ids`` to ``new_owner_id``.
+
+    Archived todos move back to the hot table first. For delta sync the
+    todos are deleted for the old owner and changed for the new one.
+    """
+    found_ids = set(
+        await db.scalars(
+            select(todos_table.c.id)
+            .where(todos_table.c.owner_id == owner_id)
+            .where(todos_table.c.id.in_(ids))
+        )
+    )
+    if len(found_ids) < len(ids):
+        found_ids |= await restore_todos(db, owner_id, ids - found_ids)
+    if not found_ids:
+        return found_ids
+    now = datetime.now(timezone.utc)
+    # The owner is checked again by the update itself, so a todo that
+    # changed hands since it was looked up is left alone.
+    result = await db.execute(
+        update(todos_table)
+        .where(todos_table.c.id.in_(found_ids))
+        .where(todos_table.c.owner_id == owner_id)
+        .values(
+            owner_id=new_owner_id,
+            version=await next_version(db, new_owner_id),
+            updated_at=now,
+        )
+        .returning(todos_table.c.id)
+    )
+    found_ids = set(result.scalars())
+    if not found_ids:
+        return found_ids
+    version = await next_version(db, owner_id)
+    await db.execute(
+        insert(tombstones_table),
+        [
+            {
+                "todo_id": todo_id,
+                "owner_id": owner_id,
+                "version": version,
+                "deleted_at": now,
+            }
+            for todo_id in found_ids
+        ],
+    )
+    record_changes(
+        db,
+        [("deleted", owner_id, todo_id) for todo_id in found_ids]
+        + [("updated", new_owner_id, todo_id) for todo_id in found_ids],
+    )
+    return found_ids
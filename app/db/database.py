@@ -1,31 +1,190 @@
+from functools import cache
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Session, sessionmaker
 
 from ..config.settings import settings
+from .instrumentation import instrument_engine
 
-engine = create_engine(
-    url=settings.DATABASE_URL,
-    connect_args={
-        "check_same_thread": False,
-    },
-)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Return ``url`` with its driver swapped for the matching async driver."""
+    parsed = make_url(url)
+    if parsed.drivername in ASYNC_DRIVERS:
+        parsed = parsed.set(drivername=ASYNC_DRIVERS[parsed.drivername])
+    return parsed.render_as_string(hide_password=False)
+
+
+def pool_options(url: str, pool_size: int) -> dict:
+    """Pool sizing from settings for an engine on ``url``."""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (
+        None,
+        "",
+        ":memory:",
+    ):
+        return options
+    return {
+        **options,
+        "pool_size": pool_size,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def sqlite_pragmas(read_only: bool = False) -> list[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size = {settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}",
+    ]
+    if read_only:
+        # The journal mode is a property of the database file; read
+        # connections only have to refuse writes.
+        return pragmas + ["PRAGMA query_only = ON"]
+    return [f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}"] + pragmas
+
+
+def configure_sqlite(engine: Engine, read_only: bool = False):
+    """Apply the SQLite profile from settings to each new connection."""
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+# Todo ids are allocated from a separate range on every shard, so a user's
+# todos keep their ids when the user is moved to another shard.
+SHARD_ID_SPAN = 2**40
+
+
+def shard_urls() -> list[str]:
+    """Database of each shard; shard 0 is DATABASE_URL and also holds users."""
+    return [settings.DATABASE_URL, *settings.DATABASE_SHARD_URLS]
+
+
+def todo_id_range(shard: int) -> tuple[int, int]:
+    return shard * SHARD_ID_SPAN + 1, (shard + 1) * SHARD_ID_SPAN
 
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Every engine built so far, for ``dispose_engines``.
+_engines: list = []
+
+
+# Engines are built on first use, normally by the app's lifespan, rather than
+# at import: importing the app, a model or a script never opens a pool.
+@cache
+def get_engine(shard: int = 0) -> Engine:
+    """Sync engine for scripts and schema checks; requests use the async ones."""
+    url = shard_urls()[shard]
+    engine = create_engine(
+        url=url,
+        connect_args={
+            "check_same_thread": False,
+        },
+        **pool_options(url, settings.DB_POOL_SIZE),
+    )
+    configure_sqlite(engine)
+    instrument_engine(engine)
+    _engines.append(engine)
+    return engine
+
+
+def async_url(shard: int = 0) -> str:
+    if shard == 0 and settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return async_database_url(shard_urls()[shard])
+
+
+@cache
+def get_async_engine(shard: int = 0) -> AsyncEngine:
+    url = async_url(shard)
+    engine = create_async_engine(url=url, **pool_options(url, settings.DB_POOL_SIZE))
+    configure_sqlite(engine.sync_engine)
+    instrument_engine(engine.sync_engine)
+    _engines.append(engine)
+    return engine
+
+
+@cache
+def get_read_engine(shard: int = 0) -> AsyncEngine:
+    """Engine for read-only requests (see DB_READ_POOL_SIZE).
+
+    With a read pool configured they never wait for a connection held by a
+    writer; otherwise this is the main async engine.
+    """
+    if settings.DB_READ_POOL_SIZE <= 0:
+        return get_async_engine(shard)
+    url = async_url(shard)
+    engine = create_async_engine(
+        url=url, **pool_options(url, settings.DB_READ_POOL_SIZE)
+    )
+    configure_sqlite(engine.sync_engine, read_only=True)
+    instrument_engine(engine.sync_engine)
+    _engines.append(engine)
+    return engine
+
+
+@cache
+def get_sessionmaker(read_only: bool = False, shard: int = 0) -> async_sessionmaker:
+    info = {"shard": shard}
+    if len(shard_urls()) > 1:
+        info["todo_id_range"] = todo_id_range(shard)
+    return async_sessionmaker(
+        bind=get_read_engine(shard) if read_only else get_async_engine(shard),
+        autoflush=False,
+        expire_on_commit=False,
+        info=info,
+    )
+
+
+async def dispose_engines():
+    """Close every pool that was opened; later use builds fresh engines."""
+    for engine in reversed(_engines):
+        if isinstance(engine, AsyncEngine):
+            await engine.dispose()
+        else:
+            engine.dispose()
+    _engines.clear()
+    for getter in (get_sessionmaker, get_read_engine, get_async_engine, get_engine):
+        getter.cache_clear()
+
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with get_sessionmaker()() as db:
+        yield db
+
+
+async def get_read_db():
+    async with get_sessionmaker(read_only=True)() as db:
         yield db
-    finally:
-        db.close()
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# For handlers that never write; see DB_READ_POOL_SIZE.
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
@@ -0,0 +1,71 @@
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config.settings import settings
+from ..services.metrics import DB_STATEMENT_DURATION
+
+logger = logging.getLogger(__name__)
+
+# [statement count, seconds] for the request being served, set by
+# MetricsMiddleware; None outside of a request.
+request_queries: ContextVar[Optional[list]] = ContextVar(
+    "request_queries", default=None
+)
+
+# Caps the number of distinct statement labels exported to Prometheus.
+MAX_STATEMENT_LABELS = 500
+
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_GROUP = re.compile(r"\((?:\s*\?\s*,)*\s*\?\s*\)")
+_REPEATED_GROUPS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_POSTCOMPILE = re.compile(r"\(?__\[POSTCOMPILE_\w+\]\)?")
+_statement_labels: set[str] = set()
+
+
+def normalize_statement(statement: str) -> str:
+    """Collapse literals, IN lists and multi-row VALUES to one shape."""
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _POSTCOMPILE.sub("(?)", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PLACEHOLDER_GROUP.sub("(?)", normalized)
+    normalized = _REPEATED_GROUPS.sub("(?)", normalized)
+    if normalized not in _statement_labels:
+        if len(_statement_labels) >= MAX_STATEMENT_LABELS:
+            return "other"
+        _statement_labels.add(normalized)
+    return normalized
+
+
+# The start time is kept on the statement's execution context rather than on
+# the pooled connection, so a statement that raises leaves nothing behind.
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_start_time = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    elapsed = time.perf_counter() - context.query_start_time
+    normalized = normalize_statement(statement)
+    DB_STATEMENT_DURATION.observe(normalized, value=elapsed)
+
+    queries = request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+        queries[1] += elapsed
+
+    if settings.SLOW_QUERY_MS is not None and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1fms): %s", elapsed * 1000, normalized)
+
+
+def instrument_engine(engine: Engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from sqlalchemy import column, inspect, select, table
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+MIGRATIONS_DIRECTORY = Path(__file__).resolve().parents[2] / "alembic"
+
+# The Alembic head this code expects. Kept as a constant so that startup
+# does not have to import Alembic and load every migration script (~0.4s);
+# a test checks it against the scripts whenever a migration is added.
+SCHEMA_REVISION = "6eb9765550a0"
+# The last revision whose schema matches what create_all built before the
+# migrations took over; such databases are stamped with it, then upgraded.
+CREATE_ALL_REVISION = "39c0a7d0cae6"
+
+alembic_version = table("alembic_version", column("version_num"))
+
+
+def migration_heads() -> set[str]:
+    """Heads of the migration scripts on disk; slow, for tests and tooling."""
+    from alembic.script import ScriptDirectory
+
+    return set(ScriptDirectory(str(MIGRATIONS_DIRECTORY)).get_heads())
+
+
+def current_revisions(connection) -> set[str]:
+    if not inspect(connection).has_table("alembic_version"):
+        return set()
+    return set(connection.scalars(select(alembic_version.c.version_num)))
+
+
+async def verify_schema(engine: AsyncEngine):
+    """Refuse to serve a database that is not migrated to SCHEMA_REVISION.
+
+    The schema is owned by the migrations; the app only reads the recorded
+    revision instead of inspecting and creating every table on each boot.
+    """
+    async with engine.connect() as connection:
+        current = await connection.run_sync(current_revisions)
+    if not current:
+        raise RuntimeError(
+            "Database has no Alembic revision; run `alembic upgrade head`. If "
+            "its tables were created by an older release that ran create_all, "
+            f"run `alembic stamp {CREATE_ALL_REVISION}` first."
+        )
+    if current != {SCHEMA_REVISION}:
+        raise RuntimeError(
+            f"Database schema is at {', '.join(sorted(current))} but the app "
+            f"expects {SCHEMA_REVISION}; run `alembic upgrade head`."
+        )
@@ -1,4 +1,14 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    event,
+)
 
 from .database import Base
 
@@ -25,3 +35,253 @@ class Todos(Base):
     priority = Column(Integer)
     complete = Column(Boolean, default=False)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    # Per-owner change version, see TodoSyncVersions.
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_todos_owner_id_id", "owner_id", "id"),
+        Index("ix_todos_owner_id_version_id", "owner_id", "version", "id"),
+        Index("ix_todos_owner_id_complete_id", "owner_id", "complete", "id"),
+        Index("ix_todos_owner_id_priority_id", "owner_id", "priority", "id"),
+        Index(
+            "ix_todos_owner_id_complete_priority_id",
+            "owner_id",
+            "complete",
+            "priority",
+            "id",
+        ),
+        # Finds the completed todos that are due for the archive.
+        Index("ix_todos_complete_updated_at", "complete", "updated_at"),
+        # Ids are never reused, so a new todo cannot take the id of an
+        # archived or deleted one.
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ArchivedTodos(Base):
+    """Completed todos moved out of ``todos`` once they are old enough.
+
+    Rows keep their id and version and never change here: updating an
+    archived todo moves it back first. Only the lookups that reach the
+    archive are indexed.
+    """
+
+    __tablename__ = "archived_todos"
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    description = Column(String)
+    priority = Column(Integer)
+    complete = Column(Boolean)
+    owner_id = Column(Integer)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_archived_todos_owner_id_id", "owner_id", "id"),
+        Index("ix_archived_todos_owner_id_version_id", "owner_id", "version", "id"),
+    )
+
+
+class TodoSyncVersions(Base):
+    """Last change version handed out per owner; bumped once per transaction."""
+
+    __tablename__ = "todo_sync_versions"
+
+    owner_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+
+
+class TodoIdSequences(Base):
+    """Last todo id a shard handed out from its own range.
+
+    Only used when sharded; it only ever grows, so the id of a deleted,
+    archived or moved-away todo is never handed out again.
+    """
+
+    __tablename__ = "todo_id_sequences"
+
+    shard = Column(Integer, primary_key=True)
+    last_id = Column(Integer, nullable=False)
+
+
+class TodoTombstones(Base):
+    __tablename__ = "todo_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    todo_id = Column(Integer, nullable=False)
+    owner_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index(
+            "ix_todo_tombstones_owner_id_version_todo_id",
+            "owner_id",
+            "version",
+            "todo_id",
+        ),
+    )
+
+
+class TodoStats(Base):
+    """Todo counts per owner, priority and completion state.
+
+    Maintained by triggers in the same transaction as the todo write; a
+    missing priority or completion flag is counted as 0 / not complete.
+    """
+
+    __tablename__ = "todo_stats"
+
+    owner_id = Column(Integer, primary_key=True)
+    priority = Column(Integer, primary_key=True)
+    complete = Column(Boolean, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+
+class ShardDirectory(Base):
+    """Owners placed on a shard explicitly instead of by hashing their id:
+    moved ones, and those pinned before a shard was added.
+
+    Only read on shard 0. ``moving`` is set while the rebalancer copies the
+    owner's todos; their writes are refused until it is cleared.
+    """
+
+    __tablename__ = "shard_directory"
+
+    owner_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, nullable=False)
+    moving = Column(Boolean, nullable=False, default=False, server_default="0")
+
+
+class AdminJobs(Base):
+    """Bulk maintenance submitted through /admin/jobs; only kept on shard 0.
+
+    The runner works through the todos of each shard in id order and records
+    how far it got after every batch, so a job resumes from ``shard`` and
+    ``checkpoint`` (the last todo id handled there) after a restart.
+    """
+
+    __tablename__ = "admin_jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    # JSON object of the kind's parameters.
+    params = Column(String, nullable=False)
+    # queued, running, succeeded, failed or cancelled.
+    status = Column(String, nullable=False)
+    shard = Column(Integer, nullable=False, default=0, server_default="0")
+    checkpoint = Column(Integer, nullable=False, default=0, server_default="0")
+    processed = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(String)
+    created_by = Column(Integer)
+    created_at = Column(DateTime(timezone=True))
+    # Bumped after every batch; a running job that stops being updated is
+    # taken over by another worker.
+    updated_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (Index("ix_admin_jobs_status_id", "status", "id"),)
+
+
+# External-content FTS5 index over todos. owner_id is indexed as a token so
+# that scoping a search to one owner is a posting-list intersection rather
+# than a post-filter over every match in the table.
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5("
+    "title, description, owner_id, content='todos', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN "
+    "INSERT INTO todos_fts(rowid, title, description, owner_id) "
+    "VALUES (new.id, new.title, new.description, new.owner_id); END",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title, description, owner_id) "
+    "VALUES ('delete', old.id, old.title, old.description, old.owner_id); END",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF "
+    "title, description, owner_id ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title, description, owner_id) "
+    "VALUES ('delete', old.id, old.title, old.description, old.owner_id); "
+    "INSERT INTO todos_fts(rowid, title, description, owner_id) "
+    "VALUES (new.id, new.title, new.description, new.owner_id); END",
+)
+
+for statement in FTS_DDL:
+    event.listen(
+        Todos.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+
+
+# Each trigger moves one todo between (owner_id, priority, complete) buckets.
+# INSERT ... SELECT with a WHERE clause so the upsert can skip ownerless rows.
+STATS_INCREMENT = (
+    "INSERT INTO todo_stats(owner_id, priority, complete, count) "
+    "SELECT new.owner_id, ifnull(new.priority, 0), ifnull(new.complete, 0), 1 "
+    "WHERE new.owner_id IS NOT NULL "
+    "ON CONFLICT(owner_id, priority, complete) DO UPDATE SET count = count + 1; "
+)
+STATS_DECREMENT = (
+    "UPDATE todo_stats SET count = count - 1 WHERE owner_id = old.owner_id "
+    "AND priority = ifnull(old.priority, 0) "
+    "AND complete = ifnull(old.complete, 0); "
+)
+STATS_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS todo_stats_insert AFTER INSERT ON todos BEGIN "
+    + STATS_INCREMENT
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS todo_stats_delete AFTER DELETE ON todos BEGIN "
+    + STATS_DECREMENT
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS todo_stats_update AFTER UPDATE OF "
+    "priority, complete, owner_id ON todos "
+    "WHEN old.priority IS NOT new.priority OR old.complete IS NOT new.complete "
+    "OR old.owner_id IS NOT new.owner_id BEGIN "
+    + STATS_DECREMENT
+    + STATS_INCREMENT
+    + "END",
+    # Archived todos still count; moving one between the tiers nets out.
+    "CREATE TRIGGER IF NOT EXISTS archived_todo_stats_insert AFTER INSERT ON "
+    "archived_todos BEGIN " + STATS_INCREMENT + "END",
+    "CREATE TRIGGER IF NOT EXISTS archived_todo_stats_delete AFTER DELETE ON "
+    "archived_todos BEGIN " + STATS_DECREMENT + "END",
+)
+
+# PostgreSQL keeps the same counters with one row-level trigger function.
+PG_STATS_DDL = (
+    "CREATE OR REPLACE FUNCTION todo_stats_apply() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP <> 'INSERT' AND OLD.owner_id IS NOT NULL THEN "
+    "UPDATE todo_stats SET count = count - 1 WHERE owner_id = OLD.owner_id "
+    "AND priority = coalesce(OLD.priority, 0) "
+    "AND complete = coalesce(OLD.complete, false); "
+    "END IF; "
+    "IF TG_OP <> 'DELETE' AND NEW.owner_id IS NOT NULL THEN "
+    "INSERT INTO todo_stats(owner_id, priority, complete, count) "
+    "VALUES (NEW.owner_id, coalesce(NEW.priority, 0), "
+    "coalesce(NEW.complete, false), 1) "
+    "ON CONFLICT (owner_id, priority, complete) "
+    "DO UPDATE SET count = todo_stats.count + 1; "
+    "END IF; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql",
+    *(
+        statement
+        for table in ("todos", "archived_todos")
+        for statement in (
+            f"CREATE TRIGGER {table}_stats_insert_delete AFTER INSERT OR DELETE "
+            f"ON {table} FOR EACH ROW EXECUTE FUNCTION todo_stats_apply()",
+            f"CREATE TRIGGER {table}_stats_update AFTER UPDATE OF "
+            f"priority, complete, owner_id ON {table} FOR EACH ROW "
+            "WHEN (OLD.priority IS DISTINCT FROM NEW.priority "
+            "OR OLD.complete IS DISTINCT FROM NEW.complete "
+            "OR OLD.owner_id IS DISTINCT FROM NEW.owner_id) "
+            "EXECUTE FUNCTION todo_stats_apply()",
+        )
+    ),
+)
+
+# The triggers touch both tables, so they wait until the whole schema exists.
+for dialect, statements in (("sqlite", STATS_DDL), ("postgresql", PG_STATS_DDL)):
+    for statement in statements:
+        event.listen(
+            Base.metadata, "after_create", DDL(statement).execute_if(dialect=dialect)
+        )
@@ -0,0 +1,69 @@
+import base64
+import binascii
+import heapq
+import json
+from itertools import islice
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Malformed cursor.")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Cursor does not match the requested sort order.")
+    if not all(isinstance(value, (str, int, float, type(None))) for value in values):
+        raise ValueError("Malformed cursor.")
+    return values
+
+
+def after_cursor(query, columns: tuple, descending: bool, cursor):
+    if cursor is None:
+        return query
+    values = decode_cursor(cursor, len(columns))
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    bound = tuple_(*values) if len(values) > 1 else values[0]
+    return query.filter(key < bound if descending else key > bound)
+
+
+def apply_keyset(query, columns: tuple, descending: bool, cursor, limit: int):
+    """Restrict ``query`` to the page that starts right after ``cursor``.
+
+    One extra row is fetched so that ``split_page`` can tell whether a next
+    page exists without issuing a COUNT.
+    """
+    query = after_cursor(query, columns, descending, cursor)
+    order_by = [column.desc() if descending else column.asc() for column in columns]
+    return query.order_by(*order_by).limit(limit + 1)
+
+
+def split_page(rows: list, columns: tuple, limit: int):
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor([getattr(last, column.key) for column in columns])
+
+
+def merge_pages(pages: list[list], columns: tuple, descending: bool, limit: int):
+    """Combine pages fetched with ``apply_keyset`` from several sources, e.g.
+    shards or the archive, into the first ``limit + 1`` rows of their union.
+    """
+    keys = [column.key for column in columns]
+
+    def sort_key(row):
+        # NULLs sort first, as in SQLite, and never get compared with values.
+        return tuple(
+            (getattr(row, key) is not None, getattr(row, key) or 0) for key in keys
+        )
+
+    merged = heapq.merge(*pages, key=sort_key, reverse=descending)
+    return list(islice(merged, limit + 1))
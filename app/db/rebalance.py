@@ -0,0 +1,292 @@
+import argparse
+import time
+from typing import Optional
+
+from sqlalchemy import Connection, delete, insert, select
+
+from ..config.settings import settings
+from .crud import UPSERT_DIALECTS
+from .database import get_engine, shard_urls
+from .models import (
+    ArchivedTodos,
+    ShardDirectory,
+    Todos,
+    TodoStats,
+    TodoSyncVersions,
+    TodoTombstones,
+    Users,
+)
+from .sharding import Placement, jump_hash
+
+todos_table = Todos.__table__
+archive_table = ArchivedTodos.__table__
+tombstones_table = TodoTombstones.__table__
+versions_table = TodoSyncVersions.__table__
+directory_table = ShardDirectory.__table__
+
+COPY_BATCH_SIZE = 5000
+
+
+def default_wait() -> float:
+    # Long enough for every worker's cached placement to expire, twice over.
+    return 2 * settings.SHARD_DIRECTORY_TTL_SECONDS + 1
+
+
+def read_placement(directory: Connection, owner_id: int, shards: int) -> Placement:
+    row = directory.execute(
+        select(directory_table.c.shard, directory_table.c.moving).where(
+            directory_table.c.owner_id == owner_id
+        )
+    ).first()
+    if row is None:
+        return Placement(jump_hash(owner_id, shards))
+    return Placement(row.shard, bool(row.moving))
+
+
+def set_placement(directory: Connection, owner_id: int, placement: Placement):
+    upsert = UPSERT_DIALECTS[directory.dialect.name](directory_table).values(
+        owner_id=owner_id, shard=placement.shard, moving=placement.moving
+    )
+    directory.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[directory_table.c.owner_id],
+            set_={"shard": placement.shard, "moving": placement.moving},
+        )
+    )
+
+
+def owner_version(connection: Connection, owner_id: int) -> int:
+    version = connection.scalar(
+        select(versions_table.c.version).where(versions_table.c.owner_id == owner_id)
+    )
+    return version or 0
+
+
+def set_owner_version(connection: Connection, owner_id: int, version: int):
+    connection.execute(
+        delete(versions_table).where(versions_table.c.owner_id == owner_id)
+    )
+    if version:
+        connection.execute(
+            insert(versions_table).values(owner_id=owner_id, version=version)
+        )
+
+
+def purge_owner(connection: Connection, owner_id: int):
+    """Remove everything the shard holds for ``owner_id``, in batches."""
+    while True:
+        with connection.begin():
+            ids = connection.scalars(
+                select(todos_table.c.id)
+                .where(todos_table.c.owner_id == owner_id)
+                .limit(COPY_BATCH_SIZE)
+            ).all()
+            if not ids:
+                break
+            connection.execute(delete(todos_table).where(todos_table.c.id.in_(ids)))
+    with connection.begin():
+        connection.execute(
+            delete(archive_table).where(archive_table.c.owner_id == owner_id)
+        )
+        connection.execute(
+            delete(tombstones_table).where(tombstones_table.c.owner_id == owner_id)
+        )
+        # The delete triggers leave the owner's counters at zero.
+        connection.execute(
+            delete(TodoStats.__table__).where(TodoStats.owner_id == owner_id)
+        )
+        set_owner_version(connection, owner_id, 0)
+
+
+def copy_changes(
+    source: Connection, target: Connection, owner_id: int, since: Optional[int]
+) -> int:
+    """Copy the owner's todos and tombstones newer than version ``since`` (all
+    of them when None) and return the version copied up to.
+
+    Todos keep their ids and their tier. A todo deleted on the source since
+    the last copy is deleted on the target too.
+    """
+    with source.begin():
+        version = owner_version(source, owner_id)
+        todos = select(todos_table).where(todos_table.c.owner_id == owner_id)
+        archived = select(archive_table).where(archive_table.c.owner_id == owner_id)
+        tombstones = select(
+            *(column for column in tombstones_table.c if column.key != "id")
+        ).where(tombstones_table.c.owner_id == owner_id)
+        if since is not None:
+            todos = todos.where(todos_table.c.version > since)
+            archived = archived.where(archive_table.c.version > since)
+            tombstones = tombstones.where(tombstones_table.c.version > since)
+        todo_rows = [row._asdict() for row in source.execute(todos)]
+        archived_rows = [row._asdict() for row in source.execute(archived)]
+        tombstone_rows = [row._asdict() for row in source.execute(tombstones)]
+
+    with target.begin():
+        changed = [row["id"] for row in todo_rows + archived_rows]
+        changed += [row["todo_id"] for row in tombstone_rows]
+        for start in range(0, len(changed), COPY_BATCH_SIZE):
+            batch = changed[start : start + COPY_BATCH_SIZE]
+            for table in (todos_table, archive_table):
+                target.execute(delete(table).where(table.c.id.in_(batch)))
+        for table, rows in ((todos_table, todo_rows), (archive_table, archived_rows)):
+            for start in range(0, len(rows), COPY_BATCH_SIZE):
+                target.execute(insert(table), rows[start : start + COPY_BATCH_SIZE])
+        if tombstone_rows:
+            target.execute(insert(tombstones_table), tombstone_rows)
+        set_owner_version(target, owner_id, version)
+    return version
+
+
+def move_owner(owner_id: int, target_shard: int, wait: Optional[float] = None):
+    """Move an owner's todos to ``target_shard`` while the app keeps serving.
+
+    1. Copy everything to the target; the owner keeps reading and writing
+       the source meanwhile.
+    2. Mark the owner as moving and wait for every worker to see it, after
+       which their writes are refused (reads still go to the source).
+    3. Copy what changed during step 1.
+    4. Point the directory at the target and wait again, so no worker still
+       reads the source.
+    5. Delete the source's copy.
+
+    Todos keep their ids, which come from the range of the shard they were
+    created on. A shard never hands out an id twice (see TodoIdSequences),
+    so the copies cannot collide with the target's own todos.
+    """
+    wait = default_wait() if wait is None else wait
+    shards = len(shard_urls())
+    if not 0 <= target_shard < shards:
+        raise ValueError(f"No shard {target_shard}; there are {shards}.")
+
+    with get_engine(0).connect() as directory:
+        with directory.begin():
+            placement = read_placement(directory, owner_id, shards)
+        if placement.shard == target_shard:
+            if placement.moving:
+                # A move back that was interrupted before it started copying.
+                with directory.begin():
+                    set_placement(directory, owner_id, Placement(target_shard))
+            return
+        source_shard = placement.shard
+        with get_engine(source_shard).connect() as source, get_engine(
+            target_shard
+        ).connect() as target:
+            # Whatever an interrupted earlier move left on the target.
+            purge_owner(target, owner_id)
+            copied = copy_changes(source, target, owner_id, None)
+
+            with directory.begin():
+                set_placement(directory, owner_id, Placement(source_shard, True))
+            time.sleep(wait)
+            try:
+                copy_changes(source, target, owner_id, copied)
+            except Exception:
+                # The source is still complete; let the owner write to it again.
+                with directory.begin():
+                    set_placement(directory, owner_id, Placement(source_shard))
+                raise
+
+            with directory.begin():
+                set_placement(directory, owner_id, Placement(target_shard))
+            time.sleep(wait)
+            purge_owner(source, owner_id)
+
+
+def pin_owners(shards: int) -> int:
+    """Record every user's shard under ``shards`` shards in the directory.
+
+    Run before adding a shard: jump hashing would otherwise send about
+    1 / (shards + 1) of the existing owners to the new shard before their
+    todos are there. Pinned owners can then be moved over one at a time.
+    """
+    with get_engine(0).connect() as directory, directory.begin():
+        placed = set(directory.scalars(select(directory_table.c.owner_id)))
+        rows = [
+            {"owner_id": user_id, "shard": jump_hash(user_id, shards), "moving": False}
+            for user_id in directory.scalars(select(Users.id))
+            if user_id not in placed
+        ]
+        if rows:
+            directory.execute(insert(directory_table), rows)
+    return len(rows)
+
+
+def unpin_owners() -> int:
+    """Drop directory entries that only repeat an owner's hashed shard."""
+    shards = len(shard_urls())
+    with get_engine(0).connect() as directory, directory.begin():
+        redundant = [
+            owner_id
+            for owner_id, shard in directory.execute(
+                select(directory_table.c.owner_id, directory_table.c.shard).where(
+                    directory_table.c.moving.is_(False)
+                )
+            )
+            if jump_hash(owner_id, shards) == shard
+        ]
+        for start in range(0, len(redundant), COPY_BATCH_SIZE):
+            directory.execute(
+                delete(directory_table).where(
+                    directory_table.c.owner_id.in_(
+                        redundant[start : start + COPY_BATCH_SIZE]
+                    )
+                )
+            )
+    return len(redundant)
+
+
+def misplaced_owners() -> list[tuple[int, int, int]]:
+    """(owner_id, shard, hashed shard) of owners not on their hashed shard."""
+    shards = len(shard_urls())
+    with get_engine(0).connect() as directory:
+        return [
+            (owner_id, shard, jump_hash(owner_id, shards))
+            for owner_id, shard in directory.execute(
+                select(directory_table.c.owner_id, directory_table.c.shard)
+            )
+            if jump_hash(owner_id, shards) != shard
+        ]
+
+
+# Adding a shard without downtime:
+#
+#     python -m app.db.rebalance pin             # with the current shards
+#     # add the new database to DATABASE_SHARD_URLS, migrate, restart
+#     python -m app.db.rebalance plan            # owners to move
+#     python -m app.db.rebalance move OWNER SHARD
+#     python -m app.db.rebalance unpin
+def main():
+    parser = argparse.ArgumentParser(description="Move todo owners between shards.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    move = commands.add_parser("move", help="move one owner's todos to a shard")
+    move.add_argument("owner_id", type=int)
+    move.add_argument("shard", type=int)
+    move.add_argument(
+        "--wait",
+        type=float,
+        default=None,
+        help="seconds to let workers see a directory change "
+        "(default: twice SHARD_DIRECTORY_TTL_SECONDS, plus one)",
+    )
+    pin = commands.add_parser("pin", help="record every user's current shard")
+    pin.add_argument("--shards", type=int, default=None)
+    commands.add_parser("unpin", help="drop entries that match the hashed shard")
+    commands.add_parser("plan", help="list owners that are not on their hashed shard")
+    args = parser.parse_args()
+
+    if args.command == "move":
+        move_owner(args.owner_id, args.shard, args.wait)
+        print(f"Moved owner {args.owner_id} to shard {args.shard}.")
+    elif args.command == "pin":
+        pinned = pin_owners(args.shards or len(shard_urls()))
+        print(f"Pinned {pinned} owners.")
+    elif args.command == "unpin":
+        print(f"Unpinned {unpin_owners()} owners.")
+    else:
+        for owner_id, shard, home in misplaced_owners():
+            print(f"{owner_id}\t{shard}\t{home}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import re
+from typing import Optional
+
+from sqlalchemy import column, func, literal_column, or_, select, table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..schemas import TODO_COLUMNS
+from .models import Todos
+from .pagination import decode_cursor, encode_cursor
+
+todos_fts = table("todos_fts", column("rowid"))
+# Title matches weigh twice as much as description matches; owner_id is only
+# there for scoping and does not contribute to the score.
+rank = func.bm25(literal_column("todos_fts"), 10.0, 5.0, 0.0)
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query: str) -> list[str]:
+    return _TERM.findall(query)
+
+
+def fts_query(owner_id: int, terms: list[str]) -> str:
+    """Build a MATCH expression; every term is quoted so user input can never
+    be parsed as FTS5 query syntax. The terms are limited to the text
+    columns, or a number would match every todo of the owner with that id."""
+    quoted = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+    return f'owner_id : "{owner_id}" AND {{title description}} : ({quoted})'
+
+
+async def search_todos(
+    db: AsyncSession, owner_id: int, query: str, cursor, limit: int
+) -> tuple[list, Optional[str]]:
+    """Ranked search over the owner's todos with keyset pagination.
+
+    Returns rows that start with ``TODO_COLUMNS`` and the next page cursor.
+
+    Non-SQLite backends fall back to matching every term against the owner's
+    rows only (newest first), which is bounded by the size of one user's list.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], None
+
+    connection = await db.connection()
+    if connection.dialect.name == "sqlite":
+        statement = (
+            select(*TODO_COLUMNS, rank.label("rank"))
+            .join(todos_fts, todos_fts.c.rowid == Todos.id)
+            .where(literal_column("todos_fts").op("MATCH")(fts_query(owner_id, terms)))
+        )
+        if cursor is not None:
+            last_rank, last_id = decode_cursor(cursor, 2)
+            statement = statement.where(
+                or_(rank > last_rank, (rank == last_rank) & (Todos.id > last_id))
+            )
+        rows = (
+            await db.execute(statement.order_by(rank, Todos.id).limit(limit + 1))
+        ).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1].rank, rows[-1].id])
+        return rows, next_cursor
+
+    statement = select(*TODO_COLUMNS).where(Todos.owner_id == owner_id)
+    for term in terms:
+        pattern = f"%{term.lower()}%"
+        statement = statement.where(
+            or_(
+                func.lower(Todos.title).like(pattern),
+                func.lower(Todos.description).like(pattern),
+            )
+        )
+    if cursor is not None:
+        (last_id,) = decode_cursor(cursor, 1)
+        statement = statement.where(Todos.id < last_id)
+    todos = (
+        await db.execute(statement.order_by(Todos.id.desc()).limit(limit + 1))
+    ).all()
+    if len(todos) > limit:
+        todos = todos[:limit]
+        return todos, encode_cursor([todos[-1].id])
+    return todos, None
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from functools import cache
+from typing import Awaitable, Callable, NamedTuple, Optional, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config.settings import settings
+from ..services.cache import LRUCache
+from .database import get_sessionmaker, shard_urls
+from .models import ShardDirectory
+
+T = TypeVar("T")
+
+MAX_CACHED_PLACEMENTS = 100_000
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach) of ``key`` into ``buckets``.
+
+    Stable across processes, and growing from N to N + 1 buckets only moves
+    about 1 / (N + 1) of the keys.
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class Placement(NamedTuple):
+    shard: int
+    moving: bool = False
+
+
+class ShardRouter:
+    """Maps an owner to the shard that holds their todos.
+
+    Owners live on ``jump_hash(owner_id)`` unless shard 0's directory has an
+    entry for them, e.g. after a move. Placements are cached for ``ttl``
+    seconds, which is how long a worker may keep using an outdated one; the
+    rebalancer waits that long between its steps.
+    """
+
+    def __init__(self, shards: int, ttl: float):
+        self.shards = shards
+        self.ttl = ttl
+        self._placements = LRUCache(MAX_CACHED_PLACEMENTS)
+
+    @property
+    def enabled(self) -> bool:
+        return self.shards > 1
+
+    def home_shard(self, owner_id: int) -> int:
+        return jump_hash(owner_id, self.shards)
+
+    async def lookup(self, owner_id: int) -> Placement:
+        """The owner's placement straight from the directory."""
+        async with get_sessionmaker(read_only=True)() as db:
+            row = (
+                await db.execute(
+                    select(ShardDirectory.shard, ShardDirectory.moving).where(
+                        ShardDirectory.owner_id == owner_id
+                    )
+                )
+            ).first()
+        if row is None:
+            return Placement(self.home_shard(owner_id))
+        return Placement(row.shard, bool(row.moving))
+
+    async def locate(self, owner_id: int) -> Placement:
+        if not self.enabled:
+            return Placement(0)
+        placement = self._placements.get(owner_id)
+        if placement is None:
+            placement = await self.lookup(owner_id)
+            self._placements.set(owner_id, placement, time.monotonic() + self.ttl)
+        return placement
+
+    def forget(self, owner_id: int):
+        self._placements.pop(owner_id)
+
+
+@cache
+def get_shard_router() -> ShardRouter:
+    return ShardRouter(len(shard_urls()), settings.SHARD_DIRECTORY_TTL_SECONDS)
+
+
+async def gather_shards(
+    db: AsyncSession, run: Callable[[AsyncSession], Awaitable[T]]
+) -> list[T]:
+    """Scatter ``run`` over every shard's read session and gather the results.
+
+    Shard 0 reuses the request's session ``db``; unsharded this is just
+    ``[await run(db)]``.
+    """
+    shards = get_shard_router().shards
+
+    async def on_shard(shard: int) -> T:
+        async with get_sessionmaker(read_only=True, shard=shard)() as shard_db:
+            return await run(shard_db)
+
+    return list(
+        await asyncio.gather(run(db), *(on_shard(shard) for shard in range(1, shards)))
+    )
+
+
+async def settled_owners(shard: int, owner_ids: set[int]) -> set[int]:
+    """Those of ``owner_ids`` that live on ``shard`` and are not being moved,
+    straight from the directory.
+
+    Background writers (admin jobs, archiving) leave every other owner's
+    todos alone. The rebalancer copies an owner's todos before it switches
+    the directory, so a change made on the wrong shard then would be lost.
+    """
+    router = get_shard_router()
+    if not router.enabled or not owner_ids:
+        return owner_ids
+    async with get_sessionmaker(read_only=True)() as db:
+        rows = await db.execute(
+            select(
+                ShardDirectory.owner_id, ShardDirectory.shard, ShardDirectory.moving
+            ).where(ShardDirectory.owner_id.in_(owner_ids))
+        )
+        placements = {
+            row.owner_id: Placement(row.shard, bool(row.moving)) for row in rows
+        }
+    return {
+        owner_id
+        for owner_id in owner_ids
+        if placements.get(owner_id, Placement(router.home_shard(owner_id)))
+        == Placement(shard)
+    }
+
+
+async def shard_session(owner_id: int, read_only: bool) -> Optional[AsyncSession]:
+    """A session on the owner's shard, or None while the owner is being moved
+    and ``read_only`` is off."""
+    placement = await get_shard_router().locate(owner_id)
+    if placement.moving and not read_only:
+        return None
+    return get_sessionmaker(read_only=read_only, shard=placement.shard)()
@@ -0,0 +1,120 @@
+import asyncio
+from typing import Optional
+
+from sqlalchemy import delete, false, func, insert, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import ArchivedTodos, Todos, TodoStats
+
+# On SQLite and PostgreSQL the counts are read from ``todo_stats``, which
+# triggers keep in step with every write to ``todos`` and ``archived_todos``;
+# other backends have no triggers and count the todos of both tables on read.
+TRIGGER_DIALECTS = ("sqlite", "postgresql")
+
+
+def todo_buckets(owner_id: Optional[int] = None):
+    """(owner_id, priority, complete, count) computed from the todos table and
+    its archive."""
+    tiers = []
+    for model in (Todos, ArchivedTodos):
+        tier = select(
+            model.owner_id,
+            func.coalesce(model.priority, 0).label("priority"),
+            func.coalesce(model.complete, false()).label("complete"),
+        ).where(model.owner_id.is_not(None))
+        if owner_id is not None:
+            tier = tier.where(model.owner_id == owner_id)
+        tiers.append(tier)
+    todos = union_all(*tiers).subquery()
+    return select(
+        todos.c.owner_id, todos.c.priority, todos.c.complete, func.count()
+    ).group_by(todos.c.owner_id, todos.c.priority, todos.c.complete)
+
+
+async def read_stats(db: AsyncSession, owner_id: Optional[int]) -> dict:
+    """Counts for one owner, or across all owners when ``owner_id`` is None."""
+    connection = await db.connection()
+    if connection.dialect.name in TRIGGER_DIALECTS:
+        query = select(
+            TodoStats.priority, TodoStats.complete, func.sum(TodoStats.count)
+        ).group_by(TodoStats.priority, TodoStats.complete)
+        if owner_id is not None:
+            query = query.where(TodoStats.owner_id == owner_id)
+    else:
+        buckets = todo_buckets(owner_id).subquery()
+        priority, complete, count = list(buckets.columns)[1:]
+        query = select(priority, complete, func.sum(count)).group_by(priority, complete)
+
+    stats = {"total": 0, "complete": 0, "incomplete": 0, "by_priority": {}}
+    for priority, complete, count in await db.execute(query):
+        if not count:
+            continue
+        bucket = stats["by_priority"].setdefault(
+            priority, {"priority": priority, "total": 0, "complete": 0}
+        )
+        bucket["total"] += count
+        stats["total"] += count
+        if complete:
+            bucket["complete"] += count
+            stats["complete"] += count
+        else:
+            stats["incomplete"] += count
+    stats["by_priority"] = sorted(
+        stats["by_priority"].values(), key=lambda bucket: bucket["priority"]
+    )
+    return stats
+
+
+def combine_stats(parts: list[dict]) -> dict:
+    """Add up ``read_stats`` results, e.g. one per shard."""
+    if len(parts) == 1:
+        return parts[0]
+    combined = {"total": 0, "complete": 0, "incomplete": 0, "by_priority": {}}
+    for part in parts:
+        for key in ("total", "complete", "incomplete"):
+            combined[key] += part[key]
+        for bucket in part["by_priority"]:
+            into = combined["by_priority"].setdefault(
+                bucket["priority"],
+                {"priority": bucket["priority"], "total": 0, "complete": 0},
+            )
+            into["total"] += bucket["total"]
+            into["complete"] += bucket["complete"]
+    combined["by_priority"] = sorted(
+        combined["by_priority"].values(), key=lambda bucket: bucket["priority"]
+    )
+    return combined
+
+
+async def repair_stats(db: AsyncSession) -> int:
+    """Recompute every counter from the todos table; returns the bucket count.
+
+    Runs in the caller's transaction: the delete takes the write lock first,
+    so no todo write can slip in between clearing and recounting.
+    """
+    await db.execute(delete(TodoStats))
+    result = await db.execute(
+        insert(TodoStats).from_select(
+            ["owner_id", "priority", "complete", "count"], todo_buckets()
+        )
+    )
+    return result.rowcount
+
+
+# Rebuilds the counters if they ever drift (rows written while the triggers
+# were missing, a restore from an old backup, ...):
+#
+#     python -m app.db.stats
+async def main():
+    from .database import dispose_engines, get_sessionmaker, shard_urls
+
+    for shard in range(len(shard_urls())):
+        async with get_sessionmaker(shard=shard)() as db:
+            buckets = await repair_stats(db)
+            await db.commit()
+        print(f"Rebuilt {buckets} todo_stats rows on shard {shard}.")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+import math
+from typing import Annotated, Optional, Union
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config.settings import settings
+from .db.sharding import shard_session
+from .routers.auth import get_current_user
+from .services.group_commit import GroupCommitter, SessionWriter, writer_for
+
+
+async def open_owner_session(user: Optional[dict], read_only: bool) -> AsyncSession:
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
+        )
+    db = await shard_session(user.get("user_id"), read_only)
+    if db is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Your to-dos are being moved, try again shortly.",
+            headers={
+                "Retry-After": str(math.ceil(settings.SHARD_DIRECTORY_TTL_SECONDS))
+            },
+        )
+    return db
+
+
+# Sessions on the shard that holds the caller's todos; with a single database
+# these are the same as ``get_db`` and ``get_read_db``.
+async def get_owner_db(user: Annotated[dict, Depends(get_current_user)]):
+    async with await open_owner_session(user, read_only=False) as db:
+        yield db
+
+
+async def get_owner_read_db(user: Annotated[dict, Depends(get_current_user)]):
+    async with await open_owner_session(user, read_only=True) as db:
+        yield db
+
+
+owner_db_dependency = Annotated[AsyncSession, Depends(get_owner_db)]
+owner_read_db_dependency = Annotated[AsyncSession, Depends(get_owner_read_db)]
+
+
+def get_owner_writer(db: owner_db_dependency):
+    return writer_for(db)
+
+
+# For handlers whose single mutation may be group-committed; see
+# GROUP_COMMIT_WINDOW_MS.
+owner_writer_dependency = Annotated[
+    Union[SessionWriter, GroupCommitter], Depends(get_owner_writer)
+]
@@ -0,0 +1,104 @@
+import codecs
+import csv
+from typing import AsyncIterator, Optional
+
+import orjson
+
+# Longest line, or quoted CSV record, an import accepts; anything longer is
+# skipped and reported instead of being buffered.
+MAX_RECORD_LENGTH = 64 * 1024
+
+
+async def read_lines(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, Optional[str]]]:
+    """Split a UTF-8 byte stream into ``(line number, line)`` pairs.
+
+    Only the current partial line is held in memory. Overlong lines come out
+    as ``None`` so that the caller can report them.
+    """
+    # Invalid bytes become U+FFFD rather than aborting a half-done import;
+    # the row then fails validation or imports with the marker visible.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending, line_number, overlong = "", 0, False
+    async for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line_number += 1
+            yield line_number, None if overlong else line.removesuffix("\r")
+            overlong = False
+        if len(pending) > MAX_RECORD_LENGTH:
+            pending, overlong = "", True
+    pending += decoder.decode(b"", final=True)
+    if pending or overlong:
+        yield line_number + 1, None if overlong else pending.removesuffix("\r")
+
+
+def record_error(message: str) -> list[dict]:
+    return [{"type": "value_error", "loc": [], "msg": message}]
+
+
+async def read_ndjson(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, object, Optional[list[dict]]]]:
+    """``(line number, value, errors)`` for every non-blank NDJSON line."""
+    async for line_number, line in read_lines(chunks):
+        if line is None:
+            yield line_number, None, record_error("Line is too long.")
+        elif line.strip():
+            try:
+                yield line_number, orjson.loads(line), None
+            except orjson.JSONDecodeError as error:
+                yield line_number, None, record_error(f"Invalid JSON: {error}")
+
+
+async def read_csv(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, object, Optional[list[dict]]]]:
+    """``(line number, row, errors)`` for every CSV record after the header.
+
+    Quoted fields may span lines: physical lines are joined until the quotes
+    balance, which works because an escaped quote is written twice. Empty
+    cells are left out of the row so that the field defaults apply.
+    """
+    header, record, first_line = None, [], 0
+    async for line_number, line in read_lines(chunks):
+        if line is None:
+            record = []
+            yield line_number, None, record_error("Line is too long.")
+            continue
+        if not record:
+            first_line = line_number
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            if len(text) <= MAX_RECORD_LENGTH:
+                continue
+            record = []
+            yield first_line, None, record_error("Record is too long.")
+            continue
+        record = []
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as error:
+            yield first_line, None, record_error(f"Invalid CSV: {error}")
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield first_line, None, record_error(
+                f"Expected {len(header)} fields, got {len(values)}."
+            )
+            continue
+        yield first_line, {
+            name: value for name, value in zip(header, values) if value != ""
+        }, None
+    if record:
+        yield first_line, None, record_error("Unterminated quoted field.")
+
+
+IMPORT_READERS = {"ndjson": read_ndjson, "csv": read_csv}
@@ -1,20 +1,94 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, status
+from fastapi.responses import PlainTextResponse
 
-from app.db import models as models
-from app.db.database import engine
+from app import IMPORTED_AT
+from app.config.settings import settings
+from app.db.database import dispose_engines, get_async_engine, shard_urls
+from app.db.migrations import verify_schema
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.responses import ORJSONResponse
 from app.routers import admin, auth, todos, users
+from app.services.broker import broker
+from app.services.compaction import compactor
+from app.services.group_commit import stop_group_committers
+from app.services.jobs import job_runner
+from app.services.metrics import APP_STARTUP_DURATION, registry
+from app.services.passwords import password_hasher
 
-app = FastAPI()
-
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 
-@app.get("/health", status_code=status.HTTP_200_OK)
 def health_check():
     return {"status": "Healthy"}
 
 
-app.include_router(auth.router)
-app.include_router(todos.router)
-app.include_router(admin.router)
-app.include_router(users.router)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def create_app(check_schema: bool = True) -> FastAPI:
+    """Build the application; nothing touches the database until startup.
+
+    The lifespan opens the engines, checks that every database shard is migrated to
+    the Alembic head (unless ``check_schema`` is off, e.g. for tests that
+    build their own schema) and closes every pool on shutdown.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        started = time.perf_counter()
+        if check_schema:
+            for shard in range(len(shard_urls())):
+                await verify_schema(get_async_engine(shard))
+        if settings.BCRYPT_TARGET_MS is not None:
+            password_hasher.calibrate(settings.BCRYPT_TARGET_MS)
+        await broker.start()
+        compactor.start()
+        job_runner.start()
+        ready = time.perf_counter()
+        APP_STARTUP_DURATION.set(value=ready - IMPORTED_AT)
+        logger.info(
+            "Ready %.0fms after import (startup took %.0fms)",
+            (ready - IMPORTED_AT) * 1000,
+            (ready - started) * 1000,
+        )
+        yield
+        await job_runner.stop()
+        await compactor.stop()
+        await stop_group_committers()
+        await broker.stop()
+        password_hasher.shutdown()
+        await dispose_engines()
+
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware)
+    # The last middleware added runs first. Admission runs before compression
+    # so that shed requests cost nothing, and metrics runs before admission
+    # so that shed requests are still counted.
+    app.add_middleware(AdmissionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+
+    app.add_api_route("/health", health_check, status_code=status.HTTP_200_OK)
+    app.add_api_route(
+        "/metrics",
+        metrics,
+        response_class=PlainTextResponse,
+        include_in_schema=False,
+    )
+
+    app.include_router(auth.router)
+    app.include_router(todos.router)
+    app.include_router(admin.router)
+    app.include_router(users.router)
+    return app
+
+
+# For ``uvicorn app.main:app``; ``uvicorn --factory app.main:create_app``
+# works as well.
+app = create_app()
@@ -0,0 +1,211 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..config.settings import settings
+from ..services.cache import LRUCache
+from ..services.metrics import Counter, Gauge, registry
+
+ROUTE_CLASSES = ("auth", "reads", "writes", "admin")
+# Probes and long-lived streams are never queued or shed.
+EXEMPT_PATHS = {"/health", "/metrics", "/todos/events"}
+RATE_LIMITED_PATHS = {"/auth/signin", "/auth/signup"}
+MAX_RATE_LIMITED_CLIENTS = 10_000
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if path in EXEMPT_PATHS:
+        return None
+    if path.startswith("/auth"):
+        return "auth"
+    if path.startswith("/admin"):
+        return "admin"
+    return "reads" if method in ("GET", "HEAD") else "writes"
+
+
+class AdmissionQueue:
+    """Caps the requests of one route class that run at the same time.
+
+    Up to ``limit`` requests run; up to ``queue_size`` more wait, in arrival
+    order, for at most ``timeout`` seconds. A finished request hands its
+    slot straight to the oldest waiter. ``limit=0`` admits everything.
+    """
+
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns why the request was refused, if it was."""
+        if self.limit <= 0 or (self.active < self.limit and not self._waiters):
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            return "timeout"
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        return None
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done() and not future.cancelled():
+            # The slot was handed over just as the waiter gave up.
+            self.release()
+        elif future in self._waiters:
+            self._waiters.remove(future)
+
+    def release(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class TokenBucket:
+    """Per-client request rate: ``burst`` at once, refilled at ``rate``/s."""
+
+    def __init__(
+        self, rate: float, burst: int, maxsize: int = MAX_RATE_LIMITED_CLIENTS
+    ):
+        self.rate = rate
+        self.burst = burst
+        # Least recently seen clients are forgotten first, i.e. get a full
+        # bucket back, which only errs on the side of letting them in.
+        self._buckets = LRUCache(maxsize)
+
+    def take(self, client: str, now: Optional[float] = None) -> float:
+        """Spend a token; returns 0, or the seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        tokens, updated_at = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        if tokens < 1:
+            self._buckets.set(client, (tokens, now))
+            return (1 - tokens) / self.rate
+        self._buckets.set(client, (tokens - 1, now))
+        return 0.0
+
+
+# The queues of the most recently built app, for the gauges below.
+admission_queues: dict[str, AdmissionQueue] = {}
+
+ADMISSION_REJECTED = registry.register(
+    Counter(
+        "admission_rejected_total",
+        "Requests refused by admission control, by route class and reason.",
+        ("route_class", "reason"),
+    )
+)
+registry.register(
+    Gauge(
+        "admission_in_flight",
+        "Admitted requests currently running, by route class.",
+        ("route_class",),
+        callback=lambda: {
+            (name,): queue.active for name, queue in admission_queues.items()
+        },
+    )
+)
+registry.register(
+    Gauge(
+        "admission_queue_depth",
+        "Requests waiting for admission, by route class.",
+        ("route_class",),
+        callback=lambda: {
+            (name,): queue.depth for name, queue in admission_queues.items()
+        },
+    )
+)
+
+
+def queues_from_settings() -> dict[str, AdmissionQueue]:
+    return {
+        name: AdmissionQueue(
+            limit=getattr(settings, f"ADMISSION_{name.upper()}_LIMIT"),
+            queue_size=getattr(settings, f"ADMISSION_{name.upper()}_QUEUE_SIZE"),
+            timeout=getattr(settings, f"ADMISSION_{name.upper()}_TIMEOUT"),
+        )
+        for name in ROUTE_CLASSES
+    }
+
+
+def reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """Sheds load per route class before a request reaches the app.
+
+    Bursts of bcrypt-bound sign-ins then queue behind their own limit
+    instead of taking every worker slot from reads and writes. Sign-in and
+    sign-up are also rate limited per client address.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        queues: Optional[dict[str, AdmissionQueue]] = None,
+        rate_limit: Optional[TokenBucket] = None,
+    ):
+        self.app = app
+        self.queues = queues_from_settings() if queues is None else queues
+        if rate_limit is None and settings.AUTH_RATE_LIMIT_PER_MINUTE > 0:
+            rate_limit = TokenBucket(
+                settings.AUTH_RATE_LIMIT_PER_MINUTE / 60, settings.AUTH_RATE_LIMIT_BURST
+            )
+        self.rate_limit = rate_limit
+        admission_queues.clear()
+        admission_queues.update(self.queues)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        name = None
+        if scope["type"] == "http":
+            name = route_class(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limit is not None and scope["path"] in RATE_LIMITED_PATHS:
+            client = scope.get("client")
+            wait = self.rate_limit.take(client[0] if client else "")
+            if wait:
+                ADMISSION_REJECTED.inc(name, "rate_limited")
+                response = reject(429, "Too many attempts, try again later.", wait)
+                await response(scope, receive, send)
+                return
+
+        queue = self.queues[name]
+        refused = await queue.acquire()
+        if refused is not None:
+            ADMISSION_REJECTED.inc(name, refused)
+            response = reject(503, "Server is busy, try again shortly.", 1)
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            queue.release()
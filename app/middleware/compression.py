@@ -0,0 +1,156 @@
+import zlib
+from typing import Optional
+
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config.settings import settings
+from ..responses import parse_qualities
+
+# Server preference when the client weighs several encodings the same.
+ENCODINGS = ("zstd", "br", "gzip")
+# Levels for per-request compression of dynamic bodies: most of the size
+# win for a small slice of the CPU the maximum levels cost.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+# Event streams have to reach the client message by message.
+UNCOMPRESSED_MEDIA_TYPES = ("text/event-stream",)
+
+
+class GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(
+            GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        compressed = self._compressor.compress(data)
+        if flush:
+            compressed += self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return compressed
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        compressed = self._compressor.process(data)
+        if flush:
+            compressed += self._compressor.flush()
+        return compressed
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        compressed = self._compressor.compress(data)
+        if flush:
+            compressed += self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return compressed
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+ENCODERS = {"zstd": ZstdEncoder, "br": BrotliEncoder, "gzip": GzipEncoder}
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The content coding to use for ``accept_encoding``; None for identity."""
+    qualities = dict(parse_qualities(accept_encoding))
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """Compresses response bodies with the encoding the client prefers.
+
+    Whole bodies under ``minimum_size`` bytes go out as they are; the first
+    body message decides. Streamed bodies are compressed chunk by chunk and
+    flushed after each one, so the client sees every chunk as it is sent.
+    ETags become weak, as the bytes now depend on ``Accept-Encoding`` too.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = (
+            settings.COMPRESSION_MIN_BYTES if minimum_size is None else minimum_size
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        encoding = None
+        if scope["type"] == "http" and self.minimum_size > 0:
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if "content-encoding" in headers or headers.get(
+                    "content-type", ""
+                ).startswith(UNCOMPRESSED_MEDIA_TYPES):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                # Weak whether or not this body is compressed, so that a 304
+                # carries the same validator as the 200 before it.
+                etag = headers.get("etag")
+                if etag is not None and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding]()
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                body = encoder.compress(body, flush=more_body)
+                if not more_body:
+                    body += encoder.finish()
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+            else:
+                body = encoder.compress(body, flush=more_body)
+                if not more_body:
+                    body += encoder.finish()
+            await send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Optional
+
+import msgpack
+import orjson
+from starlette.responses import JSONResponse
+
+# List formats a client can ask for through ``Accept``. Columnar JSON sends
+# each field name once with an array of values per field.
+LIST_MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.todos.columnar+json",
+    "msgpack": "application/msgpack",
+}
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": "msgpack"}
+
+
+def render_json(content) -> bytes:
+    # orjson handles datetimes natively and writes UTF-8 bytes directly.
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def encode_msgpack_default(value):
+    # Same ISO 8601 strings as the JSON bodies, naive or not.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def render_msgpack(content) -> bytes:
+    return msgpack.packb(content, default=encode_msgpack_default)
+
+
+class ORJSONResponse(JSONResponse):
+    """Default response class; same output as JSONResponse, rendered by orjson."""
+
+    def render(self, content) -> bytes:
+        return render_json(content)
+
+
+def parse_qualities(header: Optional[str]) -> list[tuple[str, float]]:
+    """``Accept``-style header values with their q weights, best first."""
+    values = []
+    for part in (header or "").split(","):
+        value, *params = (piece.strip() for piece in part.split(";"))
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, weight = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(weight)
+                except ValueError:
+                    quality = 0.0
+        values.append((value.lower(), quality))
+    # sorted() is stable, so equal weights keep the client's order.
+    return sorted(values, key=lambda item: -item[1])
+
+
+def negotiate_list_format(accept: Optional[str]) -> str:
+    """The list format ``accept`` prefers; JSON unless another is asked for."""
+    media_types = {media_type: name for name, media_type in LIST_MEDIA_TYPES.items()}
+    media_types.update(MEDIA_TYPE_ALIASES)
+    for media_type, quality in parse_qualities(accept):
+        if quality <= 0:
+            continue
+        if media_type in media_types:
+            return media_types[media_type]
+        if media_type in ("*/*", "application/*"):
+            return "json"
+    return "json"
@@ -1,27 +1,224 @@
-from typing import Annotated
+import csv
+import io
+import math
+from contextlib import AsyncExitStack
+from typing import Annotated, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from ..db.database import db_dependency
-from ..db.models import Todos
+from ..config.settings import settings
+from ..db import crud, stats
+from ..db.database import (
+    db_dependency,
+    get_read_engine,
+    get_sessionmaker,
+    read_db_dependency,
+)
+from ..db.models import ArchivedTodos, Todos, Users
+from ..db.pagination import after_cursor, apply_keyset, merge_pages, split_page
+from ..db.sharding import gather_shards, get_shard_router
+from ..responses import LIST_MEDIA_TYPES, negotiate_list_format, render_json
+from ..schemas import (
+    ARCHIVED_TODO_COLUMNS,
+    TODO_COLUMNS,
+    TodoResponse,
+    render_todo_list,
+)
+from ..services.jobs import cancel_job, read_job, read_jobs, submit_job
 from .auth import get_current_user
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Rows fetched per round trip while streaming; bounds export memory.
+EXPORT_CHUNK_SIZE = 1000
 
-@router.get("/todos", status_code=status.HTTP_200_OK)
-async def read_all(user: user_dependency, db: db_dependency):
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+MAX_LISTED_JOBS = 100
+
+
+class JobRequest(BaseModel):
+    kind: Literal["purge_completed", "delete_owner_todos", "reassign_todos"]
+    # purge_completed: only this owner's todos when set. delete_owner_todos
+    # and reassign_todos: whose todos; reassign_todos gives them to
+    # to_owner_id.
+    owner_id: Optional[int] = Field(default=None, gt=0)
+    to_owner_id: Optional[int] = Field(default=None, gt=0)
+
+
+def encode_ndjson(rows, columns: list[str], header: bool) -> str:
+    return "".join(render_json(dict(zip(columns, row))).decode() + "\n" for row in rows)
+
+
+def encode_csv(rows, columns: list[str], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+EXPORT_ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv}
+
+
+def export_query(model, cursor: Optional[str]):
+    # Archived todos are exported with the same columns as hot ones.
+    query = select(*(getattr(model, column.key) for column in Todos.__table__.columns))
+    return after_cursor(query, (model.id,), False, cursor).order_by(model.id)
+
+
+async def stream_todos(sources: list[tuple], export_format: str, limit: Optional[int]):
+    """Export the rows of every (engine, query, id column) source in id order."""
+    # The export runs after the handler has returned, so it reads through its
+    # own sessions instead of the request-scoped one.
+    encode = EXPORT_ENCODERS[export_format]
+    columns = [column.key for column in Todos.__table__.columns]
+    header = True
+    async with AsyncExitStack() as stack:
+        sessions = {}
+        for bind, _, _ in sources:
+            if bind not in sessions:
+                sessions[bind] = await stack.enter_async_context(
+                    AsyncSession(bind=bind)
+                )
+        if len(sources) == 1:
+            bind, query, _ = sources[0]
+            if limit is not None:
+                query = query.limit(limit)
+            result = await sessions[bind].stream(
+                query.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+            )
+            async for rows in result.partitions():
+                yield encode(rows, columns, header)
+                header = False
+        else:
+            # Sources are read a chunk at a time, each past the last id sent,
+            # and their chunks merged in id order.
+            last_id, remaining = None, limit
+            while remaining is None or remaining > 0:
+                size = EXPORT_CHUNK_SIZE if remaining is None else remaining
+                size = min(size, EXPORT_CHUNK_SIZE)
+                parts = []
+                for bind, query, id_column in sources:
+                    if last_id is not None:
+                        query = query.where(id_column > last_id)
+                    parts.append(
+                        (await sessions[bind].execute(query.limit(size))).all()
+                    )
+                rows = merge_pages(parts, (Todos.id,), False, size)[:size]
+                if not rows:
+                    break
+                yield encode(rows, columns, header)
+                header = False
+                last_id = rows[-1].id
+                if remaining is not None:
+                    remaining -= len(rows)
+        if header:
+            yield encode([], columns, header)
+
+
+@router.get("/todos", status_code=status.HTTP_200_OK, response_model=list[TodoResponse])
+async def read_all(
+    user: user_dependency,
+    db: read_db_dependency,
+    accept: Annotated[Optional[str], Header()] = None,
+    limit: Optional[int] = Query(default=None, gt=0, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson", "csv"] = "json",
+    include_archived: bool = False,
+):
     if user is None or user.get("user_role") != "admin":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authorized to perform this action",
         )
-    return db.query(Todos).all()
+    tiers = [(Todos, TODO_COLUMNS)]
+    if include_archived:
+        tiers.append((ArchivedTodos, ARCHIVED_TODO_COLUMNS))
+    if format != "json":
+        binds = [db.bind] + [
+            get_read_engine(shard) for shard in range(1, get_shard_router().shards)
+        ]
+        try:
+            sources = [
+                (bind, export_query(model, cursor), model.id)
+                for bind in binds
+                for model, _ in tiers
+            ]
+        except ValueError as error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(error)
+            )
+        return StreamingResponse(
+            stream_todos(sources, format, limit),
+            media_type=EXPORT_MEDIA_TYPES[format],
+        )
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    try:
+        queries = [
+            apply_keyset(select(*selected), (model.id,), False, cursor, limit)
+            for model, selected in tiers
+        ]
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+    async def pages(shard_db: AsyncSession) -> list:
+        return [(await shard_db.execute(query)).all() for query in queries]
+
+    # Each shard's pages are already in id order; the merged page is cut
+    # back to one page (plus the row that tells whether another follows).
+    parts = [
+        page for shard_pages in await gather_shards(db, pages) for page in shard_pages
+    ]
+    columns = (Todos.id,)
+    todos, next_cursor = split_page(
+        merge_pages(parts, columns, False, limit), columns, limit
+    )
+    headers = {"Vary": "Accept"}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    list_format = negotiate_list_format(accept)
+    return Response(
+        content=render_todo_list(todos, list_format),
+        media_type=LIST_MEDIA_TYPES[list_format],
+        headers=headers,
+    )
+
+
+@router.get("/todos/stats", status_code=status.HTTP_200_OK)
+async def read_stats(
+    user: user_dependency,
+    db: read_db_dependency,
+    owner_id: Optional[int] = Query(default=None, gt=0),
+):
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authorized to perform this action",
+        )
+    if owner_id is not None:
+        placement = await get_shard_router().locate(owner_id)
+        if placement.shard != 0:
+            sessionmaker = get_sessionmaker(read_only=True, shard=placement.shard)
+            async with sessionmaker() as shard_db:
+                return await stats.read_stats(shard_db, owner_id)
+        return await stats.read_stats(db, owner_id)
+    return stats.combine_stats(
+        await gather_shards(db, lambda shard_db: stats.read_stats(shard_db, None))
+    )
 
 
-@router.delete("todos/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/todos/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_todo(
     user: user_dependency, db: db_dependency, todo_id: int = Path(gt=0)
 ):
@@ -30,10 +227,113 @@ async def delete_todo(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authorized to perform this action",
         )
-    todo_model = db.query(Todos).filter(Todos.id == todo_id).first()
+    for shard in range(get_shard_router().shards):
+        if shard == 0:
+            deleted = await delete_on_shard(db, todo_id)
+        else:
+            async with get_sessionmaker(shard=shard)() as shard_db:
+                deleted = await delete_on_shard(shard_db, todo_id)
+        if deleted:
+            return
+    raise HTTPException(status_code=404, detail="To-do not found!")
+
+
+async def delete_on_shard(db: AsyncSession, todo_id: int) -> bool:
+    deleted = await crud.delete_todos(db, None, [todo_id])
+    if not deleted:
+        return False
+    placement = await get_shard_router().locate(deleted[todo_id])
+    if placement.shard != db.info.get("shard", 0):
+        # A copy the rebalancer has not purged yet; the owner's todo is on
+        # another shard.
+        await db.rollback()
+        return False
+    if placement.moving:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="This user's to-dos are being moved, try again shortly.",
+            headers={
+                "Retry-After": str(math.ceil(settings.SHARD_DIRECTORY_TTL_SECONDS))
+            },
+        )
+    await db.commit()
+    return True
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_job(user: user_dependency, db: db_dependency, job_request: JobRequest):
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authorized to perform this action",
+        )
+    if job_request.kind != "purge_completed" and job_request.owner_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="owner_id is required."
+        )
+    if job_request.kind == "reassign_todos":
+        if job_request.to_owner_id in (None, job_request.owner_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="to_owner_id is required and must differ from owner_id.",
+            )
+        if await db.get(Users, job_request.to_owner_id) is None:
+            raise HTTPException(status_code=404, detail="User not found!")
+        shards = get_shard_router()
+        if shards.enabled and (
+            (await shards.lookup(job_request.owner_id)).shard
+            != (await shards.lookup(job_request.to_owner_id)).shard
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The users' to-dos are on different shards; move one first.",
+            )
+    params = job_request.model_dump(exclude={"kind"}, exclude_none=True)
+    return await submit_job(db, job_request.kind, params, user.get("user_id"))
+
+
+@router.get("/jobs", status_code=status.HTTP_200_OK)
+async def list_jobs(user: user_dependency, db: read_db_dependency):
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authorized to perform this action",
+        )
+    return await read_jobs(db, MAX_LISTED_JOBS)
+
+
+@router.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_job(
+    user: user_dependency, db: read_db_dependency, job_id: int = Path(gt=0)
+):
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authorized to perform this action",
+        )
+    job = await read_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found!")
+    return job
 
-    if todo_model is None:
-        raise HTTPException(status_code=404, detail="To-do not found!")
 
-    db.query(Todos).filter(Todos.id == todo_id).delete()
-    db.commit()
+@router.delete("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def delete_job(
+    user: user_dependency, db: db_dependency, job_id: int = Path(gt=0)
+):
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authorized to perform this action",
+        )
+    cancelled = await cancel_job(db, job_id)
+    job = await read_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found!")
+    if not cancelled:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job already {job['status']}.",
+        )
+    return job
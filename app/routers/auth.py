@@ -1,17 +1,21 @@
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from bcrypt import checkpw, gensalt, hashpw
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jwt import PyJWTError as JWTError
 from jwt import decode as jwt_decode
 from jwt import encode as jwt_encode
 from pydantic import BaseModel, Field
+from sqlalchemy import select
 
 from ..config.settings import settings
-from ..db.database import db_dependency
+from ..db.database import db_dependency, read_db_dependency
 from ..db.models import Users
+from ..schemas import USER_COLUMNS, USER_FIELDS, UserResponse
+from ..services.passwords import password_hasher
+from ..services.token_cache import token_cache
+from ..services.user_cache import user_cache
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -33,17 +37,41 @@ class Token(BaseModel):
     token_type: str
 
 
-def authenticate_user(username: str, password: str, db: db_dependency):
-    user = db.query(Users).filter(Users.username == username).first()
-    if not user:
-        return False
-    hashed_password = password.encode("utf-8")
-    if not checkpw(hashed_password, user.password.encode("utf-8")):
+async def authenticate_user(username: str, password: str, db: read_db_dependency):
+    """Return the user's profile if ``password`` matches, else ``False``.
+
+    A cached profile saves loading the whole row, but the hash it is checked
+    against is always read fresh from the database.
+    """
+    profile = user_cache.get_by_username(username)
+    if profile is None:
+        snapshot = user_cache.snapshot()
+        row = (
+            await db.execute(
+                select(*USER_COLUMNS, Users.password).where(Users.username == username)
+            )
+        ).first()
+        if row is None:
+            return False
+        profile = dict(zip(USER_FIELDS, row))
+        hashed_password = row.password
+        user_cache.set(profile, snapshot)
+    else:
+        hashed_password = await db.scalar(
+            select(Users.password).where(Users.id == profile["id"])
+        )
+        if hashed_password is None:
+            user_cache.invalidate(profile["id"])
+            return False
+    if not await password_hasher.verify(password, hashed_password):
         return False
-    return user
+    return profile
 
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
     try:
         payload = jwt_decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -57,12 +85,14 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials.",
             )
-        return {"user_id": user_id, "username": username, "user_role": user_role}
+        user = {"user_id": user_id, "username": username, "user_role": user_role}
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials.",
         )
+    token_cache.put(token, user, payload.get("exp"))
+    return user
 
 
 def create_access_token(
@@ -80,7 +110,9 @@ def create_access_token(
     )
 
 
-@router.post("/signup", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/signup", status_code=status.HTTP_201_CREATED, response_model=UserResponse
+)
 async def create_user(db: db_dependency, create_user_request: CreateUserRequest):
     create_user_model = Users(**create_user_request.model_dump())
 
@@ -89,22 +121,22 @@ async def create_user(db: db_dependency, create_user_request: CreateUserRequest)
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Not possible to create user.",
         )
-    hashed_password = hashpw(
-        password=create_user_request.password.encode("utf-8"), salt=gensalt()
-    ).decode("utf-8")
-    create_user_model.password = hashed_password
+    create_user_model.password = await password_hasher.hash(
+        create_user_request.password
+    )
 
     db.add(create_user_model)
-    db.commit()
+    await db.commit()
 
     return create_user_model
 
 
 @router.post("/signin", response_model=Token, status_code=status.HTTP_200_OK)
 async def signin(
-    db: db_dependency, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    db: read_db_dependency,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ):
-    user = authenticate_user(
+    user = await authenticate_user(
         username=form_data.username, password=form_data.password, db=db
     )
     if not user:
@@ -113,9 +145,9 @@ async def signin(
             detail="Could not authenticate user.",
         )
     token = create_access_token(
-        username=user.username,
-        user_id=user.id,
-        role=user.role,
-        expires_delta=timedelta(minutes=20),
+        username=user["username"],
+        user_id=user["id"],
+        role=user["role"],
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
     )
     return {"access_token": token, "token_type": "bearer"}
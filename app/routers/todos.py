@@ -1,16 +1,75 @@
-from typing import Annotated, Optional
+import asyncio
+import json
+import time
+from typing import Annotated, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Path
-from pydantic import BaseModel, Field
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import literal, null, select, tuple_, union_all
 from starlette import status
 
-from ..db.database import db_dependency
-from ..db.models import Todos
+from ..db import crud, stats
+from ..db.models import ArchivedTodos, Todos, TodoTombstones
+from ..db.pagination import (
+    apply_keyset,
+    decode_cursor,
+    encode_cursor,
+    merge_pages,
+    split_page,
+)
+from ..db.search import search_todos
+from ..dependencies import (
+    owner_db_dependency,
+    owner_read_db_dependency,
+    owner_writer_dependency,
+)
+from ..imports import IMPORT_READERS
+from ..responses import LIST_MEDIA_TYPES, ORJSONResponse, negotiate_list_format
+from ..schemas import (
+    ARCHIVED_TODO_COLUMNS,
+    TODO_COLUMNS,
+    TodoResponse,
+    render_todo_list,
+    todo_rows,
+)
+from ..services.broker import Subscription, broker
+from ..services.list_cache import etag_matches, list_cache
 from .auth import get_current_user
 
 router = APIRouter(prefix="/todos", tags=["Todo"])
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_ITEMS = 5000
+# Rows inserted and committed together by an import; bounds its memory and
+# how long it holds the write lock at a time.
+IMPORT_BATCH_SIZE = 1000
+# Rejected rows listed in an import summary; the rest are only counted.
+MAX_REPORTED_IMPORT_ERRORS = 100
+EVENT_HEARTBEAT_SECONDS = 15
+
+# Each sort order maps to the keyset columns and direction; the composite
+# indexes on ``Todos`` cover every combination with the optional filters.
+SORT_ORDERS = {
+    "id": ((Todos.id,), False),
+    "-id": ((Todos.id,), True),
+    "priority": ((Todos.priority, Todos.id), False),
+    "-priority": ((Todos.priority, Todos.id), True),
+}
+
 
 class TodoRequest(BaseModel):
     title: str = Field(min_length=3)
@@ -26,29 +85,318 @@ class TodoUpdateRequest(BaseModel):
     complete: Optional[bool] = Field(default=False)
 
 
-@router.get("/", status_code=status.HTTP_200_OK)
-async def read_all(user: user_dependency, db: db_dependency):
+class TodoBulkUpdateItem(TodoUpdateRequest):
+    id: int = Field(gt=0)
+
+
+# Bulk items are validated one by one so that a single bad item is reported
+# in the per-item results instead of rejecting the whole batch.
+class TodoBulkRequest(BaseModel):
+    todos: list[dict] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class TodoBulkDeleteRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+def validate_bulk_items(items: list[dict], model: type[BaseModel]):
+    valid, results = [], [None] * len(items)
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as error:
+            results[index] = {
+                "index": index,
+                "status": "invalid",
+                "errors": error.errors(include_url=False, include_context=False),
+            }
+    return valid, results
+
+
+@router.get("/", status_code=status.HTTP_200_OK, response_model=list[TodoResponse])
+async def read_all(
+    user: user_dependency,
+    db: owner_read_db_dependency,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    complete: Optional[bool] = None,
+    priority: Optional[int] = Query(default=None, gt=0, lt=6),
+    sort: Literal["id", "-id", "priority", "-priority"] = "id",
+    include_archived: bool = False,
+):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
         )
-    return db.query(Todos).filter(Todos.owner_id == user.get("user_id")).all()
+    # An unchanged poll costs one primary-key lookup: the ETag only depends
+    # on the owner's write version and the query. The version is read before
+    # the rows, so a cached page is never older than its version.
+    list_format = negotiate_list_format(accept)
+    cache_key = list_cache.key(
+        user.get("user_id"),
+        await crud.read_version(db, user.get("user_id")),
+        (limit, cursor, complete, priority, sort, include_archived, list_format),
+    )
+    headers = {"ETag": list_cache.etag(cache_key), "Vary": "Accept"}
+    if if_none_match is not None and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
+    cached = list_cache.get(cache_key)
+    if cached is None:
+        # Only completed todos are ever archived.
+        tiers = [(Todos, TODO_COLUMNS)]
+        if include_archived and complete is not False:
+            tiers.append((ArchivedTodos, ARCHIVED_TODO_COLUMNS))
+        columns, descending = SORT_ORDERS[sort]
+        pages = []
+        for model, selected in tiers:
+            query = select(*selected).where(model.owner_id == user.get("user_id"))
+            if complete is not None:
+                query = query.where(model.complete == complete)
+            if priority is not None:
+                query = query.where(model.priority == priority)
+            keyset = tuple(getattr(model, column.key) for column in columns)
+            try:
+                query = apply_keyset(query, keyset, descending, cursor, limit)
+            except ValueError as error:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail=str(error)
+                )
+            pages.append((await db.execute(query)).all())
 
-@router.get("/{todo_id}", status_code=status.HTTP_200_OK)
-async def read_todo(
-    user: user_dependency, db: db_dependency, todo_id: int = Path(gt=0)
+        rows = merge_pages(pages, columns, descending, limit)
+        todos, next_cursor = split_page(rows, columns, limit)
+        cached = (render_todo_list(todos, list_format), next_cursor)
+        list_cache.set(cache_key, cached)
+
+    body, next_cursor = cached
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(
+        content=body, media_type=LIST_MEDIA_TYPES[list_format], headers=headers
+    )
+
+
+@router.get("/changes", status_code=status.HTTP_200_OK)
+async def read_changes(
+    user: user_dependency,
+    db: owner_read_db_dependency,
+    since: Optional[str] = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
 ):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
         )
-    todo_model = (
-        db.query(Todos)
-        .filter(Todos.id == todo_id)
-        .filter(Todos.owner_id == user.get("user_id"))
-        .first()
+    # Changes are ordered by (version, todo id); the cursor is the position of
+    # the last change returned, so a page may end in the middle of a version.
+    try:
+        version, todo_id = decode_cursor(since, 2) if since is not None else (0, 0)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+    owner_id = user.get("user_id")
+    live = select(
+        Todos.id,
+        Todos.version,
+        literal(False).label("deleted"),
+        Todos.title,
+        Todos.description,
+        Todos.priority,
+        Todos.complete,
+        Todos.updated_at,
+    ).where(
+        Todos.owner_id == owner_id,
+        tuple_(Todos.version, Todos.id) > tuple_(version, todo_id),
+    )
+    # Archiving changes nothing a client sees, so archived todos are still
+    # reported at the version they were last changed.
+    archived = select(
+        ArchivedTodos.id,
+        ArchivedTodos.version,
+        literal(False).label("deleted"),
+        ArchivedTodos.title,
+        ArchivedTodos.description,
+        ArchivedTodos.priority,
+        ArchivedTodos.complete,
+        ArchivedTodos.updated_at,
+    ).where(
+        ArchivedTodos.owner_id == owner_id,
+        tuple_(ArchivedTodos.version, ArchivedTodos.id) > tuple_(version, todo_id),
+    )
+    deleted = select(
+        TodoTombstones.todo_id,
+        TodoTombstones.version,
+        literal(True).label("deleted"),
+        null(),
+        null(),
+        null(),
+        null(),
+        TodoTombstones.deleted_at,
+    ).where(
+        TodoTombstones.owner_id == owner_id,
+        tuple_(TodoTombstones.version, TodoTombstones.todo_id)
+        > tuple_(version, todo_id),
     )
+    changes = union_all(live, archived, deleted).subquery()
+    rows = (
+        await db.execute(
+            select(changes).order_by(changes.c.version, changes.c.id).limit(limit + 1)
+        )
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        version, todo_id = rows[-1].version, rows[-1].id
+    return {
+        "changes": [
+            {
+                "id": row.id,
+                "version": row.version,
+                "deleted": bool(row.deleted),
+                "updated_at": row.updated_at,
+                **(
+                    {}
+                    if row.deleted
+                    else {
+                        "title": row.title,
+                        "description": row.description,
+                        "priority": row.priority,
+                        "complete": row.complete,
+                    }
+                ),
+            }
+            for row in rows
+        ],
+        "cursor": encode_cursor([version, todo_id]),
+        "has_more": has_more,
+    }
+
+
+@router.get("/stats", status_code=status.HTTP_200_OK)
+async def read_stats(user: user_dependency, db: owner_read_db_dependency):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
+        )
+    return await stats.read_stats(db, user.get("user_id"))
+
+
+@router.get(
+    "/search", status_code=status.HTTP_200_OK, response_model=list[TodoResponse]
+)
+async def search(
+    user: user_dependency,
+    db: owner_read_db_dependency,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
+        )
+    try:
+        todos, next_cursor = await search_todos(
+            db, user.get("user_id"), q, cursor, limit
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    headers = {} if next_cursor is None else {"X-Next-Cursor": next_cursor}
+    return ORJSONResponse(todo_rows(todos), headers=headers)
+
+
+async def event_stream(subscription: Subscription):
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(), timeout=EVENT_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                yield "event: resync\ndata: {}\n\n"
+                return
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get("/events", status_code=status.HTTP_200_OK)
+async def stream_events(user: user_dependency):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
+        )
+    return StreamingResponse(
+        event_stream(broker.subscribe(user.get("user_id"))),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.websocket("/ws")
+async def websocket_events(websocket: WebSocket, token: str):
+    # Browsers cannot set headers on a WebSocket handshake, so the bearer
+    # token comes in the query string instead.
+    try:
+        user = await get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscription = broker.subscribe(user.get("user_id"))
+    receiver = asyncio.create_task(websocket.receive_text())
+    try:
+        while True:
+            getter = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait(
+                {getter, receiver}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiver in done:
+                getter.cancel()
+                receiver.result()
+                receiver = asyncio.create_task(websocket.receive_text())
+                continue
+            event = getter.result()
+            if event is None:
+                await websocket.send_json({"type": "resync"})
+                await websocket.close()
+                return
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        broker.unsubscribe(subscription)
+
+
+@router.get("/{todo_id}", status_code=status.HTTP_200_OK, response_model=TodoResponse)
+async def read_todo(
+    user: user_dependency, db: owner_read_db_dependency, todo_id: int = Path(gt=0)
+):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
+        )
+    for model, selected in (
+        (Todos, TODO_COLUMNS),
+        (ArchivedTodos, ARCHIVED_TODO_COLUMNS),
+    ):
+        todo_model = (
+            await db.execute(
+                select(*selected)
+                .where(model.id == todo_id)
+                .where(model.owner_id == user.get("user_id"))
+            )
+        ).first()
+        if todo_model is not None:
+            break
 
     if todo_model is None:
         raise HTTPException(status_code=404, detail="To-do not found!")
@@ -58,23 +406,133 @@ async def read_todo(
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_todo(
-    user: user_dependency, db: db_dependency, todo_request: TodoRequest
+    user: user_dependency, writer: owner_writer_dependency, todo_request: TodoRequest
 ):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
         )
-    todo_model = Todos(**todo_request.model_dump(), owner_id=user.get("user_id"))
+    await writer.run(
+        lambda db: crud.insert_todos(
+            db, user.get("user_id"), [todo_request.model_dump()]
+        )
+    )
+    return {"message": "To-do created with success!"}
 
-    if todo_model is None:
+
+@router.post("/bulk", status_code=status.HTTP_200_OK)
+async def create_todos(
+    user: user_dependency, db: owner_db_dependency, bulk_request: TodoBulkRequest
+):
+    if user is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Not possible to create To-do.",
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
         )
+    valid, results = validate_bulk_items(bulk_request.todos, TodoRequest)
+    todo_ids = await crud.insert_todos(
+        db, user.get("user_id"), [todo.model_dump() for _, todo in valid]
+    )
+    await db.commit()
 
-    db.add(todo_model)
-    db.commit()
-    return {"message": "To-do created with success!"}
+    for (index, _), todo_id in zip(valid, todo_ids):
+        results[index] = {"index": index, "status": "created", "id": todo_id}
+    return {"results": results}
+
+
+@router.post("/import", status_code=status.HTTP_200_OK)
+async def import_todos(
+    user: user_dependency,
+    db: owner_db_dependency,
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+):
+    # The body is parsed as it arrives and inserted in committed batches, so
+    # memory stays flat however large the upload is. Rows that fail
+    # validation are reported by line number; the others are kept even if
+    # the upload breaks off later.
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
+        )
+    started = time.perf_counter()
+    accepted, rejected, errors, batch = 0, 0, [], []
+
+    async def flush():
+        nonlocal accepted
+        accepted += len(await crud.insert_todos(db, user.get("user_id"), batch))
+        await db.commit()
+        batch.clear()
+
+    async for line, record, record_errors in IMPORT_READERS[format](request.stream()):
+        if record_errors is None:
+            try:
+                batch.append(TodoRequest.model_validate(record).model_dump())
+            except ValidationError as error:
+                record_errors = error.errors(include_url=False, include_context=False)
+        if record_errors is not None:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+                errors.append({"line": line, "errors": record_errors})
+        elif len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "accepted": accepted,
+        "rejected": rejected,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round((accepted + rejected) / elapsed, 1) if elapsed else 0,
+    }
+
+
+@router.put("/bulk", status_code=status.HTTP_200_OK)
+async def update_todos(
+    user: user_dependency, db: owner_db_dependency, bulk_request: TodoBulkRequest
+):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
+        )
+    valid, results = validate_bulk_items(bulk_request.todos, TodoBulkUpdateItem)
+    updated_ids = await crud.update_todos(
+        db, user.get("user_id"), [todo.model_dump() for _, todo in valid]
+    )
+    await db.commit()
+
+    for index, todo in valid:
+        updated = todo.id in updated_ids
+        results[index] = {
+            "index": index,
+            "status": "updated" if updated else "not_found",
+            "id": todo.id,
+        }
+    return {"results": results}
+
+
+@router.delete("/bulk", status_code=status.HTTP_200_OK)
+async def delete_todos(
+    user: user_dependency, db: owner_db_dependency, bulk_request: TodoBulkDeleteRequest
+):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
+        )
+    deleted_ids = await crud.delete_todos(db, user.get("user_id"), bulk_request.ids)
+    await db.commit()
+
+    return {
+        "results": [
+            {
+                "index": index,
+                "status": "deleted" if todo_id in deleted_ids else "not_found",
+                "id": todo_id,
+            }
+            for index, todo_id in enumerate(bulk_request.ids)
+        ]
+    }
 
 
 @router.put(
@@ -84,7 +542,7 @@ async def create_todo(
 )
 async def update_todo(
     user: user_dependency,
-    db: db_dependency,
+    writer: owner_writer_dependency,
     todo_request: TodoUpdateRequest,
     todo_id: int = Path(gt=0),
 ):
@@ -92,58 +550,26 @@ async def update_todo(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
         )
-    todo_model = (
-        db.query(Todos)
-        .filter(Todos.id == todo_id)
-        .filter(Todos.owner_id == user.get("user_id"))
-        .first()
-    )
-
-    if todo_model is None:
+    changes = {
+        field: value
+        for field, value in todo_request.model_dump().items()
+        if value is not None
+    }
+    if not await writer.run(
+        lambda db: crud.update_todo(db, user.get("user_id"), todo_id, changes)
+    ):
         raise HTTPException(status_code=404, detail="To-do not found!")
 
-    todo_model.title = (
-        todo_request.title if todo_request.title is not None else todo_model.title
-    )
-    todo_model.description = (
-        todo_request.description
-        if todo_request.description is not None
-        else todo_model.description
-    )
-    todo_model.priority = (
-        todo_request.priority
-        if todo_request.priority is not None
-        else todo_model.priority
-    )
-    todo_model.complete = (
-        todo_request.complete
-        if todo_request.complete is not None
-        else todo_model.complete
-    )
-
-    db.add(todo_model)
-    db.commit()
-
 
 @router.delete("/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_todo(
-    user: user_dependency, db: db_dependency, todo_id: int = Path(gt=0)
+    user: user_dependency, writer: owner_writer_dependency, todo_id: int = Path(gt=0)
 ):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated."
         )
-    todo_model = (
-        db.query(Todos)
-        .filter(Todos.id == todo_id)
-        .filter(Todos.owner_id == user.get("user_id"))
-        .first()
-    )
-
-    if todo_model is None:
+    if not await writer.run(
+        lambda db: crud.delete_todos(db, user.get("user_id"), [todo_id])
+    ):
         raise HTTPException(status_code=404, detail="To-do not found!")
-
-    db.query(Todos).filter(Todos.id == todo_id).filter(
-        Todos.owner_id == user.get("user_id")
-    ).delete()
-    db.commit()
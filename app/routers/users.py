@@ -1,12 +1,16 @@
 from typing import Annotated
 
-from bcrypt import checkpw, gensalt, hashpw
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
+from sqlalchemy import select, update
 from starlette import status
 
-from ..db.database import db_dependency
+from ..db.database import db_dependency, read_db_dependency
 from ..db.models import Users
+from ..schemas import UserResponse
+from ..services.passwords import password_hasher
+from ..services.token_cache import token_cache
+from ..services.user_cache import get_profile, user_cache
 from .auth import get_current_user
 
 router = APIRouter(prefix="/users", tags=["User"])
@@ -22,14 +26,18 @@ class PhoneNumberChangeRequest(BaseModel):
     phone_number: str = Field(min_length=5)
 
 
-@router.get("/", status_code=status.HTTP_200_OK)
-async def get_user(user: user_dependency, db: db_dependency):
+@router.get("/", status_code=status.HTTP_200_OK, response_model=UserResponse)
+async def get_user(user: user_dependency, db: read_db_dependency):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
-    return db.query(Users).filter(Users.id == user.get("user_id")).first()
+    profile = await get_profile(db, user.get("user_id"))
+    if profile is None:
+        # A token can outlive the user it was issued to.
+        raise HTTPException(status_code=404, detail="User not found.")
+    return profile
 
 
 @router.put("/change-password", status_code=status.HTTP_204_NO_CONTENT)
@@ -43,20 +51,26 @@ async def change_user_password(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
-    user_to_update = db.query(Users).filter(Users.id == user.get("user_id")).first()
-    if not checkpw(
-        password_change_request.password.encode("utf-8"),
-        user_to_update.password.encode("utf-8"),
+    # The hash is always read from the database, never from the user cache.
+    user_id = user.get("user_id")
+    hashed_password = await db.scalar(select(Users.password).where(Users.id == user_id))
+    if hashed_password is None or not await password_hasher.verify(
+        password_change_request.password, hashed_password
     ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Error on password change.",
         )
-    user_to_update.password = hashpw(
-        password=password_change_request.new_password.encode("utf-8"), salt=gensalt()
-    ).decode("utf-8")
-    db.add(user_to_update)
-    db.commit()
+    await db.execute(
+        update(Users)
+        .where(Users.id == user_id)
+        .values(
+            password=await password_hasher.hash(password_change_request.new_password)
+        )
+    )
+    await db.commit()
+    user_cache.invalidate(user_id)
+    token_cache.evict_user(user_id)
 
 
 @router.put("/change-phone-number", status_code=status.HTTP_204_NO_CONTENT)
@@ -70,8 +84,13 @@ async def change_phone_number(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
-    user_to_update = db.query(Users).filter(Users.id == user.get("user_id")).first()
-
-    user_to_update.phone_number = phone_number_change_request.phone_number
-    db.add(user_to_update)
-    db.commit()
+    updated_user_id = await db.scalar(
+        update(Users)
+        .where(Users.id == user.get("user_id"))
+        .values(phone_number=phone_number_change_request.phone_number)
+        .returning(Users.id)
+    )
+    if updated_user_id is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+    await db.commit()
+    user_cache.invalidate(updated_user_id)
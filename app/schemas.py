@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from .db.models import ArchivedTodos, Todos, Users
+from .responses import render_json, render_msgpack
+
+
+class TodoResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: Optional[str]
+    description: Optional[str]
+    priority: Optional[int]
+    complete: Optional[bool]
+    owner_id: Optional[int]
+    version: int
+    updated_at: Optional[datetime]
+
+
+class UserResponse(BaseModel):
+    """Public view of a user; the password hash never leaves the server."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    email: Optional[str]
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    is_active: Optional[bool]
+    role: Optional[str]
+    phone_number: Optional[str]
+
+
+# List endpoints select exactly these columns as plain rows, which skips the
+# ORM identity map, and turn them into dicts for orjson without validation.
+TODO_FIELDS = tuple(TodoResponse.model_fields)
+TODO_COLUMNS = tuple(getattr(Todos, field) for field in TODO_FIELDS)
+ARCHIVED_TODO_COLUMNS = tuple(getattr(ArchivedTodos, field) for field in TODO_FIELDS)
+
+
+def todo_rows(rows) -> list[dict]:
+    """Rows selected with ``TODO_COLUMNS`` first; extra columns are dropped."""
+    return [dict(zip(TODO_FIELDS, row)) for row in rows]
+
+
+def todo_columns(rows) -> dict[str, list]:
+    """The same rows as one array of values per field."""
+    columns = zip(*rows) if rows else ([] for _ in TODO_FIELDS)
+    return {field: list(values) for field, values in zip(TODO_FIELDS, columns)}
+
+
+def render_todo_list(rows, format: str) -> bytes:
+    """A page of todo rows in a format from ``LIST_MEDIA_TYPES``."""
+    if format == "columnar":
+        return render_json(todo_columns(rows))
+    if format == "msgpack":
+        return render_msgpack(todo_rows(rows))
+    return render_json(todo_rows(rows))
+
+
+USER_FIELDS = tuple(UserResponse.model_fields)
+USER_COLUMNS = tuple(getattr(Users, field) for field in USER_FIELDS)
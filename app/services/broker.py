@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Optional
+
+from sqlalchemy.engine import make_url
+
+from ..config.settings import settings
+from ..db import crud
+from .metrics import Counter, Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+
+def running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class Subscription:
+    """One subscriber's bounded event queue.
+
+    ``None`` on the queue means the subscriber fell too far behind and was
+    dropped; it should resynchronise (e.g. through GET /todos/changes).
+    """
+
+    def __init__(self, owner_id: int, maxsize: int):
+        self.owner_id = owner_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def deliver(self, event: dict):
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: discard its backlog and tell it to resync.
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[dict]:
+        return await self.queue.get()
+
+
+class BrokerBackend:
+    """Carries events between processes; the local broker does the fan-out.
+
+    ``publish`` is called synchronously from the commit hook, so a backend
+    that does I/O must hand the work off to a task.
+    """
+
+    async def start(self, deliver: Callable[[list[dict]], None]):
+        pass
+
+    def publish(self, events: list[dict]):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class SQLiteBackend(BrokerBackend):
+    """Shares events between workers on one host through a SQLite file.
+
+    Each worker appends its own events and polls for the ones written by the
+    other workers; rows older than ``retention`` seconds are pruned.
+    """
+
+    def __init__(self, path: str, poll_interval: float, retention: float = 60):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.worker_id = uuid.uuid4().hex
+        self.last_id = 0
+        self._tasks: set[asyncio.Task] = set()
+        self._poller: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _setup(self):
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY "
+                "AUTOINCREMENT, worker TEXT NOT NULL, payload TEXT NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            self.last_id = connection.execute(
+                "SELECT coalesce(max(id), 0) FROM events"
+            ).fetchone()[0]
+
+    def _write(self, events: list[dict]):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO events (worker, payload, created_at) VALUES (?, ?, ?)",
+                (self.worker_id, json.dumps(events), time.time()),
+            )
+
+    def _read(self) -> list[dict]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT id, worker, payload FROM events WHERE id > ? ORDER BY id",
+                (self.last_id,),
+            ).fetchall()
+            connection.execute(
+                "DELETE FROM events WHERE created_at < ?",
+                (time.time() - self.retention,),
+            )
+        events = []
+        for row_id, worker, payload in rows:
+            self.last_id = row_id
+            if worker != self.worker_id:
+                events.extend(json.loads(payload))
+        return events
+
+    async def start(self, deliver):
+        await asyncio.to_thread(self._setup)
+        self._poller = asyncio.create_task(self._poll(deliver))
+
+    async def _poll(self, deliver):
+        while True:
+            try:
+                events = await asyncio.to_thread(self._read)
+                if events:
+                    deliver(events)
+            except sqlite3.Error:
+                logger.exception("Reading the event bus at %s failed", self.path)
+            await asyncio.sleep(self.poll_interval)
+
+    def publish(self, events):
+        task = asyncio.get_running_loop().create_task(
+            asyncio.to_thread(self._write, events)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class Broker:
+    """In-process pub/sub of todo changes, fanned out per owner."""
+
+    def __init__(self, backend: BrokerBackend, queue_size: int):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._subscribers: defaultdict[int, set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, owner_id: int) -> Subscription:
+        subscription = Subscription(owner_id, self.queue_size)
+        self._subscribers[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.owner_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.owner_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def deliver(self, events: list[dict]):
+        loop = running_loop()
+        for event in events:
+            for subscription in list(self._subscribers.get(event["owner_id"], ())):
+                if subscription.dropped:
+                    self.dropped += 1
+                    self.unsubscribe(subscription)
+                elif subscription.loop is loop:
+                    subscription.deliver(event)
+                else:
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+    def on_changes(self, changes: list[tuple]):
+        events = [
+            {"type": action, "owner_id": owner_id, "id": todo_id}
+            for action, owner_id, todo_id in changes
+        ]
+        self.deliver(events)
+        self.backend.publish(events)
+
+    async def start(self):
+        await self.backend.start(self.deliver)
+
+    async def stop(self):
+        await self.backend.stop()
+
+
+def create_backend() -> BrokerBackend:
+    if settings.EVENT_BUS_URL is None:
+        return BrokerBackend()
+    url = make_url(settings.EVENT_BUS_URL)
+    if url.get_backend_name() != "sqlite" or not url.database:
+        raise ValueError("EVENT_BUS_URL must be a file-backed sqlite:/// URL.")
+    return SQLiteBackend(
+        os.path.abspath(url.database), settings.EVENT_BUS_POLL_MS / 1000
+    )
+
+
+broker = Broker(create_backend(), queue_size=settings.EVENT_QUEUE_SIZE)
+crud.add_change_listener(broker.on_changes)
+
+registry.register(
+    Gauge(
+        "change_feed_subscribers",
+        "Open change feed subscriptions in this worker.",
+        callback=lambda: {(): broker.subscriber_count()},
+    )
+)
+registry.register(
+    Counter(
+        "change_feed_dropped_total",
+        "Subscribers dropped for falling behind their queue bound.",
+        callback=lambda: {(): broker.dropped},
+    )
+)
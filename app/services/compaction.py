@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..config.settings import settings
+from ..db import crud
+from ..db.database import get_sessionmaker, shard_urls
+from ..db.sharding import settled_owners
+from .metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+TODOS_ARCHIVED = registry.register(
+    Counter("todos_archived_total", "Completed todos moved to the archive table.")
+)
+
+
+class Compactor:
+    """Moves completed todos older than ``after_days`` to the archive.
+
+    Each pass works through every shard in transactions of ``batch_size``
+    todos, so the write lock is never held for long, and yields to requests
+    between batches. Owners who are being moved are left for a later pass. Passes run every ``interval`` seconds once started.
+    """
+
+    def __init__(self, after_days: float, batch_size: int, interval: float):
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.after_days > 0
+
+    async def compact_shard(self, shard: int, now: Optional[datetime] = None) -> int:
+        now = datetime.now(timezone.utc) if now is None else now
+        completed_before = now - timedelta(days=self.after_days)
+        archived = 0
+        while True:
+            async with get_sessionmaker(shard=shard)() as db:
+                moved = await crud.archive_todos(
+                    db,
+                    completed_before,
+                    self.batch_size,
+                    owner_filter=partial(settled_owners, shard),
+                )
+                await db.commit()
+            TODOS_ARCHIVED.inc(amount=moved)
+            archived += moved
+            # Less than a full batch also when owners being moved were
+            # skipped; the next pass picks their todos up.
+            if moved < self.batch_size:
+                return archived
+            await asyncio.sleep(0)
+
+    async def compact(self, now: Optional[datetime] = None) -> int:
+        """One pass over every shard; returns how many todos were archived."""
+        archived = 0
+        for shard in range(len(shard_urls())):
+            archived += await self.compact_shard(shard, now)
+        return archived
+
+    async def _run(self):
+        while True:
+            try:
+                archived = await self.compact()
+                if archived:
+                    logger.info("Archived %s completed todos", archived)
+            except SQLAlchemyError:
+                logger.exception("Archiving completed todos failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+compactor = Compactor(
+    after_days=settings.ARCHIVE_AFTER_DAYS,
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+    interval=settings.ARCHIVE_INTERVAL_SECONDS,
+)
+
+
+# Archives everything that is due right away, e.g. before a first deploy
+# with a large backlog of completed todos:
+#
+#     python -m app.services.compaction
+async def main():
+    from ..db.database import dispose_engines
+
+    archived = await compactor.compact()
+    await dispose_engines()
+    print(f"Archived {archived} completed todos.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
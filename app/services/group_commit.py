@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Awaitable, Callable, Optional, TypeVar, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..config.settings import settings
+from ..db.database import get_sessionmaker
+from ..db.instrumentation import request_queries
+from .metrics import COUNT_BUCKETS, Counter, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Operation = Callable[[AsyncSession], Awaitable[T]]
+# A queued mutation, its caller's future and the caller's request_queries.
+Pending = tuple[Operation, asyncio.Future, Optional[list]]
+
+GROUP_COMMIT_BATCH_SIZE = registry.register(
+    Histogram(
+        "db_group_commit_batch_size",
+        "Mutations committed together per group commit.",
+        buckets=COUNT_BUCKETS + (250, 500),
+    )
+)
+GROUP_COMMIT_SPLITS = registry.register(
+    Counter(
+        "db_group_commit_splits_total",
+        "Group commits that failed and were retried one mutation at a time.",
+    )
+)
+
+
+class SessionWriter:
+    """Runs each mutation in the request's own session and commits it."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def run(self, operation: Operation) -> T:
+        result = await operation(self.db)
+        await self.db.commit()
+        return result
+
+
+class GroupCommitter:
+    """Coalesces mutations from concurrent requests into shared transactions.
+
+    A mutation waits at most ``window`` seconds for others to join it, or
+    until ``max_batch`` are queued; the batch then runs in one session and
+    one commit, and every caller gets its own result once that commit has
+    succeeded. Batches run one at a time, so mutations that arrive during a
+    commit form the next batch. If a batch fails, each of its mutations is
+    retried in a transaction of its own and only the failing ones raise.
+    Each mutation's statements count towards its caller's request_queries.
+
+    A caller that goes away while queued does not withdraw its mutation.
+    """
+
+    def __init__(
+        self,
+        window_ms: float,
+        max_batch: int,
+        sessionmaker: Callable[[], async_sessionmaker] = get_sessionmaker,
+    ):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.sessionmaker = sessionmaker
+        self._pending: list[Pending] = []
+        self._oldest = 0.0
+        self._full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def run(self, operation: Operation) -> T:
+        future = asyncio.get_running_loop().create_future()
+        if not self._pending:
+            self._oldest = time.monotonic()
+        self._pending.append((operation, future, request_queries.get()))
+        if self._worker is None or self._worker.done():
+            self._full = asyncio.Event()
+            self._worker = asyncio.create_task(self._drain())
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _drain(self):
+        while self._pending:
+            remaining = self.window - (time.monotonic() - self._oldest)
+            if len(self._pending) < self.max_batch and remaining > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._pending[: self.max_batch]
+            del self._pending[: self.max_batch]
+            self._oldest = time.monotonic()
+            GROUP_COMMIT_BATCH_SIZE.observe(value=len(batch))
+            await self._commit(batch)
+
+    async def _execute(self, batch: list[Pending]) -> list:
+        # The mutations run in this worker task, not in their requests, so
+        # each caller's query counter is put in place for its own mutation.
+        async with self.sessionmaker()() as db:
+            results = []
+            for operation, _, queries in batch:
+                token = request_queries.set(queries)
+                try:
+                    results.append(await operation(db))
+                finally:
+                    request_queries.reset(token)
+            await db.commit()
+            return results
+
+    async def _commit(self, batch: list[Pending]):
+        try:
+            results = await self._execute(batch)
+        except Exception as error:
+            if len(batch) > 1:
+                GROUP_COMMIT_SPLITS.inc()
+                logger.warning(
+                    "Group commit of %s mutations failed, retrying them one by one",
+                    len(batch),
+                )
+                for item in batch:
+                    await self._commit([item])
+                return
+            _, future, _ = batch[0]
+            if not future.done():
+                future.set_exception(error)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def stop(self):
+        """Let the queued mutations commit before shutdown."""
+        if self._worker is not None:
+            await self._worker
+            self._worker = None
+
+
+group_committer = GroupCommitter(
+    window_ms=settings.GROUP_COMMIT_WINDOW_MS,
+    max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+)
+
+
+# Shard 0's committer, above, is the one tuned through settings; the others
+# are made on first use with the same window and batch size.
+group_committers: dict[int, GroupCommitter] = {0: group_committer}
+
+
+def committer_for(shard: int) -> GroupCommitter:
+    committer = group_committers.get(shard)
+    if committer is None:
+        committer = group_committers[shard] = GroupCommitter(
+            window_ms=group_committer.window * 1000,
+            max_batch=group_committer.max_batch,
+            sessionmaker=partial(get_sessionmaker, shard=shard),
+        )
+    return committer
+
+
+def writer_for(db: AsyncSession) -> Union[SessionWriter, GroupCommitter]:
+    """The writer for mutations that would otherwise run in ``db``: the group
+    committer of its shard when GROUP_COMMIT_WINDOW_MS is set."""
+    if group_committer.enabled:
+        return committer_for(db.info.get("shard", 0))
+    return SessionWriter(db)
+
+
+async def stop_group_committers():
+    for committer in list(group_committers.values()):
+        await committer.stop()
@@ -0,0 +1,329 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from sqlalchemy import and_, or_, select, union_all, update
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..config.settings import settings
+from ..db import crud
+from ..db.database import get_sessionmaker, shard_urls
+from ..db.models import AdminJobs, ArchivedTodos, Todos
+from ..db.sharding import settled_owners
+from .metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+JOB_BATCHES = registry.register(
+    Counter(
+        "admin_job_batches_total",
+        "Batches committed by admin jobs, by job kind.",
+        ("kind",),
+    )
+)
+JOBS_FINISHED = registry.register(
+    Counter(
+        "admin_jobs_finished_total",
+        "Admin jobs that stopped running, by job kind and final status.",
+        ("kind", "status"),
+    )
+)
+
+JOB_FIELDS = tuple(column.key for column in AdminJobs.__table__.columns)
+ACTIVE_STATUSES = ("queued", "running")
+# A batch that finds the database locked is retried from the last
+# checkpoint, waiting twice as long each time, before the job fails.
+BUSY_RETRIES = 5
+BUSY_BACKOFF_SECONDS = 0.1
+
+
+def todo_ids(params: dict, after_id: int, limit: int):
+    """The next ``limit`` todos after ``after_id`` that match ``params``,
+    archived ones included, as ``(id, owner_id)`` rows."""
+    tiers = []
+    for model in (Todos, ArchivedTodos):
+        tier = select(model.id, model.owner_id).where(model.id > after_id)
+        if params.get("owner_id") is not None:
+            tier = tier.where(model.owner_id == params["owner_id"])
+        if params.get("complete_only"):
+            tier = tier.where(model.complete.is_(True))
+        tiers.append(tier)
+    ids = union_all(*tiers).subquery()
+    return select(ids.c.id, ids.c.owner_id).order_by(ids.c.id).limit(limit)
+
+
+async def delete_batch(db: AsyncSession, params: dict, ids: list[int]) -> int:
+    return len(
+        await crud.delete_todos(
+            db,
+            params.get("owner_id"),
+            ids,
+            complete_only=params.get("complete_only", False),
+        )
+    )
+
+
+async def reassign_batch(db: AsyncSession, params: dict, ids: list[int]) -> int:
+    return len(
+        await crud.reassign_todos(
+            db, params["owner_id"], params["to_owner_id"], set(ids)
+        )
+    )
+
+
+class JobKind(NamedTuple):
+    # Extra filters for ``todo_ids``, merged over the submitted parameters.
+    filters: dict
+    apply: Callable[[AsyncSession, dict, list[int]], Awaitable[int]]
+
+
+# The batch functions repeat the filters in their DELETE or UPDATE, so a
+# todo that changed after its id was read is left alone, and a batch that
+# is repeated after a crash finds nothing left to do.
+JOB_KINDS = {
+    "purge_completed": JobKind({"complete_only": True}, delete_batch),
+    "delete_owner_todos": JobKind({}, delete_batch),
+    "reassign_todos": JobKind({}, reassign_batch),
+}
+
+
+def is_busy(error: OperationalError) -> bool:
+    # SQLite reports both a busy writer and a stale WAL snapshot this way.
+    return "database is locked" in str(error.orig)
+
+
+def job_dict(row) -> dict:
+    job = dict(zip(JOB_FIELDS, row))
+    job["params"] = json.loads(job["params"])
+    return job
+
+
+class JobRunner:
+    """Runs admin jobs from the ``admin_jobs`` table, one at a time.
+
+    A job deletes or updates ``batch_size`` todos per transaction and sleeps
+    ``pause`` seconds between batches. A batch that finds the database
+    locked is retried, see BUSY_RETRIES. Its position is saved after every
+    batch, which is also when a cancellation takes effect. Queued jobs, and
+    running ones nobody has checkpointed for ``stale_after`` seconds, are
+    claimed with a conditional update, so several workers can share the
+    table.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        pause: float,
+        poll_interval: float,
+        stale_after: float,
+        sessionmaker: Callable[..., async_sessionmaker] = get_sessionmaker,
+    ):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.sessionmaker = sessionmaker
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        claimable = or_(
+            AdminJobs.status == "queued",
+            and_(
+                AdminJobs.status == "running",
+                AdminJobs.updated_at < now - timedelta(seconds=self.stale_after),
+            ),
+        )
+        async with self.sessionmaker()() as db:
+            job_id = await db.scalar(
+                select(AdminJobs.id).where(claimable).order_by(AdminJobs.id).limit(1)
+            )
+            if job_id is None:
+                return None
+            row = (
+                await db.execute(
+                    update(AdminJobs)
+                    .where(AdminJobs.id == job_id, claimable)
+                    .values(status="running", updated_at=now)
+                    .returning(*AdminJobs.__table__.columns)
+                )
+            ).first()
+            await db.commit()
+        # None as well when another worker claimed it first.
+        return None if row is None else job_dict(row)
+
+    async def checkpoint(self, job: dict, **values) -> bool:
+        """Save progress; False once the job has been cancelled."""
+        async with self.sessionmaker()() as db:
+            result = await db.execute(
+                update(AdminJobs)
+                .where(AdminJobs.id == job["id"], AdminJobs.status == "running")
+                .values(**values, updated_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+        return result.rowcount > 0
+
+    async def finish(self, job: dict, status: str, error: Optional[str] = None):
+        now = datetime.now(timezone.utc)
+        await self.checkpoint(job, status=status, error=error, finished_at=now)
+        JOBS_FINISHED.inc(job["kind"], status)
+
+    async def run_batch(
+        self, kind: JobKind, params: dict, shard: int, after_id: int
+    ) -> tuple[list[int], int]:
+        """Apply ``kind`` to the next batch; its ids and how many it changed.
+
+        Todos of owners who are being moved, or who live on another shard,
+        are skipped; see ``settled_owners``.
+        """
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                async with self.sessionmaker(shard=shard)() as db:
+                    rows = (
+                        await db.execute(todo_ids(params, after_id, self.batch_size))
+                    ).all()
+                    owners = await settled_owners(
+                        shard, {owner_id for _, owner_id in rows}
+                    )
+                    ids = [todo_id for todo_id, owner_id in rows if owner_id in owners]
+                    changed = 0
+                    if ids:
+                        changed = await kind.apply(db, params, ids)
+                        await db.commit()
+                return [todo_id for todo_id, _ in rows], changed
+            except OperationalError as error:
+                if not is_busy(error) or attempt == BUSY_RETRIES:
+                    raise
+                logger.warning("Admin job batch found the database locked, retrying")
+                await asyncio.sleep(BUSY_BACKOFF_SECONDS * 2**attempt)
+
+    async def run(self, job: dict):
+        kind = JOB_KINDS[job["kind"]]
+        params = {**job["params"], **kind.filters}
+        shard, after_id, processed = job["shard"], job["checkpoint"], job["processed"]
+        try:
+            while shard < len(shard_urls()):
+                ids, changed = await self.run_batch(kind, params, shard, after_id)
+                processed += changed
+                if ids:
+                    JOB_BATCHES.inc(job["kind"])
+                    after_id = ids[-1]
+                else:
+                    shard, after_id = shard + 1, 0
+                if not await self.checkpoint(
+                    job, shard=shard, checkpoint=after_id, processed=processed
+                ):
+                    JOBS_FINISHED.inc(job["kind"], "cancelled")
+                    return
+                if ids:
+                    await asyncio.sleep(self.pause)
+        except Exception as error:
+            logger.exception("Admin job %s failed", job["id"])
+            await self.finish(job, "failed", str(error))
+            return
+        await self.finish(job, "succeeded")
+
+    async def run_pending(self):
+        """Run jobs until none is left to claim."""
+        while True:
+            job = await self.claim()
+            if job is None:
+                return
+            await self.run(job)
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_pending()
+            except SQLAlchemyError:
+                logger.exception("Claiming admin jobs failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def wake(self):
+        """Look for work now instead of at the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        # An interrupted job resumes from its last checkpoint once it is
+        # considered stale.
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+
+
+job_runner = JobRunner(
+    batch_size=settings.ADMIN_JOB_BATCH_SIZE,
+    pause=settings.ADMIN_JOB_PAUSE_MS / 1000,
+    poll_interval=settings.ADMIN_JOB_POLL_SECONDS,
+    stale_after=settings.ADMIN_JOB_STALE_SECONDS,
+)
+
+
+async def submit_job(
+    db: AsyncSession, kind: str, params: dict, created_by: Optional[int]
+) -> dict:
+    now = datetime.now(timezone.utc)
+    row = (
+        await db.execute(
+            AdminJobs.__table__.insert()
+            .values(
+                kind=kind,
+                params=json.dumps(params),
+                status="queued",
+                created_by=created_by,
+                created_at=now,
+                updated_at=now,
+            )
+            .returning(*AdminJobs.__table__.columns)
+        )
+    ).first()
+    await db.commit()
+    job_runner.wake()
+    return job_dict(row)
+
+
+async def read_job(db: AsyncSession, job_id: int) -> Optional[dict]:
+    row = (
+        await db.execute(
+            select(*AdminJobs.__table__.columns).where(AdminJobs.id == job_id)
+        )
+    ).first()
+    return None if row is None else job_dict(row)
+
+
+async def read_jobs(db: AsyncSession, limit: int) -> list[dict]:
+    rows = await db.execute(
+        select(*AdminJobs.__table__.columns).order_by(AdminJobs.id.desc()).limit(limit)
+    )
+    return [job_dict(row) for row in rows]
+
+
+async def cancel_job(db: AsyncSession, job_id: int) -> bool:
+    """Cancel a queued or running job; False if it was not active."""
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        update(AdminJobs)
+        .where(AdminJobs.id == job_id, AdminJobs.status.in_(ACTIVE_STATUSES))
+        .values(status="cancelled", updated_at=now, finished_at=now)
+    )
+    await db.commit()
+    return result.rowcount > 0
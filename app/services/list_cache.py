@@ -0,0 +1,53 @@
+import hashlib
+
+from ..config.settings import settings
+from .cache import LRUCache
+from .metrics import register_cache
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+class ListCache:
+    """Serialized todo list responses keyed by owner, version and query.
+
+    The version is the owner's ``todo_sync_versions`` row, which every write
+    bumps in its own transaction, whichever worker makes it. Entries cached
+    before a write are never looked up again and simply age out of the LRU,
+    and every worker hands out the same ETag for the same list.
+    """
+
+    def __init__(self, maxsize: int):
+        self.enabled = maxsize > 0
+        self._cache = LRUCache(max(maxsize, 1))
+
+    def key(self, owner_id: int, version: int, params: tuple) -> tuple:
+        return owner_id, version, params
+
+    def etag(self, key: tuple) -> str:
+        owner_id, version, params = key
+        digest = hashlib.blake2b(repr(params).encode(), digest_size=6).hexdigest()
+        return f'"{owner_id}-{version}-{digest}"'
+
+    def get(self, key: tuple):
+        return self._cache.get(key) if self.enabled else None
+
+    def set(self, key: tuple, value):
+        if self.enabled:
+            self._cache.set(key, value)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+list_cache = ListCache(maxsize=settings.LIST_CACHE_SIZE)
+register_cache("todo_list", list_cache.stats)
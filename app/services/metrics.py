@@ -0,0 +1,239 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Optional
+
+# Default latency buckets in seconds, from sub-millisecond cache hits up to
+# multi-second exports.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple = (),
+        callback: Optional[Callable[[], dict]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        # ``callback`` reports {labels: value} at scrape time, for values that
+        # are owned and counted by some other component.
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values: dict = {}
+
+    def snapshot(self) -> dict:
+        values = dict(self._values)
+        if self.callback is not None:
+            values.update(self.callback())
+        return values
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"
+            for labels, value in sorted(self.snapshot().items())
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Summary(Metric):
+    """Sum and count only; cheap enough for high-cardinality labels."""
+
+    type = "summary"
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            total, count = self._values.get(labels, (0.0, 0))
+            self._values[labels] = (total + value, count + 1)
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, (total, count) in sorted(self._values.items()):
+            label_text = format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            # The extra slot past the last bound counts the +Inf overflow.
+            counts, total = self._values.get(
+                labels, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[labels] = (counts, total + value)
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                label_text = format_labels(
+                    self.label_names, labels, f'le="{format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+HTTP_REQUESTS = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route and status code.",
+        ("method", "route", "status"),
+    )
+)
+HTTP_REQUEST_DURATION = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route.",
+        ("method", "route"),
+    )
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+)
+APP_STARTUP_DURATION = registry.register(
+    Gauge(
+        "app_startup_seconds",
+        "Time from importing the app package until startup completed.",
+    )
+)
+HTTP_REQUEST_DB_QUERIES = registry.register(
+    Histogram(
+        "http_request_db_queries",
+        "SQL statements executed per HTTP request.",
+        ("method", "route"),
+        buckets=COUNT_BUCKETS,
+    )
+)
+HTTP_REQUEST_DB_DURATION = registry.register(
+    Histogram(
+        "http_request_db_duration_seconds",
+        "Time spent in SQL statements per HTTP request.",
+        ("method", "route"),
+    )
+)
+DB_STATEMENT_DURATION = registry.register(
+    Summary(
+        "db_statement_duration_seconds",
+        "SQL execution time by normalized statement.",
+        ("statement",),
+    )
+)
+
+# In-process caches report their own counters; see ``register_cache``.
+caches: dict[str, Callable[[], dict]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    caches[name] = stats
+
+
+def cache_stat(key: str, result: Optional[str] = None) -> dict:
+    values = {}
+    for name, stats in caches.items():
+        labels = (name,) if result is None else (name, result)
+        values[labels] = stats()[key]
+    return values
+
+
+CACHE_LOOKUPS = registry.register(
+    Counter(
+        "cache_lookups_total",
+        "In-process cache lookups by result.",
+        ("cache", "result"),
+        callback=lambda: {**cache_stat("hits", "hit"), **cache_stat("misses", "miss")},
+    )
+)
+CACHE_EVICTIONS = registry.register(
+    Counter(
+        "cache_evictions_total",
+        "Entries evicted from in-process caches to stay within their size.",
+        ("cache",),
+        callback=lambda: cache_stat("evictions"),
+    )
+)
+CACHE_ENTRIES = registry.register(
+    Gauge(
+        "cache_entries",
+        "Entries currently held by in-process caches.",
+        ("cache",),
+        callback=lambda: cache_stat("size"),
+    )
+)
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import math
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional
+
+from bcrypt import checkpw, gensalt, hashpw
+from fastapi import HTTPException, status
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Calibration never picks a cost below this, however fast the host is.
+MIN_CALIBRATED_ROUNDS = 10
+MAX_ROUNDS = 31
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return hashpw(password, gensalt(rounds=rounds))
+
+
+def _verify(password: bytes, hashed_password: bytes) -> bool:
+    return checkpw(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a bounded pool of workers.
+
+    At most ``workers`` hashes run at once and at most ``queue_size`` more
+    wait for a worker; anything beyond that is rejected straight away with a
+    503 so a burst of sign-ins cannot pile up behind the pool.
+    """
+
+    def __init__(self, workers: int, queue_size: int, rounds: int, executor: str):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self.executor_kind = executor
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                # Imported here: multiprocessing is only needed in this mode.
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _submit(self, function, *args):
+        if self.pending >= self.workers + self.queue_size:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), function, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._submit(_hash, password.encode("utf-8"), self.rounds)
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(
+            _verify, password.encode("utf-8"), hashed_password.encode("utf-8")
+        )
+
+    def calibrate(self, target_ms: float, samples: int = 5) -> int:
+        """Pick the cost factor whose hash time is closest to ``target_ms``.
+
+        Each extra round doubles the work, so the cost is extrapolated from
+        the cheapest cost factor rather than by hashing at ever higher costs.
+        """
+        started = time.perf_counter()
+        for _ in range(samples):
+            _hash(b"calibration", 4)
+        base_ms = (time.perf_counter() - started) * 1000 / samples
+        rounds = 4 + round(math.log2(target_ms / base_ms))
+        self.rounds = max(MIN_CALIBRATED_ROUNDS, min(MAX_ROUNDS, rounds))
+        logger.info(
+            "bcrypt cost factor calibrated to %s rounds for a %sms target",
+            self.rounds,
+            target_ms,
+        )
+        return self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    rounds=settings.BCRYPT_ROUNDS,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+)
@@ -0,0 +1,44 @@
+import hashlib
+import time
+from typing import Optional
+
+from ..config.settings import settings
+from .cache import LRUCache
+from .metrics import register_cache
+
+
+class TokenCache:
+    """Verified bearer tokens, keyed by a digest of the raw token.
+
+    Entries expire at the token's own ``exp`` claim, so a cached token is
+    never honoured past the point where ``jwt_decode`` would reject it.
+    ``evict_user`` drops a user's cached tokens, e.g. after a password
+    change; like any JWT they stay valid until they expire.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize, clock=time.time)
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        user = self._cache.get(self.key(token))
+        return None if user is None else dict(user)
+
+    def put(self, token: str, user: dict, expires_at: float):
+        self._cache.set(self.key(token), dict(user), expires_at)
+
+    def evict_user(self, user_id: int):
+        self._cache.evict_where(lambda key, user: user["user_id"] == user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+token_cache = TokenCache(maxsize=settings.TOKEN_CACHE_SIZE)
+register_cache("token", token_cache.stats)
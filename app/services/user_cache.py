@@ -0,0 +1,91 @@
+import time
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config.settings import settings
+from ..db.models import Users
+from ..schemas import USER_COLUMNS, USER_FIELDS
+from .cache import LRUCache
+from .metrics import register_cache
+
+
+class UserCache:
+    """Public user profiles, keyed by id and looked up by id or username.
+
+    Profiles never include the password hash: anything that checks a
+    password reads the hash from the database. Entries live for ``ttl``
+    seconds, which bounds how stale another worker's copy can get; this
+    process drops its copy through ``invalidate`` whenever a user changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.enabled = maxsize > 0
+        self.ttl = ttl
+        self._profiles = LRUCache(max(maxsize, 1))
+        self._ids = LRUCache(max(maxsize, 1))
+        self._invalidations = 0
+
+    def get(self, user_id: int) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        profile = self._profiles.get(user_id)
+        return None if profile is None else dict(profile)
+
+    def get_by_username(self, username: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        user_id = self._ids.get(username)
+        return None if user_id is None else self.get(user_id)
+
+    def snapshot(self) -> int:
+        """Taken before reading a profile from the database; see ``set``."""
+        return self._invalidations
+
+    def set(self, profile: dict, snapshot: int):
+        # A profile read before an invalidation may predate the change that
+        # caused it, so it is not cached.
+        if not self.enabled or snapshot != self._invalidations:
+            return
+        expires_at = time.monotonic() + self.ttl
+        self._profiles.set(profile["id"], dict(profile), expires_at)
+        self._ids.set(profile["username"], profile["id"], expires_at)
+
+    def invalidate(self, user_id: int):
+        self._invalidations += 1
+        profile = self._profiles.pop(user_id)
+        if profile is not None:
+            self._ids.pop(profile["username"])
+
+    def clear(self):
+        self._invalidations += 1
+        self._profiles.clear()
+        self._ids.clear()
+
+    def stats(self) -> dict:
+        # A username that resolves goes on to a profile lookup, counted there;
+        # one that does not is a miss the profile cache never sees.
+        stats = self._profiles.stats()
+        stats["misses"] += self._ids.misses
+        return stats
+
+
+user_cache = UserCache(
+    maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
+register_cache("user", user_cache.stats)
+
+
+async def get_profile(db: AsyncSession, user_id: int) -> Optional[dict]:
+    profile = user_cache.get(user_id)
+    if profile is None:
+        snapshot = user_cache.snapshot()
+        row = (
+            await db.execute(select(*USER_COLUMNS).where(Users.id == user_id))
+        ).first()
+        if row is None:
+            return None
+        profile = dict(zip(USER_FIELDS, row))
+        user_cache.set(profile, snapshot)
+    return profile
@@ -0,0 +1,102 @@
+"""Concurrent-request throughput: sync Session vs AsyncSession in async routes.
+
+Both routes run the same query, which waits ``--latency-ms`` inside SQLite to
+stand in for database I/O. ``/sync`` reproduces the old pattern (an
+``async def`` handler calling a synchronous ``Session``), which blocks the
+event loop for the whole query; ``/async`` uses the ``AsyncSession`` path the
+routers now depend on.
+
+    python -m benchmarks.bench_async_db --requests 64 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+SLOW_QUERY = text("SELECT db_sleep(:ms)")
+
+
+def db_sleep(ms):
+    time.sleep(ms / 1000)
+    return ms
+
+
+def build_app(path: str, latency_ms: int) -> FastAPI:
+    engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False}
+    )
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def register_sync(dbapi_connection, connection_record):
+        dbapi_connection.create_function("db_sleep", 1, db_sleep)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def register_async(dbapi_connection, connection_record):
+        dbapi_connection.run_async(
+            lambda connection: connection.create_function("db_sleep", 1, db_sleep)
+        )
+
+    SessionLocal = sessionmaker(bind=engine)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine)
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_route():
+        with SessionLocal() as db:
+            return {"ms": db.execute(SLOW_QUERY, {"ms": latency_ms}).scalar_one()}
+
+    @app.get("/async")
+    async def async_route():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(SLOW_QUERY, {"ms": latency_ms})
+            return {"ms": result.scalar_one()}
+
+    return app
+
+
+async def run(app: FastAPI, route: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def one():
+            async with semaphore:
+                response = await client.get(route)
+                response.raise_for_status()
+
+        await one()  # warm up connections
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = build_app(os.path.join(directory, "bench.db"), args.latency_ms)
+        for route in ("/sync", "/async"):
+            elapsed = asyncio.run(run(app, route, args.requests, args.concurrency))
+            print(
+                f"{route:7} {args.requests} requests, concurrency {args.concurrency}: "
+                f"{elapsed:.2f}s, {args.requests / elapsed:.1f} req/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Change feed fan-out latency with many idle subscribers in one worker.
+
+Needs the usual app settings in the environment (SECRET_KEY, ALGORITHM, ...).
+
+    python -m benchmarks.bench_broker --subscribers 10000 --events 1000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services.broker import Broker, BrokerBackend
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def single_owner_latency(subscribers: int, events: int) -> list[float]:
+    """One active subscriber; every other subscriber belongs to another owner."""
+    broker = Broker(BrokerBackend(), queue_size=100)
+    for owner_id in range(1, subscribers + 1):
+        broker.subscribe(owner_id)
+    active = broker.subscribe(0)
+
+    samples = []
+    for todo_id in range(events):
+        started = time.perf_counter()
+        broker.on_changes([("updated", 0, todo_id)])
+        await active.get()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def broadcast_latency(subscribers: int, events: int) -> list[float]:
+    """Every subscriber follows the same owner, so each event fans out to all.
+
+    Measures the time to enqueue the event for every subscriber; consumers
+    are drained outside the timed section.
+    """
+    broker = Broker(BrokerBackend(), queue_size=100)
+    subscriptions = [broker.subscribe(0) for _ in range(subscribers)]
+
+    samples = []
+    for todo_id in range(events):
+        started = time.perf_counter()
+        broker.on_changes([("updated", 0, todo_id)])
+        samples.append(time.perf_counter() - started)
+        for subscription in subscriptions:
+            subscription.queue.get_nowait()
+    return samples
+
+
+def report(label: str, samples: list[float]):
+    print(
+        f"{label:28} p50 {percentile(samples, 0.5) * 1e6:9.1f}us  "
+        f"p99 {percentile(samples, 0.99) * 1e6:9.1f}us  "
+        f"mean {statistics.fmean(samples) * 1e6:9.1f}us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=1000)
+    args = parser.parse_args()
+
+    report(
+        f"1 of {args.subscribers} subscribers",
+        asyncio.run(single_owner_latency(args.subscribers, args.events)),
+    )
+    report(
+        f"all {args.subscribers} subscribers",
+        asyncio.run(broadcast_latency(args.subscribers, max(1, args.events // 100))),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""1,000 single todo calls vs one bulk call, for create and delete.
+
+python -m benchmarks.bench_bulk --items 1000
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import load_app, prepare_environment
+
+TODO = {
+    "title": "Benchmark todo",
+    "description": "Created by bench_bulk",
+    "priority": 3,
+}
+
+
+async def run(app, items: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        started = time.perf_counter()
+        for _ in range(items):
+            (await client.post("/todos/", json=TODO)).raise_for_status()
+        single_create = time.perf_counter() - started
+
+        ids = [
+            todo["id"]
+            for todo in (await client.get("/todos/", params={"limit": items})).json()
+        ]
+        started = time.perf_counter()
+        for todo_id in ids:
+            (await client.delete(f"/todos/{todo_id}")).raise_for_status()
+        single_delete = time.perf_counter() - started
+
+        started = time.perf_counter()
+        response = await client.post("/todos/bulk", json={"todos": [TODO] * items})
+        response.raise_for_status()
+        bulk_create = time.perf_counter() - started
+
+        ids = [result["id"] for result in response.json()["results"]]
+        started = time.perf_counter()
+        response = await client.request("DELETE", "/todos/bulk", json={"ids": ids})
+        response.raise_for_status()
+        bulk_delete = time.perf_counter() - started
+
+    for label, single, bulk in (
+        ("create", single_create, bulk_create),
+        ("delete", single_delete, bulk_delete),
+    ):
+        print(
+            f"{label}: {items} single calls {single:.2f}s, one bulk call "
+            f"{bulk:.3f}s ({single / bulk:.0f}x)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        prepare_environment(directory)
+        asyncio.run(run(load_app(), args.items))
+
+
+if __name__ == "__main__":
+    main()
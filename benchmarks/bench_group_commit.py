@@ -0,0 +1,92 @@
+"""Single-todo writes per second with group commit off and on.
+
+Concurrent clients create, update and delete todos one request at a time;
+each mode runs against a fresh database file.
+
+python -m benchmarks.bench_group_commit --writes 2000 --concurrency 1 16 64
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import load_app, prepare_environment
+
+TODO = {
+    "title": "Benchmark todo",
+    "description": "Created by bench_group_commit",
+    "priority": 3,
+}
+
+
+async def run(app, writes: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        created = iter(range(writes))
+
+        async def writer():
+            for index in created:
+                # Creates, then updates and deletes of the rows made so far.
+                if index % 3 == 0:
+                    response = await client.post("/todos/", json=TODO)
+                elif index % 3 == 1:
+                    response = await client.put(
+                        f"/todos/{index // 3 + 1}", json={"complete": True}
+                    )
+                else:
+                    response = await client.delete(f"/todos/{index // 3 + 1}")
+                if response.status_code >= 500:
+                    response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(writer() for _ in range(concurrency)))
+        return writes / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--window-ms", type=float, default=2)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument(
+        "--synchronous", default="normal", help="SQLITE_SYNCHRONOUS for the run"
+    )
+    args = parser.parse_args()
+
+    os.environ["SQLITE_SYNCHRONOUS"] = args.synchronous
+    for concurrency in args.concurrency:
+        line = [f"concurrency {concurrency:3}:"]
+        for label, window_ms in (("off", 0), ("on", args.window_ms)):
+            with tempfile.TemporaryDirectory() as directory:
+                prepare_environment(directory)
+                from app.config.settings import get_settings
+                from app.db.database import dispose_engines
+                from app.services.group_commit import group_committer
+
+                # Each mode gets its own database file.
+                get_settings.cache_clear()
+                app = load_app()
+                group_committer.window = window_ms / 1000
+                group_committer.max_batch = args.max_batch
+
+                async def measure():
+                    try:
+                        return await run(app, args.writes, concurrency)
+                    finally:
+                        await group_committer.stop()
+                        await dispose_engines()
+
+                rate = asyncio.run(measure())
+                line.append(f"group commit {label} {rate:8.0f} writes/s")
+        print("  ".join(line))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""FTS5 search vs a LIKE scan of the owner's todos on a large table.
+
+Each todo gets a few common words plus one word from a large vocabulary, so
+queries cover both broad terms (many matches to rank) and selective ones.
+
+python -m benchmarks.bench_search --rows 1000000 --owners 10 --queries 50
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import BENCHMARK_USER, load_app, prepare_environment
+
+VOCABULARY = 100_000
+WORDS = (
+    "buy milk bread call mom dentist invoice report review deploy fix bug "
+    "garden water plants book flight hotel renew passport gym laundry clean "
+    "kitchen pay rent taxes email boss meeting notes backup laptop walk dog"
+).split()
+
+
+def seed(rows: int, owners: int, batch: int = 50_000):
+    from sqlalchemy import insert
+
+    from app.db.database import get_engine
+    from app.db.models import Todos
+
+    generator = random.Random(0)
+    with get_engine().begin() as connection:
+        for start in range(0, rows, batch):
+            connection.execute(
+                insert(Todos),
+                [
+                    {
+                        "title": " ".join(generator.choices(WORDS, k=2))
+                        + f" item{generator.randrange(VOCABULARY)}",
+                        "description": " ".join(generator.choices(WORDS, k=12)),
+                        "priority": generator.randint(1, 5),
+                        "complete": False,
+                        "owner_id": (index % owners) + 1,
+                    }
+                    for index in range(start, min(start + batch, rows))
+                ],
+            )
+
+
+def scan(owner_id: int, term: str):
+    """The unindexed alternative: every term checked against each owner row."""
+    from sqlalchemy import func, or_, select
+    from sqlalchemy.orm import Session
+
+    from app.db.database import get_engine
+    from app.db.models import Todos
+
+    pattern = f"%{term}%"
+    with Session(get_engine()) as db:
+        return db.scalars(
+            select(Todos)
+            .where(
+                Todos.owner_id == owner_id,
+                or_(
+                    func.lower(Todos.title).like(pattern),
+                    func.lower(Todos.description).like(pattern),
+                ),
+            )
+            .order_by(Todos.id.desc())
+            .limit(20)
+        ).all()
+
+
+async def run(app, terms: list[str]):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        fts = []
+        for term in terms:
+            started = time.perf_counter()
+            response = await client.get(
+                "/todos/search", params={"q": term, "limit": 20}
+            )
+            response.raise_for_status()
+            fts.append(time.perf_counter() - started)
+
+    like = []
+    for term in terms:
+        started = time.perf_counter()
+        scan(BENCHMARK_USER["user_id"], term)
+        like.append(time.perf_counter() - started)
+    return fts, like
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--owners", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        prepare_environment(directory)
+        app = load_app()
+        started = time.perf_counter()
+        seed(args.rows, args.owners)
+        print(f"seeded {args.rows} todos in {time.perf_counter() - started:.1f}s")
+        generator = random.Random(1)
+        results = {
+            kind: asyncio.run(run(app, terms))
+            for kind, terms in (
+                ("common", generator.choices(WORDS, k=args.queries)),
+                (
+                    "selective",
+                    [
+                        f"item{generator.randrange(VOCABULARY)}"
+                        for _ in range(args.queries)
+                    ],
+                ),
+            )
+        }
+
+    for kind, (fts, like) in results.items():
+        for label, timings in (("fts5 /todos/search", fts), ("LIKE scan", like)):
+            print(
+                f"{kind} terms, {label}: "
+                f"median {statistics.median(timings) * 1000:.1f}ms, "
+                f"max {max(timings) * 1000:.1f}ms over {len(timings)} queries"
+            )
+
+
+if __name__ == "__main__":
+    main()
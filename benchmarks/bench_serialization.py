@@ -0,0 +1,81 @@
+"""Cost of turning a page of todos into a JSON body, per serialization path.
+
+Needs the usual app settings in the environment (SECRET_KEY, ALGORITHM, ...).
+
+    python -m benchmarks.bench_serialization --sizes 10 1000 100000
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.db.models import Todos
+from app.responses import render_json
+from app.schemas import TODO_FIELDS, TodoResponse, todo_rows
+
+
+def make_rows(size: int) -> list[tuple]:
+    updated_at = datetime.now(timezone.utc)
+    return [
+        (
+            index,
+            f"Todo {index}",
+            "Benchmark todo",
+            index % 5 + 1,
+            False,
+            1,
+            3,
+            updated_at,
+        )
+        for index in range(1, size + 1)
+    ]
+
+
+def orm_jsonable_encoder(rows):
+    todos = [Todos(**dict(zip(TODO_FIELDS, row))) for row in rows]
+    started = time.perf_counter()
+    json.dumps(jsonable_encoder(todos)).encode("utf-8")
+    return time.perf_counter() - started
+
+
+def orm_response_model(rows):
+    todos = [Todos(**dict(zip(TODO_FIELDS, row))) for row in rows]
+    adapter = TypeAdapter(list[TodoResponse])
+    started = time.perf_counter()
+    adapter.dump_json(adapter.validate_python(todos, from_attributes=True))
+    return time.perf_counter() - started
+
+
+def rows_orjson(rows):
+    started = time.perf_counter()
+    render_json(todo_rows(rows))
+    return time.perf_counter() - started
+
+
+PATHS = {
+    "ORM + jsonable_encoder + json": orm_jsonable_encoder,
+    "ORM + response model": orm_response_model,
+    "rows + orjson": rows_orjson,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rows = make_rows(size)
+        print(f"{size} todos:")
+        for label, path in PATHS.items():
+            best = min(path(rows) for _ in range(args.repeat))
+            print(f"  {label:30} {best * 1000:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
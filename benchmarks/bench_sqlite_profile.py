@@ -0,0 +1,162 @@
+"""Mixed read/write load against SQLite with and without the tuned profile.
+
+Every profile gets a fresh database shared by several worker processes, as
+with ``uvicorn --workers``. Each worker runs concurrent clients that list
+todos or create one; failed requests (e.g. "database is locked") are counted.
+
+    python -m benchmarks.bench_sqlite_profile --workers 4 --clients 8 --seconds 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import load_app, prepare_environment
+
+# What the engine did before the profile existed: rollback journal, full
+# fsync on commit and the driver's 5s lock timeout.
+PROFILES = {
+    "untuned": {
+        "SQLITE_JOURNAL_MODE": "delete",
+        "SQLITE_SYNCHRONOUS": "full",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "SQLITE_MMAP_SIZE": "0",
+    },
+    "tuned": {},
+    "tuned + read pool": {"DB_READ_POOL_SIZE": "5"},
+    # One writer connection per process: in-process writers queue on the pool
+    # instead of polling SQLite's lock through the busy handler.
+    "tuned + read pool + 1 writer": {
+        "DB_READ_POOL_SIZE": "5",
+        "DB_POOL_SIZE": "1",
+        "DB_MAX_OVERFLOW": "0",
+    },
+}
+
+TODO = {"title": "Benchmark todo", "description": "Mixed load", "priority": 2}
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def client_loop(client, deadline: float, write_ratio: float, seed: int):
+    generator = random.Random(seed)
+    reads, writes, errors = [], [], Counter()
+    while time.perf_counter() < deadline:
+        write = generator.random() < write_ratio
+        started = time.perf_counter()
+        try:
+            if write:
+                response = await client.post("/todos/", json=TODO)
+            else:
+                response = await client.get("/todos/", params={"limit": 50})
+            response.raise_for_status()
+        except Exception as error:
+            errors[str(getattr(error, "orig", None) or type(error).__name__)] += 1
+            continue
+        (writes if write else reads).append(time.perf_counter() - started)
+    return reads, writes, errors
+
+
+async def run_worker(app, clients: int, seconds: float, write_ratio: float, seed):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        deadline = time.perf_counter() + seconds
+        results = await asyncio.gather(
+            *(
+                client_loop(client, deadline, write_ratio, seed * 1000 + index)
+                for index in range(clients)
+            )
+        )
+    reads = [sample for result in results for sample in result[0]]
+    writes = [sample for result in results for sample in result[1]]
+    return reads, writes, sum((result[2] for result in results), Counter())
+
+
+def load_profile(directory: str, profile: dict):
+    os.environ.update(profile)
+    prepare_environment(directory)
+    # Reads should hit the database, not the serialized page cache.
+    os.environ["LIST_CACHE_SIZE"] = "0"
+    return load_app()
+
+
+def worker(directory, profile, clients, seconds, write_ratio, seed, results):
+    app = load_profile(directory, profile)
+    results.put(asyncio.run(run_worker(app, clients, seconds, write_ratio, seed)))
+
+
+def run_profile(profile: dict, args) -> tuple[list, list, Counter]:
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        # Create the schema once before the workers race to do it.
+        setup = context.Process(target=load_profile, args=(directory, profile))
+        setup.start()
+        setup.join()
+
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=worker,
+                args=(
+                    directory,
+                    profile,
+                    args.clients,
+                    args.seconds,
+                    args.write_ratio,
+                    seed,
+                    results,
+                ),
+            )
+            for seed in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    reads = [sample for result in collected for sample in result[0]]
+    writes = [sample for result in collected for sample in result[1]]
+    return reads, writes, sum((result[2] for result in collected), Counter())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for label, profile in PROFILES.items():
+        reads, writes, errors = run_profile(profile, args)
+        print(
+            f"{label:28} {len(reads) / args.seconds:8.1f} reads/s "
+            f"{len(writes) / args.seconds:8.1f} writes/s "
+            f"{sum(errors.values()):5} errors"
+        )
+        for error, count in errors.most_common():
+            print(f"{'':28} {count:5} x {error}")
+        for kind, samples in (("read", reads), ("write", writes)):
+            if samples:
+                print(
+                    f"{'':28} {kind:5} p50 {percentile(samples, 0.5) * 1000:8.1f}ms"
+                    f"  p95 {percentile(samples, 0.95) * 1000:8.1f}ms"
+                    f"  p99 {percentile(samples, 0.99) * 1000:8.1f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Cold import-to-ready time of N app workers started at once.
+
+Every worker is a fresh interpreter that imports the app and runs its ASGI
+lifespan startup, which is what each ``uvicorn --workers`` process does
+before accepting connections. With ``--uvicorn`` the real server is started
+instead and the clock stops when every worker has logged that startup is
+complete. The database is a fresh copy migrated to the Alembic head.
+
+The default target allows TARGET_MS per worker per CPU core: workers beyond
+the core count can only start one after another.
+
+    python -m benchmarks.bench_startup --workers 4
+"""
+
+import argparse
+import asyncio
+import importlib
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import prepare_environment
+
+READY = "Application startup complete."
+TARGET_MS = 1200
+
+
+async def run_lifespan(app):
+    """Drive the ASGI lifespan protocol: start up, report, shut down."""
+    messages = asyncio.Queue()
+    await messages.put({"type": "lifespan.startup"})
+    sent = []
+
+    async def receive():
+        return await messages.get()
+
+    async def send(message):
+        sent.append(message["type"])
+        if message["type"] == "lifespan.startup.complete":
+            print(READY, flush=True)
+            await messages.put({"type": "lifespan.shutdown"})
+        elif message["type"].endswith(".failed"):
+            raise RuntimeError(message.get("message"))
+
+    await app({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send)
+
+
+def worker(target: str):
+    module, attribute = target.split(":")
+    asyncio.run(run_lifespan(getattr(importlib.import_module(module), attribute)))
+
+
+def start_workers(target: str, workers: int) -> list[subprocess.Popen]:
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--worker", target]
+    return [
+        subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+
+
+def start_uvicorn(target: str, workers: int) -> list[subprocess.Popen]:
+    command = [sys.executable, "-m", "uvicorn", target, "--workers", str(workers)]
+    command += ["--port", "0"]
+    return [subprocess.Popen(command, stderr=subprocess.PIPE, text=True)]
+
+
+def wait_ready(processes: list[subprocess.Popen], workers: int, uvicorn: bool):
+    """Block until ``workers`` startup-complete lines have been seen."""
+    ready = 0
+    for process in processes:
+        stream = process.stderr if uvicorn else process.stdout
+        for line in stream:
+            if READY in line:
+                ready += 1
+                if ready == workers or not uvicorn:
+                    break
+    for process in processes:
+        if uvicorn:
+            process.terminate()
+        process.wait()
+    if ready < workers:
+        raise RuntimeError(f"only {ready} of {workers} workers became ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--target-ms", type=float)
+    parser.add_argument("--uvicorn", action="store_true")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        prepare_environment(directory)
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "upgrade", "head"],
+            check=True,
+            capture_output=True,
+            env=os.environ,
+        )
+        start = start_uvicorn if args.uvicorn else start_workers
+        timings = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            processes = start(args.app, args.workers)
+            wait_ready(processes, args.workers, args.uvicorn)
+            timings.append(time.perf_counter() - started)
+
+    target_ms = args.target_ms or TARGET_MS * math.ceil(
+        args.workers / (os.cpu_count() or 1)
+    )
+    best = min(timings) * 1000
+    print(
+        f"{args.workers} workers ready in {best:.0f}ms "
+        f"(best of {args.rounds}; all: {', '.join(f'{t * 1000:.0f}' for t in timings)})"
+    )
+    print(f"{'within' if best <= target_ms else 'over'} the {target_ms:.0f}ms target")
+    if best > target_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Bytes on the wire and encode time of a todo list page, per format and encoding.
+
+Each list format from ``Accept`` is rendered and then compressed the way
+the compression middleware does it; times are for both steps together.
+Needs the usual app settings in the environment (SECRET_KEY, ALGORITHM, ...).
+
+    python -m benchmarks.bench_wire_formats --sizes 100 10000 100000
+"""
+
+import argparse
+import random
+import time
+
+from app.middleware.compression import ENCODERS
+from app.responses import LIST_MEDIA_TYPES
+from app.schemas import TODO_FIELDS, render_todo_list
+from benchmarks.seed import todo_rows
+
+
+def make_rows(size: int) -> list[tuple]:
+    # Seeded todos with varied words, so compression ratios are not flattered
+    # by identical rows.
+    todos = todo_rows(random.Random(0), owner_id=1, count=size)
+    return [
+        tuple({**todo, "id": index}[field] for field in TODO_FIELDS)
+        for index, todo in enumerate(todos, start=1)
+    ]
+
+
+def encode(rows, list_format: str, encoding: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    body = render_todo_list(rows, list_format)
+    if encoding != "identity":
+        encoder = ENCODERS[encoding]()
+        body = encoder.compress(body) + encoder.finish()
+    return time.perf_counter() - started, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encodings = ("identity", *ENCODERS)
+    for size in args.sizes:
+        rows = make_rows(size)
+        print(f"{size} todos:")
+        for list_format in LIST_MEDIA_TYPES:
+            for encoding in encodings:
+                runs = [encode(rows, list_format, encoding) for _ in range(args.repeat)]
+                best = min(elapsed for elapsed, _ in runs)
+                size_bytes = runs[0][1]
+                print(
+                    f"  {list_format:9} {encoding:9} {size_bytes:12,} bytes "
+                    f"{best * 1000:10.3f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+
+BENCHMARK_USER = {"username": "benchmark", "user_id": 1, "user_role": "admin"}
+
+
+def prepare_environment(directory: str):
+    """Point the app settings at a throwaway database under ``directory``.
+
+    Must run before the settings are first read.
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-of-32-bytes!")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("TEST_DATABASE_URL", os.environ["DATABASE_URL"])
+
+
+def load_app(override_auth: bool = True):
+    """Build the app on a fresh schema, authenticated as a fixed user.
+
+    The throwaway database is created from the models rather than migrated,
+    so the startup schema check is skipped. With ``override_auth`` off the
+    requests need real bearer tokens.
+    """
+    from app.db.database import Base, get_engine
+    from app.main import create_app
+    from app.routers.auth import get_current_user
+
+    Base.metadata.create_all(bind=get_engine())
+    app = create_app(check_schema=False)
+    if override_auth:
+        app.dependency_overrides[get_current_user] = lambda: BENCHMARK_USER
+    return app
@@ -0,0 +1,540 @@
+"""In-process load test of every route, with latency percentiles per route.
+
+Seeds a throwaway database, then drives each route through httpx's
+ASGITransport with a fixed number of concurrent clients holding real bearer
+tokens. Results can be written as JSON and compared against a baseline run.
+
+    python -m benchmarks.load --users 20 --todos-per-user 500 --requests 200 \\
+        --concurrency 8 --output current.json --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from benchmarks.common import load_app, prepare_environment
+from benchmarks.results import (
+    build_results,
+    compare,
+    load_results,
+    print_comparison,
+    summarize,
+    write_results,
+)
+from benchmarks.seed import SEED_PASSWORD, WORDS, Dataset, seed
+
+# Routes that hash or verify a password take a bcrypt worker each, so they
+# run at most this many requests whatever --requests says.
+BCRYPT_REQUESTS = 20
+BULK_SIZE = 10
+IMPORT_SIZE = 1000
+# Long-lived streams have no per-request latency to measure.
+UNMEASURED_ROUTES = {
+    "GET /todos/events": "server-sent event stream",
+    "WEBSOCKET /todos/ws": "websocket",
+}
+
+
+class Workload:
+    """Seeded data and credentials shared by the scenarios of one run.
+
+    The last seeded user is reserved for the password change scenario, whose
+    requests evict the user's cached tokens; everyone else is picked at
+    random.
+    """
+
+    def __init__(self, dataset: Dataset, generator: random.Random):
+        from app.routers.auth import create_access_token
+
+        self.dataset = dataset
+        self.generator = generator
+        self.create_access_token = create_access_token
+        self.headers = {
+            user_id: self.bearer(user_id) for user_id in range(1, dataset.users + 1)
+        }
+        self.password_user = dataset.users
+        self.signups = itertools.count(dataset.users + 1)
+        # (owner, todo id) pairs created by ``prepare`` for delete scenarios.
+        self.disposable: list[tuple[int, int]] = []
+        # Admin job ids created by ``submit_jobs`` for the job scenarios.
+        self.jobs: list[int] = []
+
+    def bearer(self, user_id: int) -> dict:
+        token = self.create_access_token(
+            username=f"user{user_id}",
+            user_id=user_id,
+            role="admin" if user_id == 1 else "user",
+            expires_delta=timedelta(hours=1),
+        )
+        return {"Authorization": f"Bearer {token}"}
+
+    def user(self) -> int:
+        return self.generator.randrange(1, self.password_user)
+
+    def todo(self, user_id: int) -> int:
+        return self.generator.choice(self.dataset.todo_ids[user_id])
+
+
+SendFunction = Callable[[httpx.AsyncClient, Workload, int], Awaitable[httpx.Response]]
+PrepareFunction = Callable[[httpx.AsyncClient, Workload, int], Awaitable[None]]
+
+
+@dataclass
+class Scenario:
+    # "METHOD /path" as registered on the app; see ``app_routes``.
+    route: str
+    send: SendFunction
+    name: str
+    expected: int = 200
+    max_requests: Optional[int] = None
+    # Creates what the timed requests consume, e.g. todos to delete.
+    prepare: Optional[PrepareFunction] = None
+
+
+SCENARIOS: list[Scenario] = []
+
+
+def scenario(route: str, name: Optional[str] = None, **options):
+    def register(send: SendFunction):
+        SCENARIOS.append(
+            Scenario(route=route, send=send, name=name or route, **options)
+        )
+        return send
+
+    return register
+
+
+def todo_payload(workload: Workload) -> dict:
+    generator = workload.generator
+    return {
+        "title": " ".join(generator.choices(WORDS, k=3)),
+        "description": " ".join(generator.choices(WORDS, k=8)),
+        "priority": generator.randint(1, 5),
+    }
+
+
+async def create_disposable(client: httpx.AsyncClient, workload: Workload, count: int):
+    for start in range(0, count, 1000):
+        user_id = workload.user()
+        response = await client.post(
+            "/todos/bulk",
+            json={"todos": [todo_payload(workload)] * min(1000, count - start)},
+            headers=workload.headers[user_id],
+        )
+        response.raise_for_status()
+        workload.disposable.extend(
+            (user_id, result["id"]) for result in response.json()["results"]
+        )
+
+
+async def create_disposable_bulks(
+    client: httpx.AsyncClient, workload: Workload, count: int
+):
+    await create_disposable(client, workload, count * BULK_SIZE)
+
+
+@scenario("GET /health")
+async def health(client, workload, index):
+    return await client.get("/health")
+
+
+@scenario("GET /metrics")
+async def metrics(client, workload, index):
+    return await client.get("/metrics")
+
+
+@scenario("POST /auth/signup", expected=201, max_requests=BCRYPT_REQUESTS)
+async def signup(client, workload, index):
+    number = next(workload.signups)
+    return await client.post(
+        "/auth/signup",
+        json={
+            "username": f"user{number}",
+            "email": f"user{number}@example.com",
+            "first_name": "Bench",
+            "last_name": f"User {number}",
+            "password": SEED_PASSWORD,
+            "role": "user",
+            "phone_number": "5550100",
+        },
+    )
+
+
+@scenario("POST /auth/signin", max_requests=BCRYPT_REQUESTS)
+async def signin(client, workload, index):
+    return await client.post(
+        "/auth/signin",
+        data={"username": f"user{workload.user()}", "password": SEED_PASSWORD},
+    )
+
+
+@scenario("GET /users/")
+async def read_user(client, workload, index):
+    return await client.get("/users/", headers=workload.headers[workload.user()])
+
+
+@scenario("PUT /users/change-password", expected=204, max_requests=BCRYPT_REQUESTS)
+async def change_password(client, workload, index):
+    return await client.put(
+        "/users/change-password",
+        json={"password": SEED_PASSWORD, "new_password": SEED_PASSWORD},
+        headers=workload.bearer(workload.password_user),
+    )
+
+
+@scenario("PUT /users/change-phone-number", expected=204)
+async def change_phone_number(client, workload, index):
+    return await client.put(
+        "/users/change-phone-number",
+        json={"phone_number": f"555{index:04d}"},
+        headers=workload.headers[workload.user()],
+    )
+
+
+@scenario("GET /todos/")
+async def list_todos(client, workload, index):
+    params = {"limit": 50}
+    if workload.generator.random() < 0.5:
+        params["complete"] = workload.generator.random() < 0.5
+    if workload.generator.random() < 0.3:
+        params["priority"] = workload.generator.randint(1, 5)
+    return await client.get(
+        "/todos/", params=params, headers=workload.headers[workload.user()]
+    )
+
+
+@scenario("GET /todos/changes")
+async def list_changes(client, workload, index):
+    return await client.get("/todos/changes", headers=workload.headers[workload.user()])
+
+
+@scenario("GET /todos/stats")
+async def todo_stats(client, workload, index):
+    return await client.get("/todos/stats", headers=workload.headers[workload.user()])
+
+
+@scenario("GET /todos/search")
+async def search(client, workload, index):
+    return await client.get(
+        "/todos/search",
+        params={"q": workload.generator.choice(WORDS), "limit": 20},
+        headers=workload.headers[workload.user()],
+    )
+
+
+@scenario("GET /todos/{todo_id}")
+async def read_todo(client, workload, index):
+    user_id = workload.user()
+    return await client.get(
+        f"/todos/{workload.todo(user_id)}", headers=workload.headers[user_id]
+    )
+
+
+@scenario("POST /todos/", expected=201)
+async def create_todo(client, workload, index):
+    return await client.post(
+        "/todos/",
+        json=todo_payload(workload),
+        headers=workload.headers[workload.user()],
+    )
+
+
+@scenario("POST /todos/bulk")
+async def create_todos(client, workload, index):
+    return await client.post(
+        "/todos/bulk",
+        json={"todos": [todo_payload(workload) for _ in range(BULK_SIZE)]},
+        headers=workload.headers[workload.user()],
+    )
+
+
+@scenario("POST /todos/import", max_requests=50)
+async def import_todos(client, workload, index):
+    lines = (json.dumps(todo_payload(workload)) for _ in range(IMPORT_SIZE))
+    return await client.post(
+        "/todos/import",
+        content="\n".join(lines).encode(),
+        headers=workload.headers[workload.user()],
+    )
+
+
+@scenario("PUT /todos/bulk")
+async def update_todos(client, workload, index):
+    user_id = workload.user()
+    return await client.put(
+        "/todos/bulk",
+        json={
+            "todos": [
+                {"id": workload.todo(user_id), "complete": index % 2 == 0}
+                for _ in range(BULK_SIZE)
+            ]
+        },
+        headers=workload.headers[user_id],
+    )
+
+
+@scenario("DELETE /todos/bulk", prepare=create_disposable_bulks)
+async def delete_todos(client, workload, index):
+    batch = [workload.disposable.pop() for _ in range(BULK_SIZE)]
+    # Disposable todos come in per-owner runs that are a multiple of
+    # BULK_SIZE long, so every batch belongs to a single owner.
+    return await client.request(
+        "DELETE",
+        "/todos/bulk",
+        json={"ids": [todo_id for _, todo_id in batch]},
+        headers=workload.headers[batch[0][0]],
+    )
+
+
+@scenario("PUT /todos/{todo_id}", expected=204)
+async def update_todo(client, workload, index):
+    user_id = workload.user()
+    return await client.put(
+        f"/todos/{workload.todo(user_id)}",
+        json={"priority": workload.generator.randint(1, 5), "complete": True},
+        headers=workload.headers[user_id],
+    )
+
+
+@scenario("DELETE /todos/{todo_id}", expected=204, prepare=create_disposable)
+async def delete_todo(client, workload, index):
+    user_id, todo_id = workload.disposable.pop()
+    return await client.delete(f"/todos/{todo_id}", headers=workload.headers[user_id])
+
+
+@scenario("GET /admin/todos")
+async def admin_list_todos(client, workload, index):
+    return await client.get("/admin/todos", headers=workload.headers[1])
+
+
+@scenario("GET /admin/todos", name="GET /admin/todos?format=ndjson")
+async def admin_export_todos(client, workload, index):
+    return await client.get(
+        "/admin/todos",
+        params={"format": "ndjson", "limit": 1000},
+        headers=workload.headers[1],
+    )
+
+
+@scenario("GET /admin/todos/stats")
+async def admin_todo_stats(client, workload, index):
+    return await client.get("/admin/todos/stats", headers=workload.headers[1])
+
+
+@scenario("DELETE /admin/todos/{todo_id}", expected=204, prepare=create_disposable)
+async def admin_delete_todo(client, workload, index):
+    _, todo_id = workload.disposable.pop()
+    return await client.delete(f"/admin/todos/{todo_id}", headers=workload.headers[1])
+
+
+def job_request(workload: Workload) -> dict:
+    # An owner without todos, so the jobs have nothing to delete should a
+    # runner pick them up.
+    return {"kind": "delete_owner_todos", "owner_id": workload.dataset.users + 10**6}
+
+
+async def submit_jobs(client: httpx.AsyncClient, workload: Workload, count: int):
+    for _ in range(count):
+        response = await client.post(
+            "/admin/jobs", json=job_request(workload), headers=workload.headers[1]
+        )
+        response.raise_for_status()
+        workload.jobs.append(response.json()["id"])
+
+
+@scenario("POST /admin/jobs", expected=202)
+async def admin_submit_job(client, workload, index):
+    return await client.post(
+        "/admin/jobs", json=job_request(workload), headers=workload.headers[1]
+    )
+
+
+@scenario("GET /admin/jobs")
+async def admin_list_jobs(client, workload, index):
+    return await client.get("/admin/jobs", headers=workload.headers[1])
+
+
+@scenario("GET /admin/jobs/{job_id}", prepare=submit_jobs)
+async def admin_read_job(client, workload, index):
+    job_id = workload.generator.choice(workload.jobs)
+    return await client.get(f"/admin/jobs/{job_id}", headers=workload.headers[1])
+
+
+@scenario("DELETE /admin/jobs/{job_id}", prepare=submit_jobs)
+async def admin_cancel_job(client, workload, index):
+    job_id = workload.jobs.pop()
+    return await client.delete(f"/admin/jobs/{job_id}", headers=workload.headers[1])
+
+
+def app_routes(app) -> set[str]:
+    """Every "METHOD /path" the app serves, apart from the generated docs."""
+    from fastapi.routing import APIRoute, APIWebSocketRoute
+
+    def walk(routes):
+        for route in routes:
+            # Newer FastAPI versions keep included routers as a single
+            # route wrapping the original router.
+            original = getattr(route, "original_router", None)
+            if original is not None:
+                yield from walk(original.routes)
+            else:
+                yield route
+
+    routes = set()
+    for route in walk(app.routes):
+        if isinstance(route, APIWebSocketRoute):
+            routes.add(f"WEBSOCKET {route.path}")
+        elif isinstance(route, APIRoute):
+            routes.update(f"{method} {route.path}" for method in route.methods)
+    return routes
+
+
+def uncovered_routes(app) -> set[str]:
+    covered = {scenario.route for scenario in SCENARIOS} | UNMEASURED_ROUTES.keys()
+    return app_routes(app) - covered
+
+
+async def measure(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    workload: Workload,
+    requests: int,
+    warmup: int,
+    concurrency: int,
+) -> dict:
+    requests = min(requests, scenario.max_requests or requests)
+    warmup = min(warmup, requests)
+    if scenario.prepare is not None:
+        await scenario.prepare(client, workload, warmup + requests)
+
+    latencies, errors = [], Counter()
+
+    async def worker(indexes, timed: bool):
+        for index in indexes:
+            started = time.perf_counter()
+            response = await scenario.send(client, workload, index)
+            if timed:
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != scenario.expected:
+                    errors[response.status_code] += 1
+
+    indexes = iter(range(warmup))
+    await asyncio.gather(*(worker(indexes, False) for _ in range(concurrency)))
+    indexes = iter(range(warmup, warmup + requests))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(indexes, True) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, errors)
+
+
+async def run(
+    app,
+    workload: Workload,
+    scenarios: list[Scenario],
+    requests: int,
+    warmup: int,
+    concurrency: int,
+) -> dict[str, dict]:
+    routes = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for scenario in scenarios:
+            routes[scenario.name] = result = await measure(
+                client, scenario, workload, requests, warmup, concurrency
+            )
+            print(
+                f"{scenario.name:40} p50 {result['p50_ms']:8.2f}ms "
+                f"p95 {result['p95_ms']:8.2f}ms p99 {result['p99_ms']:8.2f}ms "
+                f"{result['throughput_rps']:8.1f} req/s"
+                + (f"  {result['errors']} errors" if result["errors"] else "")
+            )
+    return routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--todos-per-user", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--routes", nargs="+", help="only scenarios whose name contains one of these"
+    )
+    parser.add_argument("--bcrypt-rounds", type=int)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--min-delta-ms", type=float, default=0.5)
+    args = parser.parse_args()
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not args.routes or any(part in scenario.name for part in args.routes)
+    ]
+    config = {
+        key: getattr(args, key)
+        for key in (
+            "users",
+            "todos_per_user",
+            "requests",
+            "warmup",
+            "concurrency",
+            "seed",
+            "bcrypt_rounds",
+        )
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        prepare_environment(directory)
+        # Every request comes from the same client address; the per-client
+        # sign-in limit would turn the auth scenarios into 429s.
+        os.environ.setdefault("AUTH_RATE_LIMIT_PER_MINUTE", "0")
+        if args.bcrypt_rounds is not None:
+            os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+        app = load_app(override_auth=False)
+        for route in sorted(uncovered_routes(app)):
+            print(f"warning: no scenario for {route}", file=sys.stderr)
+        started = time.perf_counter()
+        dataset = seed(args.users, args.todos_per_user, args.seed)
+        print(
+            f"seeded {dataset.users} users and {dataset.todos} todos "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        workload = Workload(dataset, random.Random(args.seed))
+        routes = asyncio.run(
+            run(app, workload, scenarios, args.requests, args.warmup, args.concurrency)
+        )
+
+    results = build_results(config, routes)
+    if args.output:
+        write_results(args.output, results)
+    if args.baseline:
+        baseline = load_results(args.baseline)
+        rows = compare(baseline, results, args.threshold, args.min_delta_ms)
+        print()
+        print_comparison(baseline, results, rows)
+        if any(row["status"] == "regression" for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Benchmark results files and the comparison between two of them.
+
+A results file is JSON: the run configuration, the environment it ran in and
+one entry per route with its latency percentiles and throughput.
+
+    python -m benchmarks.results baseline.json current.json --threshold 0.1
+
+Exits with status 1 when any route regressed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+FORMAT_VERSION = 1
+# Latency percentiles that decide a regression; p99 is reported but too noisy
+# on short runs to fail on.
+GATED_PERCENTILES = ("p50_ms", "p95_ms")
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Linearly interpolated percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies: list[float], elapsed: float, errors: Counter) -> dict:
+    """One route's entry from its per-request latencies in seconds."""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": sum(errors.values()),
+        "error_statuses": {str(code): count for code, count in errors.items()},
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        "throughput_rps": len(ordered) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_results(config: dict, routes: dict[str, dict]) -> dict:
+    return {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "git_commit": git_commit(),
+        },
+        "config": config,
+        "routes": routes,
+    }
+
+
+def write_results(path: str, results: dict):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def load_results(path: str) -> dict:
+    with open(path) as file:
+        results = json.load(file)
+    if results.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"{path}: unsupported results format {results.get('format_version')!r}"
+        )
+    return results
+
+
+def compare(
+    baseline: dict, current: dict, threshold: float = 0.1, min_delta_ms: float = 0.5
+) -> list[dict]:
+    """Compare two runs route by route.
+
+    A route regressed when a gated percentile grew by more than ``threshold``
+    (relative) and ``min_delta_ms`` (absolute, so sub-millisecond jitter on
+    fast routes is ignored), when its throughput fell by more than
+    ``threshold``, or when it started failing requests.
+    """
+    rows = []
+    for route in sorted(baseline["routes"].keys() | current["routes"].keys()):
+        before = baseline["routes"].get(route)
+        after = current["routes"].get(route)
+        if before is None or after is None:
+            rows.append(
+                {
+                    "route": route,
+                    "status": "new" if before is None else "missing",
+                    "reasons": [],
+                }
+            )
+            continue
+
+        reasons, improved = [], False
+        for metric in GATED_PERCENTILES:
+            delta = after[metric] - before[metric]
+            if abs(delta) < min_delta_ms or abs(delta) <= before[metric] * threshold:
+                continue
+            if delta > 0:
+                reasons.append(f"{metric} {before[metric]:.2f} -> {after[metric]:.2f}")
+            else:
+                improved = True
+        if after["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            reasons.append(
+                f"throughput_rps {before['throughput_rps']:.1f} -> "
+                f"{after['throughput_rps']:.1f}"
+            )
+        if after["errors"] > 0 and before["errors"] == 0:
+            reasons.append(f"errors 0 -> {after['errors']}")
+
+        status = "regression" if reasons else "improvement" if improved else "ok"
+        rows.append({"route": route, "status": status, "reasons": reasons})
+    return rows
+
+
+def print_comparison(baseline: dict, current: dict, rows: list[dict]):
+    if baseline.get("config") != current.get("config"):
+        print("note: the runs used different configurations")
+    print(
+        f"{'route':40} {'p95 before':>11} {'p95 after':>10} {'rps after':>10}  status"
+    )
+    for row in rows:
+        before = baseline["routes"].get(row["route"], {})
+        after = current["routes"].get(row["route"], {})
+        print(
+            f"{row['route']:40} {before.get('p95_ms', float('nan')):11.2f} "
+            f"{after.get('p95_ms', float('nan')):10.2f} "
+            f"{after.get('throughput_rps', float('nan')):10.1f}  {row['status']}"
+            + (f" ({'; '.join(row['reasons'])})" if row["reasons"] else "")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--min-delta-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+    print_comparison(baseline, current, rows)
+    if any(row["status"] == "regression" for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
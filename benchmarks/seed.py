@@ -0,0 +1,137 @@
+"""Synthetic users and todos for the benchmarks.
+
+User 1 is an admin, the rest are regular users; every user signs in with
+SEED_PASSWORD. Priorities lean towards the middle and high-priority todos are
+less often complete, so filtered lists and stats see uneven buckets.
+
+    python -m benchmarks.seed --users 100 --todos-per-user 1000
+"""
+
+import argparse
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+SEED_PASSWORD = "benchmark-password"
+PRIORITY_WEIGHTS = {1: 10, 2: 20, 3: 35, 4: 25, 5: 10}
+COMPLETE_RATE = {1: 0.7, 2: 0.55, 3: 0.4, 4: 0.3, 5: 0.15}
+WORDS = (
+    "buy milk bread call mom dentist invoice report review deploy fix bug "
+    "garden water plants book flight hotel renew passport gym laundry clean "
+    "kitchen pay rent taxes email boss meeting notes backup laptop walk dog"
+).split()
+
+
+@dataclass
+class Dataset:
+    users: int
+    todos_per_user: int
+    # Seeded todo ids of each user; inserted per user, so always contiguous.
+    todo_ids: dict[int, range] = field(default_factory=dict)
+
+    @property
+    def todos(self) -> int:
+        return self.users * self.todos_per_user
+
+
+def user_rows(users: int, hashed_password: str) -> list[dict]:
+    return [
+        {
+            "id": user_id,
+            "email": f"user{user_id}@example.com",
+            "username": f"user{user_id}",
+            "first_name": "Bench",
+            "last_name": f"User {user_id}",
+            "password": hashed_password,
+            "is_active": True,
+            "role": "admin" if user_id == 1 else "user",
+            "phone_number": "5550100",
+        }
+        for user_id in range(1, users + 1)
+    ]
+
+
+def todo_rows(generator: random.Random, owner_id: int, count: int) -> list[dict]:
+    updated_at = datetime.now(timezone.utc)
+    priorities = generator.choices(
+        list(PRIORITY_WEIGHTS), weights=list(PRIORITY_WEIGHTS.values()), k=count
+    )
+    return [
+        {
+            "title": " ".join(generator.choices(WORDS, k=3)),
+            "description": " ".join(generator.choices(WORDS, k=10)),
+            "priority": priority,
+            "complete": generator.random() < COMPLETE_RATE[priority],
+            "owner_id": owner_id,
+            "version": 1,
+            "updated_at": updated_at,
+        }
+        for priority in priorities
+    ]
+
+
+def seed(
+    users: int, todos_per_user: int, random_seed: int = 0, batch: int = 50_000
+) -> Dataset:
+    """Fill the (empty) database behind the app settings.
+
+    Rows go in through the sync engine with executemany, so the stats and
+    search triggers run but none of the per-request crud work does.
+    """
+    from bcrypt import gensalt, hashpw
+    from sqlalchemy import func, insert, select
+
+    from app.config.settings import settings
+    from app.db.database import get_engine
+    from app.db.models import Todos, TodoSyncVersions, Users
+
+    generator = random.Random(random_seed)
+    hashed_password = hashpw(
+        SEED_PASSWORD.encode("utf-8"), gensalt(rounds=settings.BCRYPT_ROUNDS)
+    ).decode("utf-8")
+    with get_engine().begin() as connection:
+        connection.execute(insert(Users), user_rows(users, hashed_password))
+        connection.execute(
+            insert(TodoSyncVersions),
+            [{"owner_id": user_id, "version": 1} for user_id in range(1, users + 1)],
+        )
+        pending = []
+        for owner_id in range(1, users + 1):
+            pending.extend(todo_rows(generator, owner_id, todos_per_user))
+            if len(pending) >= batch:
+                connection.execute(insert(Todos), pending)
+                pending = []
+        if pending:
+            connection.execute(insert(Todos), pending)
+
+        dataset = Dataset(users=users, todos_per_user=todos_per_user)
+        for owner_id, first, last in connection.execute(
+            select(Todos.owner_id, func.min(Todos.id), func.max(Todos.id)).group_by(
+                Todos.owner_id
+            )
+        ):
+            dataset.todo_ids[owner_id] = range(first, last + 1)
+    return dataset
+
+
+def main():
+    from app.db.database import Base, get_engine
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--todos-per-user", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=get_engine())
+    started = time.perf_counter()
+    dataset = seed(args.users, args.todos_per_user, args.seed)
+    print(
+        f"seeded {dataset.users} users and {dataset.todos} todos "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import status
+from sqlalchemy.exc import OperationalError
+
+from app.db.database import get_db, get_read_db
+from app.db.models import AdminJobs, Todos, TodoStats
+from app.db.stats import repair_stats
+from app.dependencies import get_owner_db, get_owner_read_db
+from app.routers.auth import get_current_user
+from app.services import jobs
+from app.services.jobs import job_runner
+from tests.utils import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    app,
+    client,
+    override_get_current_user,
+    override_get_db,
+    test_todo,
+    test_user,
+)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_owner_db] = override_get_db
+app.dependency_overrides[get_owner_read_db] = override_get_db
+app.dependency_overrides[get_current_user] = override_get_current_user
+
+TODO = {
+    "id": 1,
+    "title": "Learn to Code!",
+    "description": "Need to practice everyday!",
+    "priority": 5,
+    "complete": False,
+    "owner_id": 1,
+    "version": 0,
+    "updated_at": None,
+}
+
+
+def add_todos(count):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Todos(
+                title=f"Todo {index}",
+                description="Admin todo",
+                priority=1,
+                complete=False,
+                owner_id=2,
+            )
+            for index in range(count)
+        ]
+    )
+    db.commit()
+
+
+@pytest.fixture()
+def runner(monkeypatch):
+    monkeypatch.setattr(
+        job_runner, "sessionmaker", lambda shard=0: TestingAsyncSessionLocal
+    )
+    monkeypatch.setattr(job_runner, "batch_size", 2)
+    monkeypatch.setattr(job_runner, "pause", 0)
+    return job_runner
+
+
+def test_admin_read_all_authenticated(test_todo):
+    response = client.get("/admin/todos")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [TODO]
+
+
+def test_admin_read_all_paginates(test_todo):
+    add_todos(2)
+
+    response = client.get("/admin/todos", params={"limit": 2})
+    assert [todo["id"] for todo in response.json()] == [1, 2]
+
+    response = client.get(
+        "/admin/todos", params={"cursor": response.headers["X-Next-Cursor"]}
+    )
+    assert [todo["id"] for todo in response.json()] == [3]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_admin_export_ndjson(test_todo):
+    add_todos(2)
+
+    response = client.get("/admin/todos", params={"format": "ndjson"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == TODO
+    assert [line["id"] for line in lines] == [1, 2, 3]
+
+
+def test_admin_export_ndjson_after_update(test_todo):
+    client.put("/todos/1", json={"complete": True})
+
+    response = client.get("/admin/todos", params={"format": "ndjson"})
+    (line,) = [json.loads(line) for line in response.text.splitlines()]
+    assert line["complete"] is True
+    assert line["updated_at"] is not None
+
+
+def test_admin_export_csv(test_todo):
+    response = client.get("/admin/todos", params={"format": "csv"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert rows == [
+        {key: "" if value is None else str(value) for key, value in TODO.items()}
+    ]
+
+
+def test_admin_delete_todo(test_todo):
+    response = client.delete("/admin/todos/1")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    db = TestingSessionLocal()
+    assert db.query(Todos).filter(Todos.id == 1).first() is None
+
+
+def test_admin_delete_todo_not_found(test_todo):
+    response = client.delete("/admin/todos/999")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {"detail": "To-do not found!"}
+
+
+def test_admin_read_stats(test_todo):
+    add_todos(2)
+
+    response = client.get("/admin/todos/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "total": 3,
+        "complete": 0,
+        "incomplete": 3,
+        "by_priority": [
+            {"priority": 1, "total": 2, "complete": 0},
+            {"priority": 5, "total": 1, "complete": 0},
+        ],
+    }
+
+    response = client.get("/admin/todos/stats", params={"owner_id": 2})
+    assert response.json()["total"] == 2
+
+
+def test_repair_stats(test_todo):
+    add_todos(2)
+    db = TestingSessionLocal()
+    db.query(TodoStats).update({TodoStats.count: 42})
+    db.commit()
+
+    async def repair():
+        async with TestingAsyncSessionLocal() as session:
+            await repair_stats(session)
+            await session.commit()
+
+    asyncio.run(repair())
+
+    response = client.get("/admin/todos/stats")
+    assert response.json()["total"] == 3
+
+
+def test_admin_purge_completed_job(test_todo, runner):
+    add_todos(5)
+    db = TestingSessionLocal()
+    db.query(Todos).filter(Todos.id.in_([2, 3, 5])).update({"complete": True})
+    db.commit()
+
+    response = client.post("/admin/jobs", json={"kind": "purge_completed"})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job = response.json()
+    assert job["status"] == "queued"
+
+    asyncio.run(runner.run_pending())
+
+    job = client.get(f"/admin/jobs/{job['id']}").json()
+    assert (job["status"], job["processed"], job["checkpoint"]) == ("succeeded", 3, 0)
+    assert job["shard"] == 1
+    assert sorted(todo.id for todo in db.query(Todos)) == [1, 4, 6]
+    assert [job["id"] for job in client.get("/admin/jobs").json()] == [job["id"]]
+
+
+def test_admin_job_rechecks_filters_when_deleting(test_todo, runner, monkeypatch):
+    add_todos(3)
+    db = TestingSessionLocal()
+    db.query(Todos).filter(Todos.id == 2).update({"complete": True})
+    db.commit()
+    # Ids read before todos 3 and 4 were reopened: the delete itself has to
+    # leave them alone.
+    select_ids = jobs.todo_ids
+    monkeypatch.setattr(
+        jobs,
+        "todo_ids",
+        lambda params, after_id, limit: select_ids(
+            {**params, "complete_only": False}, after_id, limit
+        ),
+    )
+
+    job = client.post("/admin/jobs", json={"kind": "purge_completed"}).json()
+    asyncio.run(runner.run_pending())
+
+    job = client.get(f"/admin/jobs/{job['id']}").json()
+    assert (job["status"], job["processed"]) == ("succeeded", 1)
+    assert sorted(todo.id for todo in db.query(Todos)) == [1, 3, 4]
+
+
+def test_admin_job_retries_locked_batches(test_todo, runner, monkeypatch):
+    add_todos(3)
+    monkeypatch.setattr(jobs, "BUSY_BACKOFF_SECONDS", 0)
+    delete_todos = jobs.crud.delete_todos
+    failures = iter([True, True])
+
+    async def locked_at_first(db, *args, **kwargs):
+        if next(failures, False):
+            raise OperationalError("DELETE", {}, Exception("database is locked"), None)
+        return await delete_todos(db, *args, **kwargs)
+
+    monkeypatch.setattr(jobs.crud, "delete_todos", locked_at_first)
+
+    job = client.post(
+        "/admin/jobs", json={"kind": "delete_owner_todos", "owner_id": 2}
+    ).json()
+    asyncio.run(runner.run_pending())
+
+    job = client.get(f"/admin/jobs/{job['id']}").json()
+    assert (job["status"], job["processed"]) == ("succeeded", 3)
+    assert [todo.id for todo in TestingSessionLocal().query(Todos)] == [1]
+
+
+def test_admin_job_cancel_and_resume(test_todo, runner):
+    add_todos(4)
+    response = client.post(
+        "/admin/jobs", json={"kind": "delete_owner_todos", "owner_id": 2}
+    )
+    job = response.json()
+    assert client.delete(f"/admin/jobs/{job['id']}").json()["status"] == "cancelled"
+    assert client.delete(f"/admin/jobs/{job['id']}").status_code == 409
+    asyncio.run(runner.run_pending())
+    db = TestingSessionLocal()
+    assert db.query(Todos).count() == 5
+
+    # A job left running by a worker that went away resumes after its
+    # checkpoint once it is stale.
+    job = client.post(
+        "/admin/jobs", json={"kind": "delete_owner_todos", "owner_id": 2}
+    ).json()
+    db.query(AdminJobs).filter(AdminJobs.id == job["id"]).update(
+        {
+            "status": "running",
+            "checkpoint": 3,
+            "processed": 2,
+            "updated_at": datetime(2020, 1, 1, tzinfo=timezone.utc),
+        }
+    )
+    db.commit()
+    asyncio.run(runner.run_pending())
+
+    job = client.get(f"/admin/jobs/{job['id']}").json()
+    assert (job["status"], job["processed"]) == ("succeeded", 4)
+    assert sorted(todo.id for todo in db.query(Todos)) == [1, 2, 3]
+
+
+def test_admin_reassign_todos_job(test_todo, test_user, runner):
+    add_todos(3)
+    response = client.post(
+        "/admin/jobs", json={"kind": "reassign_todos", "owner_id": 2}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = client.post(
+        "/admin/jobs",
+        json={"kind": "reassign_todos", "owner_id": 2, "to_owner_id": 999},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = client.post(
+        "/admin/jobs",
+        json={"kind": "reassign_todos", "owner_id": 2, "to_owner_id": test_user.id},
+    )
+    assert response.json()["params"] == {"owner_id": 2, "to_owner_id": test_user.id}
+    asyncio.run(runner.run_pending())
+
+    db = TestingSessionLocal()
+    assert {todo.owner_id for todo in db.query(Todos)} == {test_user.id}
+    response = client.get("/admin/todos/stats", params={"owner_id": 2})
+    assert response.json()["total"] == 0
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from bcrypt import gensalt, hashpw
+from fastapi import HTTPException, status
+
+from app.db.database import get_db, get_read_db
+from app.db.models import Users
+from app.routers.auth import create_access_token, get_current_user
+from app.services.passwords import password_hasher
+from app.services.token_cache import token_cache
+from tests.utils import TestingSessionLocal, app, client, override_get_db, test_user
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+password_hasher.rounds = 4
+
+
+def test_signin(test_user):
+    response = client.post(
+        "/auth/signin", data={"username": "johndoe", "password": "testpassword"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["token_type"] == "bearer"
+
+
+def test_signin_checks_the_current_password_hash(test_user):
+    form = {"username": "johndoe", "password": "testpassword"}
+    assert client.post("/auth/signin", data=form).status_code == 200
+
+    # The profile is now cached; a password changed elsewhere still applies.
+    db = TestingSessionLocal()
+    db.query(Users).filter(Users.id == test_user.id).update(
+        {"password": hashpw(b"otherpassword", gensalt(rounds=4)).decode("utf-8")}
+    )
+    db.commit()
+    assert client.post("/auth/signin", data=form).status_code == 401
+    form["password"] = "otherpassword"
+    assert client.post("/auth/signin", data=form).status_code == 200
+
+
+def test_signin_wrong_password(test_user):
+    response = client.post(
+        "/auth/signin", data={"username": "johndoe", "password": "wrongpassword"}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_signin_rejected_when_hash_pool_is_full(test_user, monkeypatch):
+    monkeypatch.setattr(password_hasher, "workers", 0)
+    monkeypatch.setattr(password_hasher, "queue_size", 0)
+
+    response = client.post(
+        "/auth/signin", data={"username": "johndoe", "password": "testpassword"}
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_signup(test_user):
+    request_data = {
+        "username": "janedoe",
+        "email": "janedoe@email.com",
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "password": "janepassword",
+        "role": "user",
+        "phone_number": "5555555555",
+    }
+
+    response = client.post("/auth/signup", json=request_data)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["username"] == "janedoe"
+    assert "password" not in response.json()
+
+    db = TestingSessionLocal()
+    model = db.query(Users).filter(Users.username == "janedoe").first()
+    assert model.password != request_data.get("password")
+    assert model.password.startswith("$2b$04$")
+
+
+def test_get_current_user_caches_verified_tokens():
+    token_cache.clear()
+    token = create_access_token("johndoe", 1, "admin", timedelta(minutes=20))
+    misses = token_cache.stats()["misses"]
+
+    user = asyncio.run(get_current_user(token))
+    assert user == {"user_id": 1, "username": "johndoe", "user_role": "admin"}
+    assert asyncio.run(get_current_user(token)) == user
+    assert token_cache.stats()["misses"] == misses + 1
+    assert token_cache.stats()["hits"] >= 1
+
+
+def test_get_current_user_rejects_expired_token():
+    token_cache.clear()
+    token = create_access_token("johndoe", 1, "admin", timedelta(minutes=-1))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_current_user(token))
+    assert error.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_get_current_user_evicted_token_is_verified_again():
+    token_cache.clear()
+    token = create_access_token("johndoe", 1, "admin", timedelta(minutes=20))
+    user = asyncio.run(get_current_user(token))
+
+    token_cache.evict_user(1)
+    misses = token_cache.stats()["misses"]
+    assert asyncio.run(get_current_user(token)) == user
+    assert token_cache.stats()["misses"] == misses + 1
+    token_cache.clear()
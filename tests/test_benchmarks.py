@@ -0,0 +1,68 @@
+from collections import Counter
+
+from app import main
+from benchmarks.load import uncovered_routes
+from benchmarks.results import compare, percentile, summarize
+
+
+def make_results(**routes):
+    return {"format_version": 1, "routes": routes}
+
+
+def route_entry(p50_ms=10.0, p95_ms=20.0, throughput_rps=100.0, errors=0):
+    return {
+        "p50_ms": p50_ms,
+        "p95_ms": p95_ms,
+        "p99_ms": p95_ms,
+        "throughput_rps": throughput_rps,
+        "errors": errors,
+    }
+
+
+def test_every_route_has_a_load_scenario():
+    assert uncovered_routes(main.app) == set()
+
+
+def test_summarize_percentiles():
+    latencies = [index / 1000 for index in range(1, 101)]
+
+    result = summarize(latencies, elapsed=2.0, errors=Counter({500: 3}))
+
+    assert result["requests"] == 100
+    assert result["errors"] == 3
+    assert result["error_statuses"] == {"500": 3}
+    assert result["p50_ms"] == 50.5
+    assert round(result["p99_ms"], 2) == 99.01
+    assert result["throughput_rps"] == 50
+    assert percentile([], 0.5) == 0.0
+
+
+def test_compare_flags_regressions():
+    baseline = make_results(
+        slower=route_entry(),
+        jitter=route_entry(p50_ms=0.2, p95_ms=0.4),
+        faster=route_entry(),
+        failing=route_entry(),
+        dropped=route_entry(),
+    )
+    current = make_results(
+        slower=route_entry(p95_ms=30.0),
+        jitter=route_entry(p50_ms=0.4, p95_ms=0.8),
+        faster=route_entry(p50_ms=5.0),
+        failing=route_entry(errors=2),
+        added=route_entry(),
+    )
+
+    statuses = {
+        row["route"]: row["status"]
+        for row in compare(baseline, current, threshold=0.1, min_delta_ms=0.5)
+    }
+
+    assert statuses == {
+        "added": "new",
+        "dropped": "missing",
+        "failing": "regression",
+        "faster": "improvement",
+        "jitter": "ok",
+        "slower": "regression",
+    }
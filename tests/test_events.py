@@ -0,0 +1,65 @@
+import asyncio
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+from app.db.database import get_db, get_read_db
+from app.dependencies import get_owner_db, get_owner_read_db
+from app.routers.auth import create_access_token, get_current_user
+from app.services.broker import Broker, BrokerBackend, SQLiteBackend
+from tests.utils import app, override_get_current_user, override_get_db, test_todo
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_owner_db] = override_get_db
+app.dependency_overrides[get_owner_read_db] = override_get_db
+app.dependency_overrides[get_current_user] = override_get_current_user
+
+
+def test_websocket_change_feed(test_todo):
+    token = create_access_token("johndoe", 1, "admin", timedelta(minutes=5))
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/todos/ws?token={token}") as websocket:
+            client.put("/todos/1", json={"title": "Pushed to subscribers"})
+            assert websocket.receive_json() == {
+                "type": "updated",
+                "owner_id": 1,
+                "id": 1,
+            }
+
+
+def test_broker_drops_slow_consumers():
+    async def scenario():
+        broker = Broker(BrokerBackend(), queue_size=2)
+        slow = broker.subscribe(1)
+        other = broker.subscribe(2)
+
+        broker.on_changes([("created", 1, todo_id) for todo_id in range(4)])
+        broker.on_changes([("created", 2, 10)])
+
+        assert await slow.get() is None
+        assert await other.get() == {"type": "created", "owner_id": 2, "id": 10}
+        assert broker.dropped == 1
+        assert broker.subscriber_count() == 1
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_backend_shares_events_between_workers(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "events.db")
+        publisher = Broker(SQLiteBackend(path, poll_interval=0.01), queue_size=10)
+        listener = Broker(SQLiteBackend(path, poll_interval=0.01), queue_size=10)
+        await publisher.start()
+        await listener.start()
+        subscription = listener.subscribe(7)
+
+        publisher.on_changes([("deleted", 7, 3)])
+        event = await asyncio.wait_for(subscription.get(), timeout=2)
+        assert event == {"type": "deleted", "owner_id": 7, "id": 3}
+
+        await publisher.stop()
+        await listener.stop()
+
+    asyncio.run(scenario())
@@ -1,7 +1,31 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from app import main
+from app.db.database import configure_sqlite
+from app.db.instrumentation import (
+    instrument_engine,
+    normalize_statement,
+    request_queries,
+)
+from app.db.migrations import (
+    CREATE_ALL_REVISION,
+    SCHEMA_REVISION,
+    migration_heads,
+    verify_schema,
+)
+from app.middleware.admission import AdmissionMiddleware, AdmissionQueue, TokenBucket
+from app.middleware.compression import CompressionMiddleware, negotiate_encoding
 
 client = TestClient(main.app)
 
@@ -10,3 +34,249 @@ def test_health_check():
     response = client.get("/health")
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"status": "Healthy"}
+
+
+def test_metrics():
+    client.get("/health")
+
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in (
+        response.text
+    )
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'cache_entries{cache="token"}' in response.text
+
+
+def test_normalize_statement():
+    statement = (
+        "SELECT todos.id FROM todos\n"
+        "WHERE todos.owner_id = ? AND todos.id IN (?, ?, ?) LIMIT 101"
+    )
+    assert normalize_statement(statement) == (
+        "SELECT todos.id FROM todos WHERE todos.owner_id = ? "
+        "AND todos.id IN (?) LIMIT ?"
+    )
+    assert normalize_statement("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == (
+        "INSERT INTO t (a, b) VALUES (?)"
+    )
+
+
+def test_instrumentation_survives_failed_statements():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    queries = [0, 0.0]
+    token = request_queries.set(queries)
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM missing")
+            assert connection.exec_driver_sql("SELECT 1").scalar() == 1
+            assert "query_start_time" not in connection.info
+    finally:
+        request_queries.reset(token)
+    assert queries[0] == 1
+
+
+def test_configure_sqlite(tmp_path):
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    writer = create_engine(url)
+    configure_sqlite(writer)
+    reader = create_engine(url)
+    configure_sqlite(reader, read_only=True)
+
+    with writer.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        connection.exec_driver_sql("CREATE TABLE notes (body TEXT)")
+        connection.commit()
+
+    with reader.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA query_only").scalar() == 1
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql("INSERT INTO notes VALUES ('no')")
+
+
+def test_verify_schema(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'schema.db'}")
+
+    async def scenario():
+        with pytest.raises(RuntimeError, match="no Alembic revision"):
+            await verify_schema(engine)
+
+        async with engine.begin() as connection:
+            await connection.exec_driver_sql(
+                "CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"
+            )
+            await connection.exec_driver_sql(
+                "INSERT INTO alembic_version VALUES ('0b6e2f4c8d15')"
+            )
+        with pytest.raises(RuntimeError, match="alembic upgrade head"):
+            await verify_schema(engine)
+
+        async with engine.begin() as connection:
+            await connection.exec_driver_sql(
+                "UPDATE alembic_version SET version_num = ?",
+                (SCHEMA_REVISION,),
+            )
+        await verify_schema(engine)
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_db_modules_import_without_environment():
+    modules = "app.db.crud, app.db.migrations, app.db.rebalance, app.db.stats"
+    environment = {"PATH": os.environ.get("PATH", "")}
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {modules}"],
+        env=environment,
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+# The schema create_all built before the migrations took over.
+CREATE_ALL_SCHEMA = (
+    "CREATE TABLE users (id INTEGER NOT NULL, email VARCHAR, username VARCHAR, "
+    "first_name VARCHAR, last_name VARCHAR, password VARCHAR, is_active BOOLEAN, "
+    "role VARCHAR, phone_number VARCHAR, PRIMARY KEY (id), UNIQUE (email), "
+    "UNIQUE (username))",
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE TABLE todos (id INTEGER NOT NULL, title VARCHAR, description VARCHAR, "
+    "priority INTEGER, complete BOOLEAN, owner_id INTEGER, PRIMARY KEY (id), "
+    "FOREIGN KEY(owner_id) REFERENCES users (id))",
+    "CREATE INDEX ix_todos_id ON todos (id)",
+    "INSERT INTO users (id, username) VALUES (1, 'johndoe')",
+    "INSERT INTO todos (title, description, priority, complete, owner_id) "
+    "VALUES ('Learn to Code!', 'Need to practice everyday!', 5, 0, 1)",
+)
+
+
+def test_upgrade_create_all_database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for statement in CREATE_ALL_SCHEMA:
+            connection.exec_driver_sql(statement)
+
+    environment = {"PATH": os.environ.get("PATH", ""), "DATABASE_URL": url}
+    for command in (["stamp", CREATE_ALL_REVISION], ["upgrade", "head"]):
+        result = subprocess.run(
+            [sys.executable, "-m", "alembic", *command],
+            env=environment,
+            cwd=Path(__file__).resolve().parents[1],
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, result.stderr
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            "SELECT version_num FROM alembic_version"
+        ).scalars().all() == [SCHEMA_REVISION]
+        assert connection.exec_driver_sql(
+            "SELECT owner_id, priority, complete, count FROM todo_stats"
+        ).all() == [(1, 5, 0, 1)]
+        assert connection.exec_driver_sql(
+            "SELECT rowid FROM todos_fts WHERE todos_fts MATCH 'practice'"
+        ).scalars().all() == [1]
+    engine.dispose()
+
+
+def test_schema_revision_is_migration_head():
+    assert migration_heads() == {SCHEMA_REVISION}
+
+
+def test_admission_queue_sheds_overflow():
+    async def scenario():
+        queue = AdmissionQueue(limit=1, queue_size=1, timeout=0.05)
+        assert await queue.acquire() is None
+        waiting = asyncio.create_task(queue.acquire())
+        await asyncio.sleep(0)
+        assert queue.depth == 1
+        assert await queue.acquire() == "queue_full"
+        assert await waiting == "timeout"
+        assert queue.depth == 0
+
+        queue.timeout = 1
+        waiting = asyncio.create_task(queue.acquire())
+        await asyncio.sleep(0)
+        queue.release()
+        assert await waiting is None
+        assert queue.active == 1
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=1, burst=2)
+
+    assert bucket.take("client", now=0) == 0
+    assert bucket.take("client", now=0) == 0
+    assert bucket.take("client", now=0) == 1
+    assert bucket.take("other", now=0) == 0
+    assert bucket.take("client", now=0.5) == 0.5
+    assert bucket.take("client", now=1) == 0
+
+
+def test_admission_middleware_rate_limits_signin():
+    async def ok(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    limited = TestClient(
+        AdmissionMiddleware(ok, rate_limit=TokenBucket(rate=1 / 60, burst=1))
+    )
+
+    assert limited.post("/auth/signin").status_code == status.HTTP_200_OK
+    response = limited.post("/auth/signin")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "60"
+    assert limited.get("/todos").status_code == status.HTTP_200_OK
+    assert 'admission_queue_depth{route_class="reads"} 0' in main.registry.render()
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip, br, zstd") == "zstd"
+    assert negotiate_encoding("br;q=1, zstd;q=0.5") == "br"
+    assert negotiate_encoding("*, zstd;q=0") == "br"
+    assert negotiate_encoding("identity") is None
+
+
+def test_compression_middleware():
+    async def endpoint(scope, receive, send):
+        chunks = {
+            "/small": [b"x" * 10],
+            "/large": [b"x" * 5000],
+            "/stream": [b"line\n" * 100] * 3,
+        }
+        headers = [(b"content-type", b"text/plain"), (b"etag", b'"v1"')]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        parts = chunks[scope["path"]]
+        for index, chunk in enumerate(parts):
+            more_body = index < len(parts) - 1
+            await send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+
+    compressed = TestClient(CompressionMiddleware(endpoint, minimum_size=100))
+
+    response = compressed.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == 'W/"v1"'
+    for encoding in ("gzip", "br", "zstd"):
+        response = compressed.get("/large", headers={"Accept-Encoding": encoding})
+        assert response.headers["Content-Encoding"] == encoding
+        assert int(response.headers["Content-Length"]) < 100
+        assert response.headers["Vary"] == "Accept-Encoding"
+    response = compressed.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.content == b"x" * 5000
+    response = compressed.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.content == b"line\n" * 300
@@ -0,0 +1,205 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select, update
+
+from app.config.settings import get_settings
+from app.db import rebalance
+from app.db.database import Base, get_engine, todo_id_range
+from app.db.models import AdminJobs, Todos
+from app.db.rebalance import move_owner, set_placement
+from app.db.sharding import Placement, get_shard_router, jump_hash
+from app.main import create_app
+from app.routers.auth import get_current_user
+from app.services.compaction import compactor
+from app.services.jobs import job_dict, job_runner
+from app.services.list_cache import list_cache
+
+# Owners 1 and 4 hash to shards 0 and 1 of two.
+HOME_OWNER, OTHER_OWNER = 1, 4
+
+
+def test_jump_hash_is_stable_and_moves_few_keys():
+    assert [jump_hash(key, 10) for key in range(10)] == [0, 6, 6, 8, 1, 4, 9, 0, 4, 7]
+    assert jump_hash(HOME_OWNER, 2) == 0 and jump_hash(OTHER_OWNER, 2) == 1
+
+    before = [jump_hash(key, 4) for key in range(10_000)]
+    after = [jump_hash(key, 5) for key in range(10_000)]
+    moved = [new for old, new in zip(before, after) if old != new]
+    # Growing to five shards only moves keys onto the new shard.
+    assert set(moved) == {4}
+    assert 1500 < len(moved) < 2500
+
+
+@pytest.fixture()
+def sharded(tmp_path, monkeypatch):
+    settings = get_settings()
+    urls = [f"sqlite:///{tmp_path / f'shard{shard}.db'}" for shard in range(2)]
+    monkeypatch.setattr(settings, "DATABASE_URL", urls[0])
+    monkeypatch.setattr(settings, "ASYNC_DATABASE_URL", None)
+    monkeypatch.setattr(settings, "DATABASE_SHARD_URLS", urls[1:])
+    for getter in (get_engine, get_shard_router):
+        getter.cache_clear()
+    for shard in range(len(urls)):
+        Base.metadata.create_all(get_engine(shard))
+    list_cache.clear()
+
+    app = create_app(check_schema=False)
+    user = {"username": "johndoe", "user_id": HOME_OWNER, "user_role": "admin"}
+    app.dependency_overrides[get_current_user] = lambda: user
+    with TestClient(app) as client:
+        yield client, user
+    list_cache.clear()
+    get_shard_router.cache_clear()
+
+
+def shard_todo_ids(shard: int) -> list[int]:
+    with get_engine(shard).connect() as connection:
+        return connection.scalars(select(Todos.id).order_by(Todos.id)).all()
+
+
+def create_todos(client, user, owner_id: int, count: int):
+    user["user_id"] = owner_id
+    for index in range(count):
+        response = client.post(
+            "/todos/",
+            json={"title": f"Errand {index}", "description": "Walk", "priority": 3},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+
+def test_todos_live_on_the_owners_shard(sharded):
+    client, user = sharded
+    create_todos(client, user, HOME_OWNER, 2)
+    create_todos(client, user, OTHER_OWNER, 3)
+
+    low, high = todo_id_range(1)
+    assert len(shard_todo_ids(0)) == 2
+    assert all(low <= todo_id <= high for todo_id in shard_todo_ids(1))
+    assert len(shard_todo_ids(1)) == 3
+
+    response = client.get("/todos/")
+    assert [todo["owner_id"] for todo in response.json()] == [OTHER_OWNER] * 3
+
+    # Admin reads scatter over both shards and merge in id order.
+    response = client.get("/admin/todos", params={"limit": 4})
+    page = [todo["id"] for todo in response.json()]
+    assert page == shard_todo_ids(0) + shard_todo_ids(1)[:2]
+    response = client.get(
+        "/admin/todos", params={"cursor": response.headers["X-Next-Cursor"]}
+    )
+    assert [todo["id"] for todo in response.json()] == shard_todo_ids(1)[2:]
+
+    response = client.get("/admin/todos", params={"format": "ndjson"})
+    assert len(response.text.splitlines()) == 5
+    assert client.get("/admin/todos/stats").json()["total"] == 5
+    response = client.get("/admin/todos/stats", params={"owner_id": OTHER_OWNER})
+    assert response.json()["total"] == 3
+
+    todo_id = shard_todo_ids(1)[0]
+    response = client.delete(f"/admin/todos/{todo_id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert todo_id not in shard_todo_ids(1)
+
+
+def test_move_owner(sharded):
+    client, user = sharded
+    create_todos(client, user, OTHER_OWNER, 3)
+    ids = shard_todo_ids(1)
+    response = client.delete(f"/todos/{ids[0]}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    with get_engine(0).connect() as directory, directory.begin():
+        set_placement(directory, OTHER_OWNER, Placement(1, moving=True))
+    get_shard_router().forget(OTHER_OWNER)
+    response = client.post(
+        "/todos/", json={"title": "Blocked", "description": "Wait", "priority": 1}
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "Retry-After" in response.headers
+    assert len(client.get("/todos/").json()) == 2
+
+    move_owner(OTHER_OWNER, 0, wait=0)
+    get_shard_router().forget(OTHER_OWNER)
+    list_cache.clear()
+
+    assert shard_todo_ids(1) == []
+    assert shard_todo_ids(0) == ids[1:]
+    assert [todo["id"] for todo in client.get("/todos/").json()] == ids[1:]
+    assert client.get("/todos/stats").json()["total"] == 2
+    response = client.get("/todos/search", params={"q": "walk"})
+    assert len(response.json()) == 2
+    changes = client.get("/todos/changes").json()["changes"]
+    assert (ids[0], True) in [(change["id"], change["deleted"]) for change in changes]
+
+    response = client.post(
+        "/todos/", json={"title": "Moved", "description": "Done", "priority": 1}
+    )
+    assert response.status_code == status.HTTP_201_CREATED, response.text
+    with get_engine(0).connect() as connection:
+        assert connection.scalar(select(func.count()).select_from(Todos)) == 3
+
+
+def test_shards_never_reuse_deleted_ids(sharded):
+    client, user = sharded
+    create_todos(client, user, OTHER_OWNER, 2)
+    first, last = shard_todo_ids(1)
+    assert client.delete(f"/todos/{last}").status_code == status.HTTP_204_NO_CONTENT
+
+    create_todos(client, user, OTHER_OWNER, 1)
+    assert shard_todo_ids(1) == [first, last + 1]
+    changes = client.get("/todos/changes").json()["changes"]
+    assert [(change["id"], change["deleted"]) for change in changes] == [
+        (first, False),
+        (last, True),
+        (last + 1, False),
+    ]
+
+
+def test_background_writes_skip_owners_being_moved(sharded, monkeypatch):
+    client, user = sharded
+    create_todos(client, user, OTHER_OWNER, 3)
+    with get_engine(1).connect() as connection, connection.begin():
+        connection.execute(
+            update(Todos).values(
+                complete=True, updated_at=datetime(2020, 1, 1, tzinfo=timezone.utc)
+            )
+        )
+
+    def purge_completed() -> int:
+        now = datetime.now(timezone.utc)
+        with get_engine(0).connect() as connection, connection.begin():
+            row = connection.execute(
+                insert(AdminJobs)
+                .values(
+                    kind="purge_completed",
+                    params="{}",
+                    status="running",
+                    created_at=now,
+                    updated_at=now,
+                )
+                .returning(*AdminJobs.__table__.columns)
+            ).first()
+        client.portal.call(job_runner.run, job_dict(row))
+        with get_engine(0).connect() as connection:
+            return connection.scalar(
+                select(AdminJobs.processed).where(AdminJobs.id == row.id)
+            )
+
+    # The rebalancer waits twice: while the owner is marked as moving, and
+    # after the directory points at the target but before the source copy is
+    # deleted. Archiving and a job run during each wait.
+    passes = []
+    monkeypatch.setattr(
+        rebalance.time,
+        "sleep",
+        lambda seconds: passes.append(
+            (client.portal.call(compactor.compact), purge_completed())
+        ),
+    )
+    move_owner(OTHER_OWNER, 0, wait=0)
+
+    assert passes == [(0, 0), (3, 3)]
+    assert shard_todo_ids(0) == shard_todo_ids(1) == []
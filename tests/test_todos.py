@@ -1,9 +1,24 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta, timezone
+
+import msgpack
 from fastapi import status
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
-from app.db.database import get_db
-from app.db.models import Todos
+from app import imports
+from app.config.settings import settings
+from app.db import crud
+from app.db.database import async_database_url, get_db, get_read_db
+from app.db.instrumentation import instrument_engine, request_queries
+from app.db.models import Todos, TodoSyncVersions
+from app.dependencies import get_owner_db, get_owner_read_db
+from app.routers import todos as todos_router
 from app.routers.auth import get_current_user
+from app.services.group_commit import GroupCommitter, group_committer
 from tests.utils import (
+    TestingAsyncSessionLocal,
     TestingSessionLocal,
     app,
     client,
@@ -13,6 +28,9 @@ from tests.utils import (
 )
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_owner_db] = override_get_db
+app.dependency_overrides[get_owner_read_db] = override_get_db
 app.dependency_overrides[get_current_user] = override_get_current_user
 
 
@@ -27,10 +45,292 @@ def test_read_all_authenticated(test_todo):
             "title": "Learn to Code!",
             "description": "Need to practice everyday!",
             "priority": 5,
+            "version": 0,
+            "updated_at": None,
         }
     ]
 
 
+def test_read_all_paginates_with_cursor(test_todo):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Todos(
+                title=f"Todo {index}",
+                description="Paginated todo",
+                priority=index,
+                complete=index % 2 == 0,
+                owner_id=1,
+            )
+            for index in range(1, 4)
+        ]
+    )
+    db.commit()
+
+    response = client.get("/todos", params={"limit": 3})
+    assert response.status_code == status.HTTP_200_OK
+    assert [todo["id"] for todo in response.json()] == [1, 2, 3]
+
+    response = client.get(
+        "/todos", params={"limit": 3, "cursor": response.headers["X-Next-Cursor"]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [todo["id"] for todo in response.json()] == [4]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_read_all_filters_and_sorts(test_todo):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Todos(
+                title=f"Todo {index}",
+                description="Filtered todo",
+                priority=index,
+                complete=True,
+                owner_id=1,
+            )
+            for index in range(1, 4)
+        ]
+    )
+    db.commit()
+
+    response = client.get("/todos", params={"complete": True, "sort": "-priority"})
+    assert response.status_code == status.HTTP_200_OK
+    assert [todo["priority"] for todo in response.json()] == [3, 2, 1]
+
+    response = client.get("/todos", params={"priority": 5})
+    assert [todo["id"] for todo in response.json()] == [1]
+
+
+def test_read_all_invalid_cursor(test_todo):
+    response = client.get("/todos", params={"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    cursor = base64.urlsafe_b64encode(b'[{"a": 1}]').decode().rstrip("=")
+    response = client.get("/todos", params={"cursor": cursor})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_read_all_not_modified(test_todo):
+    response = client.get("/todos")
+    etag = response.headers["ETag"]
+
+    response = client.get("/todos", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+
+
+def test_read_all_negotiates_format(test_todo):
+    response = client.get(
+        "/todos", headers={"Accept": "application/msgpack, application/json;q=0.5"}
+    )
+    assert response.headers["Content-Type"] == "application/msgpack"
+    assert "Accept" in response.headers["Vary"]
+    assert msgpack.unpackb(response.content) == client.get("/todos").json()
+
+    response = client.get(
+        "/todos", headers={"Accept": "application/vnd.todos.columnar+json"}
+    )
+    assert response.headers["Content-Type"] == "application/vnd.todos.columnar+json"
+    assert response.json()["id"] == [1]
+    assert response.json()["title"] == [test_todo.title]
+
+    response = client.get("/todos", headers={"Accept": "text/html, */*;q=0.1"})
+    assert response.headers["Content-Type"] == "application/json"
+
+
+def test_read_all_etag_changes_after_write(test_todo):
+    etag = client.get("/todos").headers["ETag"]
+
+    client.put("/todos/1", json={"title": "Changed after caching"})
+
+    response = client.get("/todos", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["title"] == "Changed after caching"
+
+
+def test_read_all_sees_writes_from_other_workers(test_todo):
+    etag = client.get("/todos").headers["ETag"]
+
+    # Another worker's write: nothing in this process hears about it.
+    db = TestingSessionLocal()
+    db.query(Todos).filter(Todos.id == 1).update({"title": "Changed elsewhere"})
+    db.add(TodoSyncVersions(owner_id=1, version=1))
+    db.commit()
+
+    response = client.get("/todos", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["title"] == "Changed elsewhere"
+
+
+def test_read_changes(test_todo):
+    client.post(
+        "/todos",
+        json={
+            "title": "Synced todo",
+            "description": "Created after sync",
+            "priority": 2,
+        },
+    )
+    client.delete("/todos/1")
+
+    response = client.get("/todos/changes")
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert [(c["id"], c["version"], c["deleted"]) for c in body["changes"]] == [
+        (2, 1, False),
+        (1, 2, True),
+    ]
+    assert body["changes"][0]["title"] == "Synced todo"
+    assert "title" not in body["changes"][1]
+    assert body["has_more"] is False
+
+    response = client.get("/todos/changes", params={"since": body["cursor"]})
+    assert response.json()["changes"] == []
+    assert response.json()["cursor"] == body["cursor"]
+
+    client.put("/todos/2", json={"complete": True})
+    response = client.get("/todos/changes", params={"since": body["cursor"]})
+    assert [(c["id"], c["version"]) for c in response.json()["changes"]] == [(2, 3)]
+
+
+def test_read_changes_paginates_within_a_version(test_todo):
+    client.post(
+        "/todos/bulk",
+        json={
+            "todos": [
+                {"title": f"Bulk {index}", "description": "Bulk sync", "priority": 1}
+                for index in range(3)
+            ]
+        },
+    )
+
+    response = client.get("/todos/changes", params={"limit": 2})
+    body = response.json()
+    assert [c["id"] for c in body["changes"]] == [1, 2]
+    assert body["has_more"] is True
+
+    response = client.get("/todos/changes", params={"since": body["cursor"]})
+    assert [c["id"] for c in response.json()["changes"]] == [3, 4]
+
+
+def test_read_stats_follows_writes(test_todo):
+    response = client.get("/todos/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "total": 1,
+        "complete": 0,
+        "incomplete": 1,
+        "by_priority": [{"priority": 5, "total": 1, "complete": 0}],
+    }
+
+    client.post(
+        "/todos/bulk",
+        json={
+            "todos": [
+                {"title": "Stats", "description": "Counted", "priority": 2},
+                {"title": "Stats", "description": "Counted", "priority": 5},
+            ]
+        },
+    )
+    client.put("/todos/1", json={"complete": True})
+    client.delete("/todos/2")
+
+    response = client.get("/todos/stats")
+    assert response.json() == {
+        "total": 2,
+        "complete": 1,
+        "incomplete": 1,
+        "by_priority": [{"priority": 5, "total": 2, "complete": 1}],
+    }
+
+
+def test_search_todos_ranks_and_scopes_to_owner(test_todo):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Todos(
+                title="Groceries",
+                description="Buy milk and bread",
+                priority=1,
+                complete=False,
+                owner_id=1,
+            ),
+            Todos(
+                title="Milk the cow",
+                description="Fresh milk every morning",
+                priority=2,
+                complete=False,
+                owner_id=1,
+            ),
+            Todos(
+                title="Milk",
+                description="Someone else's milk",
+                priority=3,
+                complete=False,
+                owner_id=2,
+            ),
+        ]
+    )
+    db.commit()
+
+    response = client.get("/todos/search", params={"q": "milk"})
+    assert response.status_code == status.HTTP_200_OK
+    assert [todo["id"] for todo in response.json()] == [3, 2]
+
+    response = client.get("/todos/search", params={"q": "practice code"})
+    assert [todo["id"] for todo in response.json()] == [1]
+
+    response = client.get("/todos/search", params={"q": "milk AND NOT*"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+
+    # The owner id is indexed for scoping only; it is not searchable text.
+    response = client.get("/todos/search", params={"q": "1"})
+    assert response.json() == []
+
+
+def test_search_todos_paginates_with_cursor(test_todo):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Todos(
+                title=f"Errand {index}",
+                description="Pick up the parcel",
+                priority=1,
+                complete=False,
+                owner_id=1,
+            )
+            for index in range(3)
+        ]
+    )
+    db.commit()
+
+    response = client.get("/todos/search", params={"q": "parcel", "limit": 2})
+    first_page = [todo["id"] for todo in response.json()]
+    assert len(first_page) == 2
+
+    response = client.get(
+        "/todos/search",
+        params={"q": "parcel", "limit": 2, "cursor": response.headers["X-Next-Cursor"]},
+    )
+    second_page = [todo["id"] for todo in response.json()]
+    assert sorted(first_page + second_page) == [2, 3, 4]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_search_todos_invalid_query(test_todo):
+    response = client.get("/todos/search", params={"q": ""})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = client.get("/todos/search", params={"q": "code", "cursor": "nope"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.get("/todos/search", params={"q": "!!!"})
+    assert response.json() == []
+
+
 def test_read_one_authenticated(test_todo):
     response = client.get("/todos/1")
     assert response.status_code == status.HTTP_200_OK
@@ -41,6 +341,8 @@ def test_read_one_authenticated(test_todo):
         "title": "Learn to Code!",
         "description": "Need to practice everyday!",
         "priority": 5,
+        "version": 0,
+        "updated_at": None,
     }
 
 
@@ -114,3 +416,285 @@ def test_delete_todo_not_found(test_todo):
 
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {"detail": "To-do not found!"}
+
+
+def test_archived_todos_stay_readable(test_todo):
+    db = TestingSessionLocal()
+    db.query(Todos).filter(Todos.id == 1).update(
+        {"complete": True, "updated_at": datetime(2020, 1, 1, tzinfo=timezone.utc)}
+    )
+    db.commit()
+    client.post(
+        "/todos", json={"title": "Recent", "description": "Stays hot", "priority": 2}
+    )
+
+    async def archive():
+        async with TestingAsyncSessionLocal() as session:
+            archived = await crud.archive_todos(
+                session, datetime.now(timezone.utc) - timedelta(days=30), 10
+            )
+            await session.commit()
+            return archived
+
+    assert asyncio.run(archive()) == 1
+    assert [todo["id"] for todo in client.get("/todos").json()] == [2]
+    response = client.get("/todos", params={"include_archived": True})
+    assert [todo["id"] for todo in response.json()] == [1, 2]
+    assert client.get("/todos/1").json()["complete"] is True
+    assert client.get("/todos/stats").json()["total"] == 2
+    changes = client.get("/todos/changes").json()["changes"]
+    assert [change["id"] for change in changes] == [1, 2]
+
+    # Updating an archived todo brings it back; deleting one leaves a
+    # tombstone like any other delete.
+    assert client.put("/todos/1", json={"priority": 1}).status_code == 204
+    assert [todo["id"] for todo in client.get("/todos").json()] == [1, 2]
+    db.query(Todos).filter(Todos.id == 1).update(
+        {"complete": True, "updated_at": datetime(2020, 1, 1, tzinfo=timezone.utc)}
+    )
+    db.commit()
+    assert asyncio.run(archive()) == 1
+    assert client.delete("/todos/1").status_code == status.HTTP_204_NO_CONTENT
+    assert client.get("/todos/1").status_code == status.HTTP_404_NOT_FOUND
+    changes = client.get("/todos/changes").json()["changes"]
+    assert [(change["id"], change["deleted"]) for change in changes][-1] == (1, True)
+
+
+def test_new_todos_never_reuse_archived_ids(test_todo):
+    db = TestingSessionLocal()
+    db.query(Todos).filter(Todos.id == 1).update(
+        {"complete": True, "updated_at": datetime(2020, 1, 1, tzinfo=timezone.utc)}
+    )
+    db.commit()
+
+    async def archive():
+        async with TestingAsyncSessionLocal() as session:
+            archived = await crud.archive_todos(
+                session, datetime.now(timezone.utc) - timedelta(days=30), 10
+            )
+            await session.commit()
+            return archived
+
+    # The archived todo was the newest, so the hot table is now empty.
+    assert asyncio.run(archive()) == 1
+    response = client.post(
+        "/todos", json={"title": "Next", "description": "Gets a new id", "priority": 2}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    response = client.get("/todos", params={"include_archived": True})
+    assert [todo["id"] for todo in response.json()] == [1, 2]
+
+
+def test_group_commit_shares_one_transaction(test_todo):
+    committer = GroupCommitter(
+        window_ms=1000, max_batch=3, sessionmaker=lambda: TestingAsyncSessionLocal
+    )
+    todo = {"title": "Grouped", "description": "Grouped todo", "priority": 2}
+
+    async def write():
+        return await asyncio.gather(
+            committer.run(lambda db: crud.insert_todos(db, 1, [todo])),
+            committer.run(lambda db: crud.update_todo(db, 1, 1, {"complete": True})),
+            committer.run(lambda db: crud.delete_todos(db, 1, [999])),
+        )
+
+    created, updated, deleted = asyncio.run(write())
+    assert updated is True
+    assert deleted == {}
+
+    db = TestingSessionLocal()
+    # One transaction bumps the owner's change version once.
+    assert {todo.id: todo.version for todo in db.query(Todos)} == {
+        1: 1,
+        created[0]: 1,
+    }
+
+
+def test_group_commit_isolates_a_failing_write(test_todo):
+    committer = GroupCommitter(
+        window_ms=1000, max_batch=2, sessionmaker=lambda: TestingAsyncSessionLocal
+    )
+    todo = {"title": "Grouped", "description": "Grouped todo", "priority": 2}
+
+    async def failing(db):
+        await crud.insert_todos(db, 1, [todo])
+        raise RuntimeError("write failed")
+
+    async def write():
+        return await asyncio.gather(
+            committer.run(lambda db: crud.insert_todos(db, 1, [todo])),
+            committer.run(failing),
+            return_exceptions=True,
+        )
+
+    created, error = asyncio.run(write())
+    assert isinstance(error, RuntimeError)
+
+    db = TestingSessionLocal()
+    assert sorted(todo.id for todo in db.query(Todos)) == [1, created[0]]
+
+
+def test_group_commit_counts_queries_for_each_caller(test_todo):
+    engine = create_async_engine(
+        async_database_url(settings.TEST_DATABASE_URL), poolclass=NullPool
+    )
+    instrument_engine(engine.sync_engine)
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+    committer = GroupCommitter(
+        window_ms=1000, max_batch=2, sessionmaker=lambda: sessions
+    )
+    todo = {"title": "Grouped", "description": "Grouped todo", "priority": 2}
+
+    async def request(operation) -> int:
+        queries = [0, 0.0]
+        request_queries.set(queries)
+        await committer.run(operation)
+        return queries[0]
+
+    async def write():
+        counts = await asyncio.gather(
+            request(lambda db: crud.insert_todos(db, 1, [todo])),
+            request(lambda db: crud.update_todo(db, 1, 1, {"complete": True})),
+        )
+        await engine.dispose()
+        return counts
+
+    assert all(count > 0 for count in asyncio.run(write()))
+    assert request_queries.get() is None
+
+
+def test_todo_writes_with_group_commit(test_todo, monkeypatch):
+    monkeypatch.setattr(group_committer, "window", 0.005)
+    monkeypatch.setattr(
+        group_committer, "sessionmaker", lambda: TestingAsyncSessionLocal
+    )
+    request_data = {"title": "New Todo!", "description": "Grouped", "priority": 4}
+
+    assert client.post("/todos", json=request_data).status_code == 201
+    assert client.put("/todos/1", json={"priority": 1}).status_code == 204
+    assert client.delete("/todos/999").status_code == status.HTTP_404_NOT_FOUND
+    assert client.delete("/todos/1").status_code == status.HTTP_204_NO_CONTENT
+
+    db = TestingSessionLocal()
+    assert [todo.title for todo in db.query(Todos)] == ["New Todo!"]
+
+
+def test_bulk_create_todos(test_todo):
+    request_data = {
+        "todos": [
+            {"title": "Bulk one", "description": "First bulk todo", "priority": 2},
+            {"title": "x", "description": "Too short title", "priority": 2},
+            {"title": "Bulk two", "description": "Second bulk todo", "priority": 3},
+        ]
+    }
+
+    response = client.post("/todos/bulk", json=request_data)
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["created", "invalid", "created"]
+    assert results[1]["errors"][0]["loc"] == ["title"]
+
+    db = TestingSessionLocal()
+    model = db.query(Todos).filter(Todos.id == results[2]["id"]).first()
+    assert model.title == "Bulk two"
+    assert model.owner_id == 1
+
+
+def test_import_todos_ndjson(test_todo, monkeypatch):
+    monkeypatch.setattr(todos_router, "IMPORT_BATCH_SIZE", 2)
+    lines = [
+        '{"title": "Import one", "description": "First import", "priority": 1}',
+        "",
+        '{"title": "x", "description": "Too short title", "priority": 1}',
+        "not json",
+        '{"title": "Import two", "description": "Second import", "priority": 2}',
+        '{"title": "Import three", "description": "Third", "priority": 3}',
+    ]
+
+    response = client.post("/todos/import", content="\n".join(lines).encode())
+    assert response.status_code == status.HTTP_200_OK
+    summary = response.json()
+    assert (summary["accepted"], summary["rejected"]) == (3, 2)
+    assert [error["line"] for error in summary["errors"]] == [3, 4]
+    assert summary["errors"][0]["errors"][0]["loc"] == ["title"]
+    assert summary["rows_per_second"] > 0
+
+    db = TestingSessionLocal()
+    titles = [todo.title for todo in db.query(Todos).order_by(Todos.id).all()]
+    assert titles == [test_todo.title, "Import one", "Import two", "Import three"]
+
+
+def test_import_todos_csv(test_todo):
+    body = (
+        "title,description,priority,complete\r\n"
+        "Plain row,Nothing special,2,\r\n"
+        '"Quoted, ""with"" comma","Spans\ntwo lines",3,true\r\n'
+        "Short row,Missing fields\r\n"
+        "Bad priority,Out of range,9,false\r\n"
+    )
+
+    response = client.post("/todos/import", params={"format": "csv"}, content=body)
+    assert response.status_code == status.HTTP_200_OK
+    summary = response.json()
+    assert (summary["accepted"], summary["rejected"]) == (2, 2)
+    assert [error["line"] for error in summary["errors"]] == [5, 6]
+
+    db = TestingSessionLocal()
+    model = db.query(Todos).filter(Todos.title.startswith("Quoted")).one()
+    assert model.title == 'Quoted, "with" comma'
+    assert model.description == "Spans\ntwo lines"
+    assert model.complete is True
+    assert db.query(Todos).filter(Todos.title == "Plain row").one().complete is False
+
+
+def test_read_lines_across_chunks(monkeypatch):
+    monkeypatch.setattr(imports, "MAX_RECORD_LENGTH", 8)
+
+    async def chunks():
+        for chunk in (b"ab", b"c\nd\xc3", b"\xa9\r\n", b"x" * 10, b"\ntail"):
+            yield chunk
+
+    async def collect():
+        return [line async for line in imports.read_lines(chunks())]
+
+    assert asyncio.run(collect()) == [
+        (1, "abc"),
+        (2, "d\u00e9"),
+        (3, None),
+        (4, "tail"),
+    ]
+
+
+def test_bulk_update_todos(test_todo):
+    request_data = {
+        "todos": [
+            {"id": 1, "title": "Updated in bulk", "complete": True},
+            {"id": 999, "title": "Missing todo"},
+        ]
+    }
+
+    response = client.put("/todos/bulk", json=request_data)
+    assert response.status_code == status.HTTP_200_OK
+    assert [result["status"] for result in response.json()["results"]] == [
+        "updated",
+        "not_found",
+    ]
+
+    db = TestingSessionLocal()
+    model = db.query(Todos).filter(Todos.id == 1).first()
+    assert model.title == "Updated in bulk"
+    assert model.description == test_todo.description
+    assert model.priority == test_todo.priority
+    assert model.complete is True
+
+
+def test_bulk_delete_todos(test_todo):
+    response = client.request("DELETE", "/todos/bulk", json={"ids": [1, 999]})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["results"] == [
+        {"index": 0, "status": "deleted", "id": 1},
+        {"index": 1, "status": "not_found", "id": 999},
+    ]
+
+    db = TestingSessionLocal()
+    assert db.query(Todos).filter(Todos.id == 1).first() is None
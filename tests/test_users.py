@@ -0,0 +1,87 @@
+import time
+
+from fastapi import status
+
+from app.db.database import get_db, get_read_db
+from app.db.models import Users
+from app.routers.auth import get_current_user
+from app.services.passwords import password_hasher
+from app.services.token_cache import token_cache
+from app.services.user_cache import user_cache
+from tests.utils import (
+    TestingSessionLocal,
+    app,
+    client,
+    override_get_current_user,
+    override_get_db,
+    test_user,
+)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_current_user] = override_get_current_user
+password_hasher.rounds = 4
+
+
+def test_get_user(test_user):
+    response = client.get("/users")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["username"] == "johndoe"
+    assert "password" not in response.json()
+
+
+def test_get_deleted_user(test_user):
+    db = TestingSessionLocal()
+    db.query(Users).filter(Users.id == test_user.id).delete()
+    db.commit()
+
+    response = client.get("/users")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_user_is_cached_until_the_user_changes(test_user):
+    assert client.get("/users").json()["phone_number"] == "5555555555"
+
+    db = TestingSessionLocal()
+    db.query(Users).filter(Users.id == test_user.id).update({"first_name": "Jane"})
+    db.commit()
+    hits = user_cache.stats()["hits"]
+    assert client.get("/users").json()["first_name"] == "John"
+    assert user_cache.stats()["hits"] == hits + 1
+
+    client.put("/users/change-phone-number", json={"phone_number": "2222222222"})
+    response = client.get("/users")
+    assert response.json()["first_name"] == "Jane"
+    assert response.json()["phone_number"] == "2222222222"
+
+
+def test_change_password(test_user):
+    user = {"user_id": test_user.id, "username": "johndoe", "user_role": "admin"}
+    token_cache.put("old-token", user, time.time() + 60)
+
+    response = client.put(
+        "/users/change-password",
+        json={"password": "testpassword", "new_password": "newpassword"},
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert token_cache.get("old-token") is None
+
+
+def test_change_password_invalid_current_password(test_user):
+    response = client.put(
+        "/users/change-password",
+        json={"password": "wrongpassword", "new_password": "newpassword"},
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json() == {"detail": "Error on password change."}
+
+
+def test_change_phone_number(test_user):
+    response = client.put(
+        "/users/change-phone-number", json={"phone_number": "2222222222"}
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    db = TestingSessionLocal()
+    model = db.query(Users).filter(Users.id == test_user.id).first()
+    assert model.phone_number == "2222222222"
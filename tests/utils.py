@@ -1,13 +1,17 @@
 import pytest
+from bcrypt import gensalt, hashpw
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 from app.config.settings import settings
-from app.db.database import Base
-from app.db.models import Todos
-from app.main import app
+from app.db.database import Base, async_database_url
+from app.db.models import Todos, Users
+from app.main import create_app
+from app.services.list_cache import list_cache
+from app.services.user_cache import user_cache
 
 engine = create_engine(
     url=settings.TEST_DATABASE_URL,
@@ -15,16 +19,26 @@ engine = create_engine(
     poolclass=StaticPool,
 )
 
+# The app talks to the test database through the async engine while the
+# fixtures below seed and inspect it synchronously, so TEST_DATABASE_URL must
+# point at a file-backed database that both engines can open.
+async_engine = create_async_engine(
+    url=async_database_url(settings.TEST_DATABASE_URL), poolclass=NullPool
+)
+
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
 Base.metadata.create_all(bind=engine)
 
+# The test schema comes from the models above, not from the migrations.
+app = create_app(check_schema=False)
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 def override_get_current_user():
@@ -44,10 +58,41 @@ def test_todo():
         owner_id=1,
     )
     print(todo)
+    # Fixtures write behind the app's back, so cached list pages are stale.
+    list_cache.clear()
     db = TestingSessionLocal()
     db.add(todo)
     db.commit()
     yield todo
     with engine.connect() as connection:
         connection.execute(text("DELETE FROM todos;"))
+        connection.execute(text("DELETE FROM archived_todos;"))
+        connection.execute(text("DELETE FROM admin_jobs;"))
+        connection.execute(text("DELETE FROM todo_tombstones;"))
+        connection.execute(text("DELETE FROM todo_sync_versions;"))
+        # Todo ids are never reused otherwise, and tests expect to start at 1.
+        connection.execute(text("DELETE FROM sqlite_sequence;"))
+        connection.commit()
+
+
+@pytest.fixture()
+def test_user():
+    user = Users(
+        username="johndoe",
+        email="johndoe@email.com",
+        first_name="John",
+        last_name="Doe",
+        password=hashpw(b"testpassword", gensalt(rounds=4)).decode("utf-8"),
+        role="admin",
+        phone_number="5555555555",
+    )
+    # Fixtures write behind the app's back, so cached profiles are stale.
+    user_cache.clear()
+    db = TestingSessionLocal()
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    yield user
+    with engine.connect() as connection:
+        connection.execute(text("DELETE FROM users;"))
         connection.commit()